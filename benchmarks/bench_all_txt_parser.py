@@ -0,0 +1,62 @@
+"""
+parseWsjtxAllLog against the mmap based scanWsjtxAllLog.
+
+Generates an ALL.TXT with the given number of lines (10M by default) from
+the lines used in the test suite, and times both parsers over it.
+
+    python -m benchmarks.bench_all_txt_parser [lines]
+"""
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from wsjtx_influxdb.wsjtx_extras import parseWsjtxAllLog, scanWsjtxAllLog
+
+SAMPLE_LINES = [
+    "231006_035130     3.573 Rx FT8    -20  0.6 2753 CQ DX F4BKV IN95",
+    "231006_035145     3.573 Rx FT8     -9 -0.2 1446 LB2WD SP5AA -09",
+    "231006_035145     3.573 Rx FT8    -15  0.7 2319 NK9R 9A5TW RR73",
+    "231006_041100     7.074 Rx FT8    -17  0.6 1646 RU3DMX <RO80MZ> R-02",
+    "231006_041145     7.074 Rx FT8    -19  0.6  843 CM7JAA R3AP R-25",
+    "231006_042915     3.567 Rx FT8    -24  0.9 1532 JJ0NFJ 333XQU R 549 2538",
+    "231006_182200     7.074 Rx FT8    -20 -0.1  925 4X1UF LB6GJ JP50",
+    "231006_214115     7.074 Rx FT8    -13  1.5 2295 CQ PB0AIC JO21",
+    "231009_050115    14.080 Rx FT4    -13  0.1  618 CQ TA2ANK KM69                        a1",
+    "231010_212330    14.074 Rx FT8      7  1.0  337 KC1NNR RR73; GI6FZI <5B4AMM> -08",
+]
+
+
+def generate(path: Path, lines: int):
+    rng = random.Random(42)
+    with open(path, "w", encoding="utf8") as fh:
+        for _ in range(lines):
+            fh.write(rng.choice(SAMPLE_LINES))
+            fh.write("\n")
+
+
+def bench(name: str, parser, path: Path, lines: int):
+    start = time.perf_counter()
+    entries = sum(1 for _ in parser(path))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>18} {elapsed:>8.2f}s {lines / elapsed:>12.0f} lines/s"
+        f" {entries / elapsed:>12.0f} entries/s"
+    )
+    return elapsed
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "ALL.TXT"
+        generate(path, lines)
+        print(f"{lines} lines, {path.stat().st_size / 1e6:.0f} MB")
+        before = bench("parseWsjtxAllLog", parseWsjtxAllLog, path, lines)
+        after = bench("scanWsjtxAllLog", scanWsjtxAllLog, path, lines)
+        print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
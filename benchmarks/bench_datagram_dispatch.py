@@ -0,0 +1,108 @@
+"""
+Dispatch of WSJT-X datagrams: Telegram.from_bytes on every datagram, as
+before, against peekHeader and a full decode of only the handled ones.
+
+The datagrams are those of one WSJT-X instance on FT8 over an hour:
+a Heartbeat every 15 s, Status telegrams, decodes, and a Replay of all
+decodes (is_new unset) requested by another companion program.
+
+    python -m benchmarks.bench_datagram_dispatch
+"""
+import random
+import time
+
+from wsjtx_srv.wsjtx import (  # type: ignore [import]
+    WSJTX_Telegram as Telegram,
+    WSJTX_Status as Status,
+    WSJTX_Decode as Decode,
+    WSJTX_Heartbeat as Heartbeat,
+)
+
+from wsjtx_influxdb.server import _DECODES, _HANDLED, peekHeader
+
+SLOTS = 240
+DECODES_PER_SLOT = 20
+MESSAGES = ["CQ SV5AZP KM46", "LB2WD SP5AA -09", "NK9R 9A5TW RR73", "CQ DX F4BKV IN95"]
+
+
+def decode(rng: random.Random, slot: int, is_new: int) -> bytes:
+    return Decode(
+        id="WSJT-X",
+        is_new=is_new,
+        time=slot * 15_000,
+        snr=rng.randint(-24, 10),
+        delta_t=0.5,
+        delta_f=rng.randint(200, 3000),
+        mode="~",
+        message=rng.choice(MESSAGES),
+        low_confidence=0,
+        off_air=0,
+    ).as_bytes()
+
+
+def make_datagrams():
+    rng = random.Random(42)
+    status = Status(
+        id="WSJT-X",
+        dial_frq=14_074_000,
+        mode="FT8",
+        dx_call="",
+        report="",
+        tx_mode="FT8",
+        tx_enabled=0,
+        xmitting=0,
+        decoding=1,
+        rx_df=1500,
+        tx_df=1500,
+        de_call="SWL",
+        de_grid="MH09me",
+        dx_grid="",
+        tx_watchdog=0,
+        sub_mode="",
+        fast_mode=0,
+        special_op=0,
+        frq_tolerance=4294967295,
+        t_r_period=4294967295,
+        config_name="Default",
+        tx_message="",
+    ).as_bytes()
+    heartbeat = Heartbeat(id="WSJT-X").as_bytes()
+
+    datagrams = []
+    for slot in range(SLOTS):
+        datagrams += [heartbeat, status, status]
+        datagrams += [decode(rng, slot, 1) for _ in range(DECODES_PER_SLOT)]
+    datagrams += [decode(rng, slot, 0) for slot in range(SLOTS) for _ in range(20)]
+    return datagrams
+
+
+def legacy_dispatch(data: bytes):
+    tel = Telegram.from_bytes(data)
+    if type(tel) not in [Status, Decode]:
+        return None
+    if isinstance(tel, Decode) and not tel.is_new:
+        return None
+    return tel
+
+
+def peek_dispatch(data: bytes):
+    kind, is_new = peekHeader(data)
+    if kind not in _HANDLED or kind in _DECODES and not is_new:
+        return None
+    return Telegram.from_bytes(data)
+
+
+def main():
+    datagrams = make_datagrams()
+    for label, func in (("before", legacy_dispatch), ("after", peek_dispatch)):
+        start = time.perf_counter()
+        handled = sum(func(data) is not None for data in datagrams)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:>7} {elapsed / len(datagrams) * 1e6:>8.1f} µs/datagram"
+            f" ({handled} of {len(datagrams)} decoded)"
+        )
+
+
+if __name__ == "__main__":
+    main()
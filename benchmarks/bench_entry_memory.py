@@ -0,0 +1,76 @@
+"""
+Memory per Entry, as held in the pending buffer: the previous dataclass
+layout against the slotted Entry with interned strings. Strings are built
+per entry, like the parsers do.
+
+    python -m benchmarks.bench_entry_memory
+"""
+import datetime
+import random
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+from wsjtx_influxdb.utils import Entry, Mode
+
+ENTRIES = 100_000
+CALLSIGNS = ["R7DX", "LB2WD", "SP5AA", "NK9R", "9A5TW", "M0WYB", "5P1KZX"]
+GRIDS = ["KN84", "JO93", "JO57", "IO81", None]
+
+
+@dataclass
+class LegacyEntry:
+    """Entry before it was slotted."""
+
+    mode: Mode
+    snr: int
+    frequency: int
+    message: str
+    time: datetime.datetime
+    receiver_grid: str
+    receiver_callsign: str
+
+    sender_grid: Optional[str] = None
+    sender_callsign: Optional[str] = None
+    target_callsign: Optional[str] = None
+
+    cq: bool = False
+
+
+def make_entries(cls, count: int):
+    rng = random.Random(42)
+    start = datetime.datetime(2023, 10, 6)
+    entries = []
+    for i in range(count):
+        sender = rng.choice(CALLSIGNS)
+        grid = rng.choice(GRIDS)
+        entries.append(
+            cls(
+                mode=Mode.FT8,
+                snr=rng.randint(-24, 10),
+                frequency=14_074_000 + rng.randint(200, 3000),
+                message=f"CQ {sender} {grid or ''}".strip(),
+                time=start + datetime.timedelta(seconds=i * 0.1),
+                # Copies, as every parsed line has its own strings
+                receiver_grid="".join(["JP", "52"]),
+                receiver_callsign="".join(["SW", "L"]),
+                sender_grid=grid and "".join(grid),
+                sender_callsign="".join(sender),
+                cq=True,
+            )
+        )
+    return entries
+
+
+def main():
+    for label, cls in (("before", LegacyEntry), ("after", Entry)):
+        tracemalloc.start()
+        entries = make_entries(cls, ENTRIES)
+        size, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:>7} {size / len(entries):>8.0f} bytes/entry")
+        del entries
+
+
+if __name__ == "__main__":
+    main()
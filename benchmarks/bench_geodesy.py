@@ -0,0 +1,107 @@
+"""
+Geodesy cache: table setup cost, lookup latency, and distance/heading for a
+flush of 10k entries, per entry against calculate_batch_distance_bearing.
+
+    python -m benchmarks.bench_geodesy
+"""
+import datetime
+import random
+import string
+import time
+
+from wsjtx_influxdb.utils import (
+    Entry,
+    GeodesyCache,
+    Mode,
+    _calculateDistanceBearing,
+    calculate_batch_distance_bearing,
+    geodesy_cache,
+)
+
+ENTRIES = 10_000
+LOOKUPS = 100_000
+RECEIVER = "JP52"
+
+
+def random_grid(rng: random.Random, length: int = 4) -> str:
+    field = string.ascii_uppercase[:18]
+    grid = "".join(
+        rng.choice(chars) for chars in (field, field, string.digits, string.digits)
+    )
+    if length == 6:
+        grid += rng.choice(string.ascii_lowercase[:24])
+        grid += rng.choice(string.ascii_lowercase[:24])
+    return grid
+
+
+def make_entries(count: int):
+    rng = random.Random(42)
+    return [
+        Entry(
+            mode=Mode.FT8,
+            snr=-10,
+            frequency=14_074_000,
+            message="CQ",
+            time=datetime.datetime(2023, 10, 6),
+            receiver_grid=RECEIVER,
+            receiver_callsign="SWL",
+            sender_grid=random_grid(rng) if rng.random() < 0.7 else None,
+        )
+        for _ in range(count)
+    ]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_cache():
+    cache = GeodesyCache()
+    print(f"table setup: {timed(cache.table, RECEIVER) * 1e3:.1f} ms")
+
+    rng = random.Random(1)
+    squares = [random_grid(rng) for _ in range(LOOKUPS)]
+    locators = [random_grid(rng, 6) for _ in range(1000)] * (LOOKUPS // 1000)
+
+    def lookups(grids):
+        for grid in grids:
+            cache.lookup(RECEIVER, grid)
+
+    def uncached(grids):
+        for grid in grids:
+            _calculateDistanceBearing(RECEIVER, grid)
+
+    for name, func, grids in (
+        ("uncached", uncached, squares),
+        ("4 char table", lookups, squares),
+        ("6 char LRU", lookups, locators),
+    ):
+        per_lookup = timed(func, grids) / len(grids)
+        print(f"{name:>14}: {per_lookup * 1e6:.2f} µs/lookup")
+    print(cache.stats())
+
+
+def per_entry(entries):
+    for entry in entries:
+        if entry.sender_grid:
+            entry.distance, entry.heading, entry.sender_coordinates
+
+
+def batch(entries):
+    calculate_batch_distance_bearing(entries).rows()
+
+
+def main():
+    bench_cache()
+
+    entries = make_entries(ENTRIES)
+    geodesy_cache.table(RECEIVER)
+    for name, func in (("per entry", per_entry), ("batch", batch)):
+        elapsed = timed(func, entries)
+        print(f"{name:>10} {elapsed * 1e3:>8.1f} ms / {ENTRIES} entries")
+
+
+if __name__ == "__main__":
+    main()
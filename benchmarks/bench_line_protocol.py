@@ -0,0 +1,70 @@
+"""
+Points/s encoding entries to line protocol: entryToInfluxdb dicts formatted
+by the influxdb client, against LineProtocolEncoder, from entries and
+from an EntryBatch (including building the batch).
+
+    python -m benchmarks.bench_line_protocol
+"""
+import datetime
+import random
+import time
+
+from influxdb.line_protocol import make_lines  # type: ignore [import]
+
+from wsjtx_influxdb.batch import EntryBatch
+from wsjtx_influxdb.influx import LineProtocolEncoder, entriesToInfluxdb
+from wsjtx_influxdb.utils import Entry, Mode
+
+POINTS = 50_000
+
+
+def make_entries(count: int):
+    rng = random.Random(42)
+    start = datetime.datetime(2023, 10, 6)
+    grids = ["IO81", "JO59", "KN84", "FN31", None, None]
+    return [
+        Entry(
+            mode=Mode.FT8,
+            snr=rng.randint(-24, 10),
+            frequency=14_074_000 + rng.randint(200, 3000),
+            message="CQ R7DX KN84",
+            time=start + datetime.timedelta(seconds=i * 0.1),
+            receiver_grid="JP52",
+            receiver_callsign="SWL",
+            sender_grid=rng.choice(grids),
+            sender_callsign="R7DX",
+            cq=True,
+        )
+        for i in range(count)
+    ]
+
+
+def dict_path(entries):
+    return make_lines({"points": list(entriesToInfluxdb(entries))})
+
+
+def direct_path(entries):
+    return "\n".join(LineProtocolEncoder().encode(entries)) + "\n"
+
+
+def batch_path(entries):
+    batch = EntryBatch.fromEntries(entries)
+    return "\n".join(LineProtocolEncoder().encodeBatch(batch)) + "\n"
+
+
+def main():
+    entries = make_entries(POINTS)
+    assert dict_path(entries) == direct_path(entries) == batch_path(entries)
+    for name, func in (
+        ("dict", dict_path),
+        ("direct", direct_path),
+        ("batch", batch_path),
+    ):
+        start = time.perf_counter()
+        func(entries)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>7} {POINTS / elapsed:>10.0f} points/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Parsing a stream of repeating messages with and without the MessageCache,
+and the memory held by the parse results, as the pending buffer keeps them.
+
+    python -m benchmarks.bench_message_cache
+"""
+import random
+import time
+import tracemalloc
+from typing import List
+
+from wsjtx_influxdb.wsjtx_extras import MessageCache, parseWsjtMessage
+
+MESSAGES = 500_000
+STATIONS = 2000
+HELD = 50_000
+RECEIVERS = 6
+
+
+def make_messages(count: int) -> List[str]:
+    """
+    CQs and QSO messages among STATIONS, few of them very active, each
+    transmission decoded by one to RECEIVERS receivers.
+    """
+    rng = random.Random(42)
+    calls = [
+        f"{rng.choice('DFGKMR')}{rng.randint(0, 9)}{i:03X}" for i in range(STATIONS)
+    ]
+    grids = [
+        f"{rng.choice('IJKL')}{rng.choice('MNO')}{rng.randint(10, 99)}" for _ in calls
+    ]
+    weights = [1 / (rank + 1) for rank in range(STATIONS)]
+    messages: List[str] = []
+    while len(messages) < count:
+        sender, target = rng.choices(range(STATIONS), weights, k=2)
+        kind = rng.random()
+        if kind < 0.4:
+            message = f"CQ {calls[sender]} {grids[sender]}"
+        elif kind < 0.7:
+            message = f"{calls[target]} {calls[sender]} {rng.randint(-24, 10):+03d}"
+        else:
+            message = f"{calls[target]} {calls[sender]} RR73"
+        # A new string per decode, like the parsers produce
+        messages += ["".join(message) for _ in range(rng.randint(1, RECEIVERS))]
+    return messages[:count]
+
+
+def main():
+    messages = make_messages(MESSAGES)
+    cache = MessageCache()
+
+    def cached(message):
+        return cache.parse(message)
+
+    def uncached(message):
+        return message, parseWsjtMessage(message)
+
+    for label, func in (("before", uncached), ("after", cached)):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>7} {elapsed / MESSAGES * 1e9:>8.0f} ns/message")
+    print(f"hit rate {cache.hitRate():.1%}, {cache.stats()}")
+
+    cache.clear()
+    for label, func in (("before", uncached), ("after", cached)):
+        tracemalloc.start()
+        held = [func(message) for message in make_messages(HELD)]
+        size, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:>7} {size / len(held):>8.0f} bytes/message")
+        del held
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+parseWsjtMessage before and after the single pass classifier, over the
+messages of the test suite.
+
+    python -m benchmarks.bench_message_parser
+"""
+import contextlib
+import io
+import random
+import time
+
+from wsjtx_influxdb.wsjtx_extras import UDP_CONN, parseWsjtMessage
+
+MESSAGES = 1_000_000
+CORPUS = [
+    "TZ3LTD/P JG4AMP/P R EC88",
+    "8P6GE RA4NCC LO68",
+    "KK4CQN RA6ABO R-04",
+    "CQ R7DX KN84",
+    "KA6BIM UN7JO +05",
+    "KE0LCS R7DX -15",
+    "YI3WHR RK4HP 73",
+    "K6BRN RZ6L RR73",
+    "ZL2BX <...> -09",
+    "RV3HSG EK5AUA/R DO88",
+    "<N6BCE> R0FBA/9",
+    "RC0AT <R0FBA/9> +08",
+    "<SV8EUL> <...> R 520305 LG83SK",
+    "CQ DX F4BKV IN95",
+    "CQ NA PF01MAX",
+    "JJ0NFJ 333XQU R 549 2538",
+    "TU; QN5HYK 649RMM R 549 2401",
+    "KC1NNR RR73; GI6FZI <5B4AMM> -08",
+    "CQ TA2ANK KM69                        a1",
+]
+
+
+def legacy_parse(message: str):
+    """parseWsjtMessage before the single pass classifier."""
+    msplit = message.strip().split()
+    cq = msplit[0].upper() == "CQ"
+    if len(msplit) > 1 and msplit[1].upper() in ("DX", "NA"):
+        msplit.pop(1)
+    sender_callsign = UDP_CONN.parse_message(message)
+    sender_grid = None
+    if cq and len(msplit) == 3:
+        if UDP_CONN.is_locator(msplit[2]):
+            sender_grid = msplit[2]
+    return cq, sender_callsign, sender_grid
+
+
+def main():
+    rng = random.Random(42)
+    messages = [rng.choice(CORPUS) for _ in range(MESSAGES)]
+    for label, func in (("before", legacy_parse), ("after", parseWsjtMessage)):
+        # The legacy parser prints unknown messages
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for message in messages:
+                func(message)
+            elapsed = time.perf_counter() - start
+        print(f"{label:>7} {elapsed / MESSAGES * 1e9:>8.0f} ns/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Mode parsing of ALL.TXT mode columns, before and after the precomputed
+lookup table.
+
+    python -m benchmarks.bench_mode
+"""
+import random
+import time
+
+from wsjtx_influxdb.utils import WSJTX_MODE_MAP, Mode
+
+LOOKUPS = 1_000_000
+# Mode column of ALL.TXT, and WSJT-X mode symbols from UDP decodes.
+NAMES = ["FT8"] * 80 + ["FT4"] * 15 + ["~", "+", "JT65", "Q65", "8PSK125"]
+
+
+def legacy_get(name: str):
+    """Mode.get before the lookup table."""
+    if len(name) == 1:
+        _wsjtx = WSJTX_MODE_MAP.get(name)
+        if _wsjtx:
+            return _wsjtx
+
+    upper_name = name.upper()
+    if upper_name in Mode.__members__:
+        return Mode[upper_name]
+
+    stripped = dict(
+        [(x.strip("_"), Mode[x]) for x in Mode.__members__.keys() if "_" in x]
+    )
+    if upper_name in stripped:
+        return stripped[upper_name]
+
+
+def main():
+    rng = random.Random(42)
+    names = [rng.choice(NAMES) for _ in range(LOOKUPS)]
+    for label, func in (("before", legacy_get), ("after", Mode.get)):
+        start = time.perf_counter()
+        for name in names:
+            func(name)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>7} {elapsed / LOOKUPS * 1e9:>8.0f} ns/lookup")
+
+
+if __name__ == "__main__":
+    main()
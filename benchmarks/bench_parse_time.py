@@ -0,0 +1,59 @@
+"""
+Conversion of WSJT-X decode times to timestamps, as done for every UDP
+decode: the previous datetime arithmetic against the TimeOfDayConverter,
+per decode and for a whole array.
+
+    python -m benchmarks.bench_parse_time
+"""
+import datetime
+import random
+import time
+
+from wsjtx_influxdb.wsjtx_extras import TimeOfDayConverter
+
+CONVERSIONS = 200_000
+# Decodes arrive in bursts sharing a 15 second slot
+BURST = 20
+
+
+def legacy_parse_time(time: int, offset: float):
+    """parse_time before the TimeOfDayConverter."""
+    now = datetime.datetime.utcnow()
+    today = now.date()
+    yesterday = today - datetime.timedelta(days=1)
+    time_delta = datetime.timedelta(milliseconds=time)
+    today_time = datetime.datetime.combine(today, datetime.time()) + time_delta
+    yesterday_time = datetime.datetime.combine(yesterday, datetime.time()) + time_delta
+    if abs(now - today_time) < abs(now - yesterday_time):
+        result = today_time
+    else:
+        result = yesterday_time
+    return result + datetime.timedelta(seconds=offset)
+
+
+def main():
+    rng = random.Random(42)
+    slot = int(time.time() % 86400) // 15 * 15_000
+    times = [slot - i // BURST * 15_000 for i in range(CONVERSIONS)]
+    offsets = [rng.uniform(-1, 2) for _ in range(CONVERSIONS)]
+    converter = TimeOfDayConverter()
+
+    runs = (
+        ("before", legacy_parse_time),
+        ("after", converter.toNanoseconds),
+    )
+    for label, func in runs:
+        start = time.perf_counter()
+        for ms, offset in zip(times, offsets):
+            func(ms, offset)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>7} {elapsed / CONVERSIONS * 1e9:>8.0f} ns/decode")
+
+    start = time.perf_counter()
+    converter.toNanosecondsMany(times, offsets)
+    elapsed = time.perf_counter() - start
+    print(f"{'batch':>7} {elapsed / CONVERSIONS * 1e9:>8.0f} ns/decode")
+
+
+if __name__ == "__main__":
+    main()
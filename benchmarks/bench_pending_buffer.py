@@ -0,0 +1,64 @@
+"""
+Flush cost of the pending entry buffer as the backlog grows.
+
+Every flush releases the same number of ready entries, while the number of
+entries still waiting in the settle window grows up to 1M. The time per
+flush should stay flat.
+
+    python -m benchmarks.bench_pending_buffer
+"""
+import datetime
+import time
+
+from wsjtx_influxdb.buffer import PendingBuffer
+from wsjtx_influxdb.utils import Entry, Mode
+
+BASE_TIME = datetime.datetime(2023, 10, 6)
+READY_PER_FLUSH = 1_000
+FLUSHES = 20
+
+
+def make_entries(count: int, start: datetime.datetime):
+    return [
+        Entry(
+            mode=Mode.FT8,
+            snr=-10,
+            frequency=14_074_000 + (i % 3000),
+            message="CQ R7DX KN84",
+            time=start + datetime.timedelta(microseconds=i),
+            receiver_grid="JP52",
+            receiver_callsign="SWL",
+        )
+        for i in range(count)
+    ]
+
+
+def bench(backlog: int):
+    buffer = PendingBuffer()
+    # Entries far in the future are never ready, they only make the heap big.
+    buffer.extend(make_entries(backlog, BASE_TIME + datetime.timedelta(days=1)))
+    ready = make_entries(READY_PER_FLUSH * FLUSHES, BASE_TIME)
+
+    now = BASE_TIME + datetime.timedelta(hours=1)
+    elapsed = 0.0
+    for i in range(FLUSHES):
+        flush = slice(i * READY_PER_FLUSH, (i + 1) * READY_PER_FLUSH)
+        buffer.extend(ready[flush])
+        start = time.perf_counter()
+        drained = buffer.drain_ready(now)
+        elapsed += time.perf_counter() - start
+        assert len(drained) == READY_PER_FLUSH
+
+    return elapsed / FLUSHES
+
+
+def main():
+    print(f"{'backlog':>10} {'ms/flush':>10} {'µs/entry':>10}")
+    for backlog in (1_000, 10_000, 100_000, 1_000_000):
+        per_flush = bench(backlog)
+        per_entry = per_flush / READY_PER_FLUSH
+        print(f"{backlog:>10} {per_flush * 1e3:>10.3f} {per_entry * 1e6:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
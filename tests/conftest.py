@@ -0,0 +1,41 @@
+import datetime
+from typing import Callable
+
+import pytest
+
+from wsjtx_influxdb.utils import Entry, Mode
+
+# At the start of a minute, so rollup windows line up with it
+BASE_TIME = datetime.datetime.fromisoformat("2023-10-06 03:51:00")
+
+
+def _make_entry(
+    seconds: float = 0,
+    snr: int = -10,
+    frequency: int = 14_075_000,
+    message: str = "CQ R7DX KN84",
+    receiver: str = "SWL",
+    mode: Mode = Mode.FT8,
+    **kwargs,
+) -> Entry:
+    return Entry(
+        mode=mode,
+        snr=snr,
+        frequency=frequency,
+        message=message,
+        time=BASE_TIME + datetime.timedelta(seconds=seconds),
+        receiver_grid="JP52",
+        receiver_callsign=receiver,
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def base_time() -> datetime.datetime:
+    return BASE_TIME
+
+
+@pytest.fixture
+def make_entry() -> Callable[..., Entry]:
+    """Makes FT8 spots received in JP52, seconds after base_time."""
+    return _make_entry
@@ -0,0 +1,77 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from wsjtx_influxdb.batch import EntryBatch
+from wsjtx_influxdb.influx import LineProtocolEncoder, Schema
+from wsjtx_influxdb.utils import Entry, Mode
+
+ENTRIES = [
+    Entry(
+        mode=Mode.FT4,
+        snr=-12,
+        frequency=7_047_500,
+        message='THX "73" \\ bye',
+        time=datetime.datetime.fromisoformat("2024-01-01 00:00:00"),
+        receiver_grid="MH09me",
+        receiver_callsign="LA1K, SWL=1",
+        target_callsign="LB2WD",
+    ),
+    Entry(
+        mode=Mode.FT8,
+        snr=8,
+        frequency=14_075_901,
+        message="CQ DX M0WYB IO81",
+        time=datetime.datetime.fromisoformat("2023-10-16 07:01:45.500000"),
+        receiver_grid="JP52",
+        receiver_callsign="SWL",
+        sender_grid="IO81",
+        sender_callsign="M0WYB",
+        cq=True,
+    ),
+    Entry(
+        mode=Mode.UNKNOWN,
+        snr=0,
+        frequency=1_000,
+        message="",
+        time=datetime.datetime.fromisoformat("2023-12-31 23:59:59.999999"),
+        receiver_grid="JP52",
+        receiver_callsign="",
+        sender_grid="JO59jw",
+    ),
+]
+
+
+def test_batch_columns():
+    batch = EntryBatch.fromEntries(ENTRIES)
+    assert len(batch) == 3
+    assert batch.frequency.tolist() == [7_047_500, 14_075_901, 1_000]
+    assert batch.mode.tolist() == [Mode.FT4.value, Mode.FT8.value, -1]
+    assert batch.cq.dtype == np.bool_
+    assert batch.band().tolist() == ["40m", "20m", None]
+    assert batch.distance()[1] == ENTRIES[1].distance
+    assert batch.heading()[1] == pytest.approx(ENTRIES[1].heading)
+    assert np.isnan(batch.heading()[0])
+    assert list(batch) == ENTRIES
+
+
+def test_batch_append_invalidates():
+    batch = EntryBatch.fromEntries(ENTRIES[:1])
+    assert batch.band().tolist() == ["40m"]
+    batch.append(ENTRIES[1])
+    assert batch.band().tolist() == ["40m", "20m"]
+    assert batch.snr.tolist() == [-12, 8]
+
+
+def test_batch_sort():
+    batch = EntryBatch.fromEntries(ENTRIES).sort()
+    assert [e.snr for e in batch] == [8, 0, -12]
+    assert batch.sender_grid == ["IO81", "JO59jw", None]
+
+
+@pytest.mark.parametrize("schema", list(Schema))
+def test_batch_line_protocol(schema):
+    encoder = LineProtocolEncoder(schema=schema)
+    expected = encoder.encode(ENTRIES)
+    assert encoder.encodeBatch(EntryBatch.fromEntries(ENTRIES)) == expected
@@ -0,0 +1,58 @@
+import datetime
+
+from wsjtx_influxdb.buffer import PendingBuffer
+
+
+def test_pending_buffer_order(make_entry, base_time):
+    buffer = PendingBuffer()
+    entries = [
+        make_entry(15, frequency=14_075_500),
+        make_entry(0, frequency=14_076_000),
+        make_entry(15, frequency=14_074_500),
+        make_entry(0, frequency=14_075_000),
+    ]
+    buffer.extend(entries)
+    assert len(buffer) == 4
+
+    ready = buffer.drain_ready(base_time + datetime.timedelta(seconds=60))
+    assert ready == [entries[3], entries[1], entries[2], entries[0]]
+    assert len(buffer) == 0
+    assert not buffer
+
+
+def test_pending_buffer_settle_window(make_entry, base_time):
+    buffer = PendingBuffer(settle_seconds=15)
+    old = make_entry(0)
+    new = make_entry(10)
+    buffer.push(new)
+    buffer.push(old)
+    assert buffer.oldest() == old.time
+
+    now = base_time + datetime.timedelta(seconds=15)
+    # Exactly at the edge of the window is not old enough yet.
+    assert buffer.drain_ready(now) == []
+    assert buffer.drain_ready(now + datetime.timedelta(microseconds=1)) == [old]
+    assert len(buffer) == 1
+
+    assert buffer.drain_ready(now + datetime.timedelta(seconds=10, microseconds=1)) == [
+        new
+    ]
+    assert buffer.oldest() is None
+
+
+def test_pending_buffer_identical_entries(make_entry, base_time):
+    buffer = PendingBuffer()
+    buffer.push(make_entry(0))
+    buffer.push(make_entry(0))
+    assert len(buffer.drain_ready(base_time + datetime.timedelta(days=1))) == 2
+
+
+def test_pending_buffer_drain_oldest(make_entry, base_time):
+    buffer = PendingBuffer()
+    buffer.extend([make_entry(2), make_entry(0), make_entry(1)])
+    assert [e.time for e in buffer.drain_oldest(2)] == [
+        base_time,
+        base_time + datetime.timedelta(seconds=1),
+    ]
+    assert len(buffer.drain_oldest(5)) == 1
+    assert not buffer
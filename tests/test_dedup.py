@@ -0,0 +1,58 @@
+from wsjtx_influxdb.dedup import DedupIndex, Deduplicator
+
+
+def test_dedup_key(make_entry):
+    index = DedupIndex()
+    assert index.add(make_entry(0.1))
+    # Same transmission, decoded with a different delta_t and frequency
+    assert not index.add(make_entry(1.3, frequency=14_075_003))
+    assert index.duplicates == 1
+
+    # Next slot, another frequency, message or receiver
+    assert index.add(make_entry(15))
+    assert index.add(make_entry(0, frequency=14_075_100))
+    assert index.add(make_entry(0, message="CQ LB2WD JP50"))
+    assert index.add(make_entry(0, receiver="LA1K"))
+    assert len(index) == 5
+
+
+def test_dedup_window(make_entry):
+    index = DedupIndex(window_seconds=60)
+    assert index.add(make_entry(0))
+    assert index.add(make_entry(45))
+    assert not index.add(make_entry(0))
+    assert index.add(make_entry(75))
+    # Forgotten, more than 60 s older than the newest decode
+    assert index.add(make_entry(0))
+    assert len(index) == 3
+
+
+def test_dedup_max_size(make_entry):
+    index = DedupIndex(max_size=2)
+    for i in range(3):
+        assert index.add(make_entry(0, frequency=14_075_000 + i * 100))
+    assert len(index) == 2
+    assert index.add(make_entry(0))
+
+
+class Sink:
+    def __init__(self):
+        self.entries = []
+        self.latencies = []
+
+    def submit(self, entry, block=False):
+        self.entries.append(entry)
+        return True
+
+    def record_latency(self, seconds):
+        self.latencies.append(seconds)
+
+
+def test_deduplicator(make_entry):
+    sink = Sink()
+    dedup = Deduplicator(sink)
+    assert dedup.submit(make_entry(0))
+    assert not dedup.submit(make_entry(1))
+    dedup.record_latency(0.001)
+    assert len(sink.entries) == 1
+    assert sink.latencies == [0.001]
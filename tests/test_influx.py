@@ -0,0 +1,198 @@
+import datetime
+import gzip
+from typing import Any, Dict, List
+
+import pytest
+from influxdb.line_protocol import make_lines  # type: ignore [import]
+
+from wsjtx_influxdb.influx import (
+    HttpWriterConfig,
+    InfluxHttpWriter,
+    LineProtocolEncoder,
+    Schema,
+    entriesToInfluxdb,
+    entryToInfluxdb,
+    escapeTag,
+    timeToNanoseconds,
+)
+from wsjtx_influxdb.batch import EntryBatch
+from wsjtx_influxdb.cardinality import countSeries
+from wsjtx_influxdb.utils import Entry, Mode
+
+ENTRIES = [
+    Entry(
+        mode=Mode.FT8,
+        snr=8,
+        frequency=14_075_901,
+        message="CQ DX M0WYB IO81",
+        time=datetime.datetime.fromisoformat("2023-10-16 07:01:45.500000"),
+        receiver_grid="JP52",
+        receiver_callsign="SWL",
+        sender_grid="IO81",
+        sender_callsign="M0WYB",
+        cq=True,
+    ),
+    Entry(
+        mode=Mode.FT4,
+        snr=-12,
+        frequency=7_047_500,
+        message='THX "73" \\ bye',
+        time=datetime.datetime.fromisoformat("2024-01-01 00:00:00"),
+        receiver_grid="MH09me",
+        receiver_callsign="LA1K, SWL=1",
+        target_callsign="LB2WD",
+    ),
+    Entry(
+        mode=Mode.UNKNOWN,
+        snr=0,
+        frequency=1_000,
+        message="",
+        time=datetime.datetime.fromisoformat("2023-12-31 23:59:59.999999"),
+        receiver_grid="JP52",
+        receiver_callsign="",
+        sender_grid="JO59jw",
+    ),
+]
+
+
+@pytest.mark.parametrize("entry", ENTRIES)
+def test_line_protocol_matches_client(entry):
+    expected = make_lines({"points": [entryToInfluxdb(entry)]})
+    encoder = LineProtocolEncoder()
+    assert encoder.encodeEntry(entry) + "\n" == expected
+
+
+@pytest.mark.parametrize("schema", list(Schema))
+def test_line_protocol_entry_matches_batch(schema):
+    encoder = LineProtocolEncoder(schema=schema)
+    # IO81 is a 4 character grid, looked up in the GeodesyCache tables
+    lines = encoder.encodeBatch(EntryBatch.fromEntries(ENTRIES))
+    assert [encoder.encodeEntry(entry) for entry in ENTRIES] == lines
+    assert "distance=1484504i" in lines[0]
+
+
+@pytest.mark.parametrize("entry", ENTRIES)
+def test_compact_line_protocol_matches_client(entry):
+    point = entryToInfluxdb(entry, schema=Schema.COMPACT)
+    assert set(point["tags"]) <= {
+        "band",
+        "cq",
+        "has_sender_grid",
+        "mode",
+        "receiver_callsign",
+    }
+    assert point["fields"]["received_hour"] == entry.time.hour
+    expected = make_lines({"points": [point]})
+    encoder = LineProtocolEncoder(schema=Schema.COMPACT)
+    assert encoder.encodeEntry(entry) + "\n" == expected
+
+
+def test_line_protocol_batch():
+    expected = make_lines({"points": list(entriesToInfluxdb(ENTRIES))})
+    lines = LineProtocolEncoder().encode(ENTRIES)
+    assert len(lines) == len(ENTRIES)
+    assert "\n".join(lines) + "\n" == expected
+
+
+def test_time_to_nanoseconds():
+    assert timeToNanoseconds(datetime.datetime(1970, 1, 1)) == 0
+    time = datetime.datetime(2023, 10, 16, 7, 1, 45, 500000)
+    assert timeToNanoseconds(time) == 1697439705500000000
+
+
+def test_escape_tag():
+    assert escapeTag("a b,c=d\\") == "a\\ b\\,c\\=d\\\\"
+
+
+class FakeClient:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.requests: List[Dict[str, Any]] = []
+
+    def request(self, **kwargs):
+        if self.fail:
+            raise ConnectionError("no route to host")
+        self.requests.append(kwargs)
+
+
+def test_http_writer_batches_by_points():
+    client = FakeClient()
+    writer = InfluxHttpWriter(client, "radio", HttpWriterConfig(batch_points=2))
+    lines = LineProtocolEncoder().encode(ENTRIES)
+    writer.write(lines)
+
+    assert len(client.requests) == 2
+    request = client.requests[0]
+    assert request["url"] == "write"
+    assert request["params"] == {"db": "radio", "precision": "n"}
+    assert request["headers"]["Content-Encoding"] == "gzip"
+    bodies = b"".join(gzip.decompress(r["data"]) for r in client.requests)
+    assert bodies.decode("utf8") == "\n".join(lines) + "\n"
+    assert writer.stats.points == len(ENTRIES)
+    assert writer.stats.requests == 2
+
+
+def test_http_writer_batches_by_bytes():
+    client = FakeClient()
+    config = HttpWriterConfig(gzip=False, batch_bytes=10)
+    writer = InfluxHttpWriter(client, "radio", config)
+    writer.write(["a" * 8, "b" * 8, "c"])
+
+    # A line larger than batch_bytes still gets a request of its own
+    assert [r["data"] for r in client.requests] == [
+        b"aaaaaaaa\n",
+        b"bbbbbbbb\n",
+        b"c\n",
+    ]
+    assert "Content-Encoding" not in client.requests[0]["headers"]
+
+
+def test_http_writer_parallel():
+    client = FakeClient()
+    config = HttpWriterConfig(gzip=False, batch_points=1, max_in_flight=3)
+    writer = InfluxHttpWriter(client, "radio", config)
+    writer.write([str(i) for i in range(10)])
+
+    assert sorted(r["data"] for r in client.requests) == sorted(
+        f"{i}\n".encode() for i in range(10)
+    )
+
+
+def test_http_writer_failure():
+    writer = InfluxHttpWriter(FakeClient(fail=True), "radio")
+    with pytest.raises(ConnectionError):
+        writer.write(["x"])
+    assert writer.stats.failures == 1
+    assert writer.stats.requests == 0
+
+
+def test_count_series():
+    entries = [
+        Entry(
+            mode=Mode.FT8,
+            snr=snr,
+            frequency=14_075_000,
+            message="CQ R7DX KN84",
+            time=datetime.datetime(2023, 10, 6, hour),
+            receiver_grid="JP52",
+            receiver_callsign="SWL, 2",
+            sender_grid="KN84",
+            cq=True,
+        )
+        for snr in range(-20, 0)
+        for hour in range(3)
+    ]
+    counters = countSeries(entries)
+    assert len(counters[Schema.FULL].series) == 60
+    assert len(counters[Schema.COMPACT].series) == 1
+    assert len(counters[Schema.FULL].tag_values["snr"]) == 20
+    assert counters[Schema.COMPACT].points == 60
+    # Escaped tag values are taken apart
+    assert set(counters[Schema.COMPACT].tag_values) == {
+        "band",
+        "cq",
+        "has_sender_grid",
+        "mode",
+        "receiver_callsign",
+    }
+    assert counters[Schema.COMPACT].tag_values["receiver_callsign"] == {"SWL\\,\\ 2"}
@@ -0,0 +1,56 @@
+import pytest
+
+from wsjtx_influxdb.reprocess import (
+    Throughput,
+    chunkFile,
+    parseChunk,
+    parseWsjtxAllLogParallel,
+)
+from wsjtx_influxdb.wsjtx_extras import parseWsjtxAllLog
+
+data = """231006_035145     3.573 Rx FT8     -9 -0.2 1446 LB2WD SP5AA -09
+231006_035145     3.573 Rx FT8    -15  0.7 2319 NK9R 9A5TW RR73
+231006_035200     3.573 Rx FT8    -10  0.9 1354 CQ DX SP2MKE JO93
+231009_190145    14.074 Rx FT8    -231009_190215    14.074 Rx FT8     15  0.5  480 CQ MI0OBR IO74
+foo bar baz
+231006_182200     7.074 Rx FT8    -16  1.2 2673 CQ 5P1KZX JO57
+231006_214115     7.074 Rx FT8    -13  1.5 2295 CQ PB0AIC JO21"""
+
+
+@pytest.mark.parametrize("chunk_size", [1, 50, 64, 1000])
+def test_chunk_file(chunk_size, tmp_path):
+    path = tmp_path / "ALL.TXT"
+    path.write_bytes(data.encode("utf8"))
+
+    ranges = chunkFile(path, chunk_size)
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        # Every chunk boundary is right after a newline.
+        assert data[start - 1] == "\n"
+
+    assert "".join(data[start:end] for start, end in ranges) == data
+
+
+def test_parse_chunk_lines(tmp_path):
+    path = tmp_path / "ALL.TXT"
+    path.write_bytes(b"foo bar baz\n\nfoo\n")
+    assert parseChunk(path, (0, 16)) == ([], 3)
+    assert parseChunk(path, (12, 17)) == ([], 2)
+
+
+@pytest.mark.parametrize("workers,chunk_size", [(1, 64), (2, 64), (3, 1000)])
+def test_parse_parallel(workers, chunk_size, tmp_path):
+    path = tmp_path / "ALL.TXT"
+    path.write_bytes(data.encode("utf8"))
+
+    throughput = Throughput(report_interval=None)
+    entries = list(
+        parseWsjtxAllLogParallel(
+            path, workers=workers, chunk_size=chunk_size, throughput=throughput
+        )
+    )
+    assert entries == list(parseWsjtxAllLog(path))
+    assert throughput.lines == 7
+    assert throughput.entries == 5
@@ -0,0 +1,57 @@
+import datetime
+
+from wsjtx_influxdb.rollup import Rollup, Rollups
+from wsjtx_influxdb.utils import EntryGeodesy
+
+
+def test_window_start(base_time):
+    rollup = Rollup(datetime.timedelta(hours=1), "entry_1h")
+    assert rollup.windowStart(base_time) == datetime.datetime(2023, 10, 6, 3)
+
+
+def test_rollup_minute(make_entry):
+    rollup = Rollup(datetime.timedelta(minutes=1), "entry_1m")
+    entries = [
+        make_entry(0, snr=-20, sender_callsign="R7DX"),
+        make_entry(15, snr=5, sender_callsign="LB2WD"),
+        make_entry(30, snr=-3, sender_callsign="R7DX"),
+        make_entry(30, snr=-3, frequency=7_074_500),
+    ]
+    geodesy = [EntryGeodesy(1000.0, 90, 0, 0), None, EntryGeodesy(2500.5, 90, 0, 0)]
+    rollup.add(entries, geodesy + [None])
+    # Nothing is known about later entries yet
+    assert rollup.close() == []
+
+    rollup.add([make_entry(60)])
+    closed = rollup.close()
+    assert [key[1] for key, _ in closed] == ["20m", "40m"]
+    (_, window), _ = closed
+    assert window.count == 3
+    assert (window.snr_min, window.snr_max) == (-20, 5)
+    assert window.senders == {"R7DX", "LB2WD"}
+    assert window.distance_max == 2500.5
+
+    assert rollup.toLineProtocol(closed)[0] == (
+        "entry_1m,band=20m,mode=FT8,receiver_callsign=SWL"
+        " count=3i,distance_max=2500.5,snr_max=5i,snr_mean=-6.0,snr_min=-20i"
+        ",unique_senders=2i 1696564260000000000"
+    )
+
+
+def test_rollup_late_entries(make_entry):
+    rollup = Rollup(datetime.timedelta(minutes=1), "entry_1m")
+    rollup.add([make_entry(0), make_entry(60)])
+    assert len(rollup.close()) == 1
+    rollup.add([make_entry(30)])
+    assert rollup.late == 1
+    assert [window.count for _, window in rollup.close(force=True)] == [1]
+
+
+def test_rollups(make_entry):
+    rollups = Rollups()
+    rollups.add([make_entry(0), make_entry(3600)])
+    lines = rollups.closedLines()
+    assert [line.split(",")[0] for line in lines] == ["entry_1m", "entry_1h"]
+    lines = rollups.closedLines(force=True)
+    assert [line.split(",")[0] for line in lines] == ["entry_1m", "entry_1h"]
+    assert rollups.closedLines(force=True) == []
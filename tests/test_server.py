@@ -0,0 +1,177 @@
+from wsjtx_srv.wsjtx import (  # type: ignore [import]
+    WSJTX_Telegram as Telegram,
+    WSJTX_Status as Status,
+    WSJTX_Decode as Decode,
+    WSJTX_Heartbeat as Heartbeat,
+    WSJTX_Replay as Replay,
+    WSJTX_WSPR_Decode as WSPRDecode,
+)
+
+from wsjtx_influxdb.server import WsjtxProtocol, peekHeader
+from wsjtx_influxdb.stats import metrics
+from wsjtx_influxdb.utils import Mode
+
+
+class Sink:
+    def __init__(self):
+        self.entries = []
+        self.latencies = []
+
+    def submit(self, entry, block=False):
+        self.entries.append(entry)
+        return True
+
+    def record_latency(self, seconds):
+        self.latencies.append(seconds)
+
+
+def status(client_id, dial_frequency, grid="MH09me", call="SWL"):
+    return Status(
+        id=client_id,
+        dial_frq=dial_frequency,
+        mode="FT8",
+        dx_call="",
+        report="",
+        tx_mode="FT8",
+        tx_enabled=0,
+        xmitting=0,
+        decoding=1,
+        rx_df=1500,
+        tx_df=1500,
+        de_call=call,
+        de_grid=grid,
+        dx_grid="",
+        tx_watchdog=0,
+        sub_mode="",
+        fast_mode=0,
+        special_op=0,
+        frq_tolerance=4294967295,
+        t_r_period=4294967295,
+        config_name="Default",
+        tx_message="",
+    ).as_bytes()
+
+
+def decode(client_id, message="CQ SV5AZP KM46", delta_f=1709, is_new=1):
+    return Decode(
+        id=client_id,
+        is_new=is_new,
+        time=81810000,
+        snr=-20,
+        delta_t=0.5,
+        delta_f=delta_f,
+        mode="~",
+        message=message,
+        low_confidence=0,
+        off_air=0,
+    ).as_bytes()
+
+
+def test_protocol_state_per_sender():
+    protocol = WsjtxProtocol(Sink())
+    address = ("192.0.2.1", 50000)
+    protocol.datagram_received(status("rig1", 14_074_000), address)
+    protocol.datagram_received(status("rig2", 7_074_000, call="LA1K"), address)
+    protocol.datagram_received(status("rig1", 14_074_000), ("192.0.2.2", 50000))
+    protocol.datagram_received(Heartbeat(id="rig3").as_bytes(), address)
+
+    assert len(protocol.receivers) == 3
+    assert protocol.receivers[(address, "rig1")].dial_frequency == 14_074_000
+    assert protocol.receivers[(address, "rig2")].dial_frequency == 7_074_000
+    assert protocol.receivers[(address, "rig2")].callsign == "LA1K"
+
+
+def test_protocol_decode():
+    sink = Sink()
+    protocol = WsjtxProtocol(sink)
+    address = ("192.0.2.1", 50000)
+
+    # Decodes before the first Status have no dial frequency, and are dropped.
+    dropped_key = ("decodes_dropped", (("reason", "no_dial_frequency"),))
+    dropped = metrics.counters.get(dropped_key, 0)
+    protocol.datagram_received(decode("rig1"), address)
+    assert sink.entries == []
+    assert metrics.counters[dropped_key] == dropped + 1
+
+    protocol.datagram_received(status("rig1", 14_074_000), address)
+    protocol.datagram_received(status("rig2", 7_074_000), address)
+    protocol.datagram_received(decode("rig1"), address)
+    protocol.datagram_received(decode("rig2"), address)
+
+    assert [e.frequency for e in sink.entries] == [14_075_709, 7_075_709]
+    assert sink.entries[0].mode == Mode.FT8
+    assert sink.entries[0].sender_callsign == "SV5AZP"
+    assert len(sink.latencies) == 2
+
+
+def wspr_decode(client_id, callsign="IU2PJI", grid="JN45", is_new=1):
+    return WSPRDecode(
+        id=client_id,
+        is_new=is_new,
+        time=7680000,
+        snr=-25,
+        delta_t=0.6000000238418579,
+        frq=10140138,
+        drift=0,
+        callsign=callsign,
+        grid=grid,
+        power=23,
+        off_air=0,
+    ).as_bytes()
+
+
+def test_peek_header():
+    assert peekHeader(status("rig1", 14_074_000)) == (Status.type, False)
+    assert peekHeader(decode("rig1")) == (Decode.type, True)
+    assert peekHeader(decode("rig1", is_new=0)) == (Decode.type, False)
+    assert peekHeader(wspr_decode("rig1")) == (WSPRDecode.type, True)
+    assert peekHeader(wspr_decode("rig1", is_new=0)) == (WSPRDecode.type, False)
+    assert peekHeader(Heartbeat(id="rig1").as_bytes()) == (Heartbeat.type, False)
+    assert peekHeader(b"") == (None, False)
+    assert peekHeader(b"\0" * 32) == (None, False)
+
+
+def test_protocol_ignored_telegrams(monkeypatch):
+    protocol = WsjtxProtocol(Sink())
+    address = ("192.0.2.1", 50000)
+
+    def counter(name, **labels):
+        return metrics.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    replays = counter("datagrams", type="Replay")
+    not_new = counter("decodes_dropped", reason="not_new")
+    invalid = counter("datagrams_dropped", reason="invalid")
+
+    def from_bytes(data):
+        raise AssertionError("decoded an ignored telegram")
+
+    monkeypatch.setattr(Telegram, "from_bytes", from_bytes)
+    protocol.datagram_received(Replay(id="rig1").as_bytes(), address)
+    protocol.datagram_received(decode("rig1", is_new=0), address)
+    protocol.datagram_received(b"not a telegram", address)
+
+    assert counter("datagrams", type="Replay") == replays + 1
+    assert counter("decodes_dropped", reason="not_new") == not_new + 1
+    assert counter("datagrams_dropped", reason="invalid") == invalid + 1
+    assert protocol.receivers == {}
+
+
+def test_protocol_wspr_decode():
+    sink = Sink()
+    protocol = WsjtxProtocol(sink)
+    address = ("192.0.2.1", 50000)
+    protocol.datagram_received(status("rig1", 10_138_700), address)
+    protocol.datagram_received(wspr_decode("rig1"), address)
+    protocol.datagram_received(
+        wspr_decode("rig1", callsign="<PA0ABC>", grid=""), address
+    )
+    protocol.datagram_received(wspr_decode("rig1", is_new=0), address)
+
+    assert [e.message for e in sink.entries] == ["IU2PJI JN45 23", "<PA0ABC> 23"]
+    entry = sink.entries[0]
+    assert entry.mode == Mode.WSPR
+    assert entry.frequency == 10_140_138
+    assert entry.snr == -25
+    assert (entry.sender_callsign, entry.sender_grid) == ("IU2PJI", "JN45")
+    assert entry.receiver_grid == "MH09me"
+    assert sink.entries[1].sender_grid is None
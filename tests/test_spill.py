@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from wsjtx_influxdb.spill import SpillQueue
+
+
+def test_spill_replay_order(tmp_path):
+    spill = SpillQueue(tmp_path)
+    assert not spill
+    spill.append(["a 1", "b 2"])
+    spill.append(["c 3"])
+    assert spill
+
+    written = []
+    assert spill.replay(written.extend) == 3
+    assert written == ["a 1", "b 2", "c 3"]
+    assert not spill
+    assert spill.replay(written.extend) == 0
+
+
+def test_spill_bounded_replay(tmp_path):
+    spill = SpillQueue(tmp_path, segment_bytes=20)
+    lines = [f"line {i:03d}" for i in range(10)]
+    spill.append(lines)
+    for line in lines:
+        spill.append([line])
+
+    requests = []
+    spill.replay(requests.append, max_bytes=30, request_bytes=25)
+    assert requests == [lines[:2], lines[2:4]]
+    spill.replay(requests.append, request_bytes=1000)
+    assert sum(requests, []) == lines * 2
+    assert not spill
+    assert os.listdir(tmp_path) == ["position"]
+
+
+def test_spill_failed_replay(tmp_path):
+    spill = SpillQueue(tmp_path)
+    spill.append(["a 1", "b 2"])
+
+    def fail(lines):
+        raise ConnectionError()
+
+    with pytest.raises(ConnectionError):
+        spill.replay(fail)
+    written = []
+    spill.replay(written.extend)
+    assert written == ["a 1", "b 2"]
+
+
+def test_spill_resume(tmp_path):
+    spill = SpillQueue(tmp_path, segment_bytes=10)
+    spill.append(["a 1", "b 2", "c 3"])
+    spill.append(["d 4"])
+    written = []
+    spill.replay(written.extend, max_bytes=1, request_bytes=8)
+    spill.close()
+    assert written == ["a 1", "b 2"]
+
+    spill = SpillQueue(tmp_path)
+    assert spill.pending_bytes == 8
+    spill.append(["e 5"])
+    spill.replay(written.extend)
+    assert written == ["a 1", "b 2", "c 3", "d 4", "e 5"]
+
+
+def test_spill_append_fsyncs(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    spill = SpillQueue(tmp_path)
+    spill.append(["a 1", "b 2"])
+    spill.append(["c 3"])
+    spill.append([])
+    assert len(synced) == 2
+
+
+def test_spill_incomplete_line(tmp_path):
+    (tmp_path / "00000001.lp").write_bytes(b"a 1\nb 2\nc")
+    spill = SpillQueue(tmp_path)
+    written = []
+    spill.replay(written.extend)
+    assert written == ["a 1", "b 2"]
+    assert not spill
+
+
+def test_spill_numbering_continues(tmp_path):
+    # Segment 1 was replayed and removed, its position was left behind
+    (tmp_path / "position").write_text('{"segment": 1, "offset": 4}')
+    spill = SpillQueue(tmp_path)
+    spill.append(["b 2"])
+    assert not (tmp_path / "00000001.lp").exists()
+    written = []
+    spill.replay(written.extend)
+    assert written == ["b 2"]
+
+
+def test_spill_crash_before_remove(tmp_path):
+    (tmp_path / "00000001.lp").write_bytes(b"a 1\n")
+    (tmp_path / "00000002.lp").write_bytes(b"b 2\n")
+    (tmp_path / "position").write_text('{"segment": 2, "offset": 0}')
+    spill = SpillQueue(tmp_path)
+    assert spill.pending_bytes == 4
+    assert not (tmp_path / "00000001.lp").exists()
+    written = []
+    spill.replay(written.extend)
+    assert written == ["b 2"]
@@ -0,0 +1,99 @@
+import datetime
+import urllib.request
+
+from wsjtx_influxdb.stats import (
+    Histogram,
+    MetricsReporter,
+    PipelineMetrics,
+    servePrometheus,
+)
+
+TIME = datetime.datetime(2023, 10, 16, 7, 1, 45)
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [(1, 2), (5, 3), (float("inf"), 4)]
+    assert histogram.sum == 14.5
+    assert histogram.max == 10
+
+
+def make_metrics() -> PipelineMetrics:
+    metrics = PipelineMetrics()
+    metrics.inc("datagrams", type="Decode")
+    metrics.inc("datagrams", type="Decode")
+    metrics.inc("decodes_dropped", reason="off_air")
+    metrics.observe("flush_seconds", 0.2)
+    metrics.gauge("queue_depth", lambda: 7)
+    return metrics
+
+
+def test_line_protocol():
+    lines = make_metrics().toLineProtocol(TIME)
+    assert lines[0] == (
+        "wsjtx_influxdb_stats,metric=datagrams,type=Decode count=2i"
+        " 1697439705000000000"
+    )
+    assert lines[1].startswith(
+        "wsjtx_influxdb_stats,metric=decodes_dropped,reason=off_air count=1i"
+    )
+    assert "count=1i,le_0.0001=0i," in lines[2]
+    assert ",le_0.5=1i," in lines[2]
+    assert ",le_inf=1i,max=0.2,sum=0.2 " in lines[2]
+    assert lines[3].startswith("wsjtx_influxdb_stats,metric=queue_depth value=7.0 ")
+
+
+def test_line_protocol_gauge_field_type():
+    metrics = PipelineMetrics()
+    metrics.gauge("queue_depth", lambda: 7)
+    metrics.gauge("message_cache_hit_rate", lambda: 0.5)
+    values = [line.split(" ")[1] for line in metrics.toLineProtocol(TIME)]
+    assert values == ["value=0.5", "value=7.0"]
+
+
+def test_prometheus():
+    text = make_metrics().toPrometheus()
+    assert "# TYPE wsjtx_influxdb_datagrams_total counter" in text
+    assert 'wsjtx_influxdb_datagrams_total{type="Decode"} 2' in text
+    assert 'wsjtx_influxdb_flush_seconds_bucket{le="0.1"} 0' in text
+    assert 'wsjtx_influxdb_flush_seconds_bucket{le="+Inf"} 1' in text
+    assert "wsjtx_influxdb_flush_seconds_count 1" in text
+    assert "wsjtx_influxdb_queue_depth 7" in text
+
+
+def test_timer():
+    metrics = PipelineMetrics()
+    with metrics.timer("parse_seconds", source="udp"):
+        pass
+    assert metrics.histograms[("parse_seconds", (("source", "udp"),))].count == 1
+
+
+def test_failing_gauge():
+    metrics = PipelineMetrics()
+    metrics.gauge("broken", lambda: 1 / 0)
+    assert metrics.toLineProtocol(TIME) == []
+
+
+def test_reporter():
+    written = []
+    reporter = MetricsReporter(written.append, metrics=make_metrics())
+    reporter.report()
+    assert len(written[0]) == 4
+
+    def fail(lines):
+        raise ConnectionError()
+
+    MetricsReporter(fail, metrics=make_metrics()).report()
+
+
+def test_prometheus_endpoint():
+    server = servePrometheus(0, "127.0.0.1", make_metrics())
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert b"wsjtx_influxdb_queue_depth 7" in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,97 @@
+import datetime
+import os
+
+from wsjtx_influxdb.tail import AllLogTailer, Checkpoint
+
+LINES = [
+    b"231006_035145     3.573 Rx FT8     -9 -0.2 1446 LB2WD SP5AA -09\n",
+    b"231006_035145     3.573 Rx FT8    -15  0.7 2319 NK9R 9A5TW RR73\n",
+    b"231006_035200     3.573 Rx FT8    -10  0.9 1354 CQ DX SP2MKE JO93\n",
+    b"231006_182200     7.074 Rx FT8    -16  1.2 2673 CQ 5P1KZX JO57\n",
+]
+
+
+def read(tmp_path):
+    tailer = AllLogTailer(tmp_path / "ALL.TXT", tmp_path / "state")
+    messages = [e.message for e in tailer.read_available()]
+    tailer.confirm()
+    return messages
+
+
+def test_checkpoint(tmp_path):
+    path = tmp_path / "state"
+    assert Checkpoint.load(path) == Checkpoint()
+    Checkpoint(inode=5, offset=10, last_time="2023-10-06T03:51:44.800000").save(path)
+    assert Checkpoint.load(path).offset == 10
+
+
+def test_tail_resume(tmp_path):
+    log = tmp_path / "ALL.TXT"
+    assert read(tmp_path) == []
+
+    # The last line is incomplete, and is left for later.
+    log.write_bytes(LINES[0] + LINES[1][:20])
+    assert read(tmp_path) == ["LB2WD SP5AA -09"]
+    assert Checkpoint.load(tmp_path / "state").offset == len(LINES[0])
+
+    with open(log, "ab") as fh:
+        fh.write(LINES[1][20:] + LINES[2])
+    assert read(tmp_path) == ["NK9R 9A5TW RR73", "CQ DX SP2MKE JO93"]
+    assert read(tmp_path) == []
+
+
+def test_tail_follow_append(tmp_path):
+    log = tmp_path / "ALL.TXT"
+    log.write_bytes(LINES[0])
+    tailer = AllLogTailer(log, tmp_path / "state")
+    assert len(list(tailer.read_available())) == 1
+    with open(log, "ab") as fh:
+        fh.write(LINES[1])
+    assert [e.message for e in tailer.read_available()] == ["NK9R 9A5TW RR73"]
+
+
+def test_tail_rotation(tmp_path):
+    log = tmp_path / "ALL.TXT"
+    log.write_bytes(LINES[0] + LINES[1])
+    tailer = AllLogTailer(log, tmp_path / "state")
+    assert len(list(tailer.read_available())) == 2
+
+    os.rename(log, tmp_path / "ALL.TXT.1")
+    with open(tmp_path / "ALL.TXT.1", "ab") as fh:
+        fh.write(LINES[2])
+    log.write_bytes(LINES[3])
+    assert [e.message for e in tailer.read_available()] == [
+        "CQ DX SP2MKE JO93",
+        "CQ 5P1KZX JO57",
+    ]
+
+
+def test_tail_truncation(tmp_path):
+    log = tmp_path / "ALL.TXT"
+    log.write_bytes(LINES[0] + LINES[1] + LINES[2])
+    assert len(read(tmp_path)) == 3
+
+    # Entries older than the last one imported are skipped after truncation.
+    log.write_bytes(LINES[1] + LINES[3])
+    assert read(tmp_path) == ["CQ 5P1KZX JO57"]
+
+
+def test_tail_checkpoint_trails_confirm(tmp_path):
+    log = tmp_path / "ALL.TXT"
+    state = tmp_path / "state"
+    log.write_bytes(LINES[0])
+    tailer = AllLogTailer(log, state)
+    first = list(tailer.read_available())
+    with open(log, "ab") as fh:
+        fh.write(LINES[2])
+    assert len(list(tailer.read_available())) == 1
+
+    # Nothing written yet: a restart reads everything again
+    assert Checkpoint.load(state) == Checkpoint()
+    tailer.confirm(first[0].time)
+    assert Checkpoint.load(state) == Checkpoint()
+
+    # Only the first chunk is older than the oldest entry not yet written
+    tailer.confirm(first[0].time + datetime.timedelta(seconds=1))
+    assert Checkpoint.load(state).offset == len(LINES[0])
+    assert read(tmp_path) == ["CQ DX SP2MKE JO93"]
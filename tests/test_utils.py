@@ -1,4 +1,6 @@
 import datetime
+import pickle
+import sys
 from io import StringIO
 
 import pytest
@@ -10,6 +12,15 @@ from wsjtx_influxdb.utils import (
     FrequencyRange,
     Mode,
     DecimalDegrees,
+    calculate_batch_distance_bearing,
+    GeodesyCache,
+    gridSquareIndex,
+    GRID_SQUARES,
+    BandIndex,
+    getBandplan,
+    frequenciesToBands,
+    unknown_bands,
+    mode_misses,
 )
 
 bandplan_data = """
@@ -30,15 +41,123 @@ def test_parse_bandplan():
         (1, None),
         (10_110_000, "30m"),
         (27.075e6, "CB27"),
-        # Currently conflicts with 70cm HAM band.
-        # TODO: Make frequencyToBand return the most specific/narrowest range?
-        # (446.09375e6, "PMR446"),
+        # Within the 70cm HAM band, the narrowest range wins.
+        (446.09375e6, "PMR446"),
+        (445.9e6, "70cm"),
+        (446.1e6, "PMR446"),
     ],
 )
 def test_frequency_to_band(frequency, band):
     assert frequencyToBand(frequency) == band
 
 
+def test_frequency_to_band_unknown(capsys):
+    count = unknown_bands.count
+    assert frequencyToBand(12_345) is None
+    assert frequencyToBand(12_345) is None
+    assert unknown_bands.count == count + 2
+    assert unknown_bands.frequencies[12_345] >= 2
+    # Reported at most once per interval
+    assert capsys.readouterr().out.count("Unknown band") <= 1
+
+
+def scanBandplan(bandplan, frequency):
+    """The narrowest range containing frequency, first one if equally wide."""
+    band = None
+    width = None
+    for name, frequency_range in bandplan.items():
+        if frequency in frequency_range:
+            range_width = frequency_range.maximum - frequency_range.minimum
+            if width is None or range_width < width:
+                band, width = name, range_width
+    return band
+
+
+def test_band_index():
+    bandplan = parseBandplanCsv(StringIO(bandplan_data))
+    index = BandIndex(bandplan)
+    frequencies = [
+        1,
+        10_099_999,
+        10_100_000,
+        10_125_000,
+        10_150_000,
+        10_150_000.5,
+        10_150_001,
+        26_960_000,
+        27_999_999.5,
+        28_000_000,
+        28_000_000.5,
+        29_700_000,
+        29_700_001,
+    ]
+    expected = [scanBandplan(bandplan, f) for f in frequencies]
+    assert [index.lookup(f) for f in frequencies] == expected
+    # Memoized
+    assert [index.lookup(f) for f in frequencies] == expected
+    assert list(index.lookup_many(frequencies)) == expected
+    assert expected[9] == "CB27"
+
+
+def test_band_index_narrowest():
+    bandplan = parseBandplanCsv(
+        StringIO("20m;14.000;14.350\n20m FT8;14.074;14.077\n20m FT8 DX;14.076;14.077\n")
+    )
+    index = BandIndex(bandplan)
+    frequencies = [
+        14_073_999,
+        14_074_000,
+        14_075_500,
+        14_076_000,
+        14_077_000,
+        14_077_001,
+    ]
+    expected = ["20m", "20m FT8", "20m FT8", "20m FT8 DX", "20m FT8 DX", "20m"]
+    assert [index.lookup(f) for f in frequencies] == expected
+    assert list(index.lookup_many(frequencies)) == expected
+
+
+def test_band_index_full_bandplan():
+    bandplan = getBandplan()
+    index = BandIndex(bandplan, memo_size=0)
+    bounds = [bound for r in bandplan.values() for bound in r]
+    frequencies = sorted({bound + d for bound in bounds for d in (-1, 0, 1)})
+    expected = [scanBandplan(bandplan, f) for f in frequencies]
+    assert [index.lookup(f) for f in frequencies] == expected
+    assert list(index.lookup_many(frequencies)) == expected
+    assert list(frequenciesToBands([14_074_000, 1])) == ["20m", None]
+
+
+def test_band_index_dial():
+    bandplan = getBandplan()
+    index = BandIndex(bandplan, memo_size=4)
+    bounds = [bound for r in bandplan.values() for bound in r]
+    # Decodes at and above each dial, crossing the bounds next to it
+    for dial in sorted({bound + d for bound in bounds for d in (-3000, -1, 0)}):
+        for offset in (0, 1, 200, 3000, 6000):
+            expected = scanBandplan(bandplan, dial + offset)
+            assert index.lookup(dial + offset, dial) == expected
+    assert index._dialPiece.cache_info().currsize == 4
+
+    entry = Entry(
+        mode=Mode.FT8,
+        snr=-10,
+        frequency=14_075_709,
+        message="CQ SV5AZP KM46",
+        time=datetime.datetime(2023, 10, 6, 3, 51),
+        receiver_grid="JP52",
+        receiver_callsign="SWL",
+        dial_frequency=14_074_000,
+    )
+    assert entry.band_name == scanBandplan(bandplan, 14_075_709)
+
+
+def test_band_index_empty():
+    index = BandIndex({})
+    assert index.lookup(14_074_000) is None
+    assert list(index.lookup_many([14_074_000])) == [None]
+
+
 def test_frequencyrange():
     range = FrequencyRange(10.1e6, 10.15e6)
     assert 10.1e6 in range
@@ -59,13 +178,28 @@ def test_frequencyrange():
         ("~", Mode.FT8, "FT8"),
         ("OLIVIA8", Mode.OLIVIA8, "OLIVIA8"),
         ("8psk125", Mode._8PSK125, "8PSK125"),
+        ("_8PSK125", Mode._8PSK125, "8PSK125"),
+        ("ft4", Mode.FT4, "FT4"),
+        ("+", Mode.FT4, "FT4"),
+        ("SITOR-B", Mode.SITORB, "SITORB"),
+        ("Olivia-8", Mode.OLIVIA8, "OLIVIA8"),
+        ("USB", Mode.SSB, "SSB"),
     ],
 )
 def test_mode(input, mode, output):
+    assert Mode.get(input) == mode
+    # Second lookup is served from the cache of seen names
     assert Mode.get(input) == mode
     assert str(mode) == output
 
 
+@pytest.mark.parametrize("input", ["x", "FT9", "", "unknown"])
+def test_mode_unknown(input):
+    misses = mode_misses[input]
+    assert Mode.get(input) is Mode.UNKNOWN
+    assert mode_misses[input] == misses + 1
+
+
 @pytest.mark.parametrize(
     "gridsquare,latitude,longitude,accuracy",
     [
@@ -89,6 +223,35 @@ def test_decimaldegrees(gridsquare, latitude, longitude, accuracy):
     assert dd.toGridsquare(precission=len(gridsquare) / 2) == gridsquare
 
 
+def test_entry_slots():
+    entry = Entry(
+        mode=Mode.FT8,
+        snr=8,
+        frequency=14_075_901,
+        message="CQ DX M0WYB IO81",
+        time=datetime.datetime.fromisoformat("2023-10-16 07:01:45.500000"),
+        receiver_grid="".join(["JP", "52"]),
+        receiver_callsign="SWL",
+        sender_grid="IO81",
+    )
+    assert not hasattr(entry, "__dict__")
+    assert entry.receiver_grid is sys.intern("JP52")
+
+    distance = entry.distance
+    assert entry.distance is distance
+    assert entry.band_name == "20m"
+
+    copy = pickle.loads(pickle.dumps(entry))
+    assert copy == entry
+    assert copy.distance == distance
+    assert copy != Entry(**{**vars_of(entry), "snr": 1})
+    assert repr(entry).startswith("Entry(mode=<Mode.FT8: 3>, snr=8, ")
+
+
+def vars_of(entry: Entry) -> dict:
+    return {name: getattr(entry, name) for name in Entry._FIELDS}
+
+
 def test_entry():
     entry = Entry(
         mode=Mode.FT8,
@@ -132,3 +295,83 @@ def test_entry():
     assert entry.distance is None
     assert entry.heading is None
     assert entry.sender_coordinates is None
+
+
+def test_batch_distance_bearing():
+    grids = ["IO81", None, "MH09me", "JJ00aa00", "AA00", "", "RR99xx"]
+    entries = [
+        Entry(
+            mode=Mode.FT8,
+            snr=0,
+            frequency=14_075_901,
+            message="CQ",
+            time=datetime.datetime.fromisoformat("2023-10-16 07:01:45.500000"),
+            receiver_grid="JP52" if i % 2 else "MH09me",
+            receiver_callsign="SWL",
+            sender_grid=grid,
+        )
+        for i, grid in enumerate(grids)
+    ]
+
+    rows = calculate_batch_distance_bearing(entries).rows()
+    assert len(rows) == len(entries)
+    for entry, row in zip(entries, rows):
+        if not entry.sender_grid:
+            assert row is None
+            continue
+        assert row.distance == entry.distance
+        assert row.heading == entry.heading
+        coords = entry.sender_coordinates
+        assert (row.latitude, row.longitude) == (coords.latitude, coords.longitude)
+
+    assert calculate_batch_distance_bearing([]).rows() == []
+
+
+@pytest.mark.parametrize(
+    "gridsquare,index",
+    [
+        ("AA00", 0),
+        ("AA01", 1),
+        ("AA10", 10),
+        ("AB00", 100),
+        ("BA00", 1800),
+        ("RR99", GRID_SQUARES - 1),
+        ("jo59", gridSquareIndex("JO59")),
+        ("JO59jw", -1),
+        ("SA00", -1),
+        ("JOAA", -1),
+        ("", -1),
+    ],
+)
+def test_grid_square_index(gridsquare, index):
+    assert gridSquareIndex(gridsquare) == index
+
+
+def test_geodesy_cache():
+    cache = GeodesyCache(maxsize=2)
+
+    res = cache.lookup("JP52", "IO81")
+    assert res.distance == 1_484_504
+    assert (type(res.distance), type(res.bearing)) == (int, float)
+    assert res.bearing == pytest.approx(220.863, abs=0.0005)
+    assert cache.stats()["tables"] == 1
+    assert cache.stats()["table_hits"] == 1
+
+    assert cache.lookup("JP52", "IO81jw") == cache.lookup("JP52", "IO81jw")
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 0)
+
+    # Corners are not in the table
+    cache.lookup("JP52", "IO81", center=False)
+    cache.lookup("JP52", "JO59jw")
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 3, 1)
+    assert cache.stats()["size"] == 2
+
+    cache.clear()
+    assert cache.stats() == {
+        "tables": 0,
+        "table_hits": 0,
+        "hits": 0,
+        "misses": 0,
+        "evictions": 0,
+        "size": 0,
+    }
@@ -0,0 +1,229 @@
+import datetime
+import socket
+
+import influxdb  # type: ignore [import]
+import pytest
+
+from wsjtx_influxdb.buffer import PendingBuffer
+from wsjtx_influxdb.influx import InfluxHttpWriter
+from wsjtx_influxdb.writer import (
+    BackgroundWriter,
+    CircuitState,
+    FlushScheduler,
+    OverflowPolicy,
+)
+
+
+def no_flush(buffer: PendingBuffer, force: bool):
+    pass
+
+
+@pytest.mark.parametrize(
+    "policy,accepted,kept",
+    [
+        (OverflowPolicy.DROP_NEWEST, [True, True, False], [0, 1]),
+        (OverflowPolicy.DROP_OLDEST, [True, True, True], [1, 2]),
+    ],
+)
+def test_writer_overflow(policy, accepted, kept, make_entry):
+    writer = BackgroundWriter(no_flush, queue_size=2, policy=policy)
+    assert [writer.submit(make_entry(i, snr=i)) for i in range(3)] == accepted
+    assert writer.queue_depth() == 2
+    assert writer.stats.dropped == 1
+    assert [writer.queue.get_nowait().snr for _ in range(2)] == kept
+
+
+def test_writer_flush(make_entry, base_time):
+    flushed = []
+    forced = []
+
+    def flush(buffer: PendingBuffer, force: bool):
+        forced.append(force)
+        # Entries are only released by the final flush
+        if force:
+            flushed.extend(buffer.drain_ready(base_time + datetime.timedelta(days=1)))
+
+    writer = BackgroundWriter(flush, batch_size=2, tick=0.01, stats_interval=None)
+    writer.start()
+    for snr in (3, 1, 2):
+        writer.submit(make_entry(snr, snr=snr), block=True)
+    writer.record_latency(0.002)
+    writer.stop(timeout=5)
+
+    assert not writer.is_alive()
+    assert sorted(e.snr for e in flushed) == [1, 2, 3]
+    assert forced[-1] is True
+    assert writer.stats.submitted == 3
+    assert "recv_latency_max=2.000ms" in writer.stats.summary(0, 0)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_scheduler_triggers():
+    clock = FakeClock()
+    scheduler = FlushScheduler(interval=10, batch_size=5, max_age=30, clock=clock)
+    assert scheduler.should_flush(1)
+    scheduler.record_success()
+
+    assert not scheduler.should_flush(1, oldest_age=20)
+    assert scheduler.should_flush(5)
+    assert scheduler.should_flush(1, oldest_age=30)
+    clock.now += 10
+    assert scheduler.should_flush(1)
+
+
+def test_scheduler_backoff_and_circuit():
+    clock = FakeClock()
+    scheduler = FlushScheduler(
+        batch_size=1,
+        backoff_initial=2,
+        jitter=0,
+        failure_threshold=3,
+        open_seconds=100,
+        clock=clock,
+    )
+    scheduler.record_failure()
+    assert scheduler.status().next_flush_in == 2
+    assert not scheduler.should_flush(1000)
+    clock.now += 2
+    assert scheduler.should_flush(0)
+
+    scheduler.record_failure()
+    assert scheduler.status().next_flush_in == 4
+    clock.now += 4
+    scheduler.record_failure()
+    status = scheduler.status()
+    assert status.circuit is CircuitState.OPEN
+    assert status.consecutive_failures == 3
+    assert status.next_flush_in == 100
+
+    clock.now += 100
+    assert scheduler.should_flush(0)
+    assert scheduler.circuit is CircuitState.HALF_OPEN
+    # A failed trial opens the circuit again
+    scheduler.record_failure()
+    assert scheduler.circuit is CircuitState.OPEN
+    assert not scheduler.should_flush(1000)
+
+    clock.now += 100
+    assert scheduler.should_flush(0)
+    scheduler.record_success()
+    assert scheduler.circuit is CircuitState.CLOSED
+    assert str(scheduler.status()) == "circuit=closed failures=0 next_flush_in=0.0s"
+
+
+def test_scheduler_jitter():
+    clock = FakeClock()
+    scheduler = FlushScheduler(backoff_initial=10, jitter=0.5, clock=clock)
+    scheduler.record_failure()
+    assert 5 <= scheduler.status().next_flush_in <= 10
+
+
+def test_writer_backs_off_after_failure(make_entry):
+    calls = []
+
+    def flush(buffer: PendingBuffer, force: bool):
+        calls.append(force)
+        return False
+
+    clock = FakeClock()
+    scheduler = FlushScheduler(backoff_initial=60, clock=clock)
+    writer = BackgroundWriter(flush, scheduler=scheduler)
+    writer.buffer.push(make_entry(1, snr=1))
+    writer._flush(False)
+    writer._flush(False)
+    assert calls == [False]
+    assert scheduler.consecutive_failures == 1
+    # The final flush ignores the backoff
+    writer._flush(True)
+    assert calls == [False, True]
+
+
+def test_writer_survives_failing_flush(make_entry):
+    calls = []
+
+    def flush(buffer: PendingBuffer, force: bool):
+        calls.append(force)
+        raise OSError("spill file")
+
+    clock = FakeClock()
+    scheduler = FlushScheduler(clock=clock)
+    writer = BackgroundWriter(
+        flush, tick=0.01, stats_interval=None, scheduler=scheduler
+    )
+    writer.start()
+    writer.submit(make_entry(1, snr=1), block=True)
+    writer.stop(timeout=5)
+
+    assert not writer.is_alive()
+    assert calls[-1] is True
+    assert scheduler.consecutive_failures == len(calls)
+
+
+def test_writer_stalled_influxdb(make_entry, base_time):
+    # Accepts connections, but never answers
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        client = influxdb.InfluxDBClient(
+            "127.0.0.1", server.getsockname()[1], timeout=0.2, retries=1
+        )
+        http_writer = InfluxHttpWriter(client, "radio")
+
+        def flush(buffer: PendingBuffer, force: bool):
+            buffer.drain_ready(base_time + datetime.timedelta(days=1))
+            http_writer.write(["entry snr=1i"])
+
+        scheduler = FlushScheduler()
+        writer = BackgroundWriter(
+            flush, tick=0.01, stats_interval=None, scheduler=scheduler
+        )
+        writer.start()
+        writer.submit(make_entry(1, snr=1), block=True)
+        writer.stop(timeout=5)
+
+    assert not writer.is_alive()
+    assert scheduler.consecutive_failures == 1
+    assert http_writer.stats.failures == 1
+
+
+def test_writer_stop_when_thread_died(make_entry):
+    writer = BackgroundWriter(no_flush, queue_size=1, tick=0.01)
+    writer.run = lambda: None
+    writer.start()
+    writer.join(timeout=5)
+    writer.submit(make_entry(1, snr=1))
+
+    # Neither blocks on the full queue
+    assert writer.submit(make_entry(2, snr=2), block=True) is False
+    writer.stop(timeout=5)
+
+
+def test_writer_overflow_while_backing_off(make_entry):
+    spilled = []
+
+    def overflow(buffer: PendingBuffer):
+        if len(buffer) > 1:
+            spilled.extend(buffer.drain_oldest(len(buffer) - 1))
+
+    def flush(buffer: PendingBuffer, force: bool):
+        return False
+
+    clock = FakeClock()
+    scheduler = FlushScheduler(backoff_initial=60, clock=clock)
+    writer = BackgroundWriter(flush, scheduler=scheduler, overflow=overflow)
+    writer.buffer.push(make_entry(1, snr=1))
+    writer._flush(False)
+    assert scheduler.consecutive_failures == 1
+
+    for snr in (2, 3):
+        writer.buffer.push(make_entry(snr, snr=snr))
+        writer._overflow()
+        # Still backing off, no flush
+        assert not scheduler.should_flush(len(writer.buffer))
+    assert [e.snr for e in spilled] == [1, 2]
+    assert len(writer.buffer) == 1
@@ -4,14 +4,32 @@ from wsjtx_influxdb.config import RECEIVER_CALLSIGN, RECEIVER_GRID
 from wsjtx_influxdb.utils import Entry, Mode
 
 from wsjtx_influxdb.wsjtx_extras import (
+    MessageCache,
+    TimeOfDayConverter,
     parse_time,
     parseWsjtMessage,
     parseWsjtxAllLog,
     parseWsjtxAllLogLine,
+    parseWsjtxAllLogLineFast,
+    scanWsjtxAllLog,
     UDP_CONN,
 )
 
 
+def parseWsjtxAllLogLineBytes(line: str):
+    return parseWsjtxAllLogLineFast(line.encode("utf8"))
+
+
+@pytest.fixture(params=[parseWsjtxAllLogLine, parseWsjtxAllLogLineBytes])
+def line_parser(request):
+    return request.param
+
+
+@pytest.fixture(params=[parseWsjtxAllLog, scanWsjtxAllLog])
+def log_parser(request):
+    return request.param
+
+
 # WSPR_Decode is_new=1 time=7680000 snr=-25 delta_t=0.6000000238418579 frq=10140138 drift=0 callsign=IU2PJI grid=JN45 power=23 off_air=0
 # Status dial_frq=14074000 mode=FT8 dx_call=ZD9W report=0 tx_mode=FT8 tx_enabled=0 xmitting=0 decoding=1 rx_df=2259 tx_df=1500 de_call=SWL de_grid=MH09me dx_grid=None tx_watchdog=0 sub_mode=None fast_mode=0 special_op=0 frq_tolerance=4294967295 t_r_period=4294967295 config_name=Default tx_message=None
 # Decode is_new=1 time=81810000 snr=-20 delta_t=0.5 delta_f=1709 mode=~ message=CQ SV5AZP KM46 low_confidence=0 off_air=0
@@ -30,33 +48,114 @@ def test_parse_time(time, delta_t, expected):
     assert parsed.time() == expected_time
 
 
+def _ns(*args) -> int:
+    delta = datetime.datetime(*args) - datetime.datetime(1970, 1, 1)
+    return (delta // datetime.timedelta(microseconds=1)) * 1000
+
+
+@pytest.mark.parametrize(
+    "now,time,expected",
+    [
+        ((2023, 10, 6, 12, 0, 0), 43_185_000, (2023, 10, 6, 11, 59, 45)),
+        # Decoded before midnight, received just after
+        ((2023, 10, 7, 0, 0, 2), 86_385_000, (2023, 10, 6, 23, 59, 45)),
+        # The clock running slightly behind WSJT-X
+        ((2023, 10, 6, 23, 59, 59), 0, (2023, 10, 7, 0, 0, 0)),
+        ((2023, 10, 7, 0, 0, 0), 0, (2023, 10, 7, 0, 0, 0)),
+    ],
+)
+def test_time_of_day_converter(now, time, expected):
+    converter = TimeOfDayConverter(clock=lambda: _ns(*now))
+    assert converter.toNanoseconds(time) == _ns(*expected)
+    assert converter.toNanoseconds(time, 0.5) == _ns(*expected) + 500_000_000
+    assert converter.toNanosecondsMany([time], [0.5]).tolist() == [
+        _ns(*expected) + 500_000_000
+    ]
+
+
+def test_time_of_day_converter_rollover():
+    now = [_ns(2023, 10, 6, 23, 59, 50)]
+    converter = TimeOfDayConverter(clock=lambda: now[0])
+    slot = 86_385_000  # 23:59:45
+    assert converter.toNanoseconds(slot) == _ns(2023, 10, 6, 23, 59, 45)
+    # Same slot after midnight: still yesterday, from the cached result or not
+    now[0] = _ns(2023, 10, 7, 0, 0, 1)
+    assert converter.toNanoseconds(slot) == _ns(2023, 10, 6, 23, 59, 45)
+    assert converter.toNanoseconds(0) == _ns(2023, 10, 7)
+    # Until the slot is closer today than yesterday
+    now[0] = _ns(2023, 10, 7, 11, 59, 44)
+    assert converter.toNanoseconds(slot) == _ns(2023, 10, 6, 23, 59, 45)
+    now[0] = _ns(2023, 10, 7, 11, 59, 46)
+    assert converter.toNanoseconds(slot) == _ns(2023, 10, 7, 23, 59, 45)
+
+
 @pytest.mark.parametrize(
     "message,expected",
     [
         # EC88 looks like locator.
-        ("TZ3LTD/P JG4AMP/P R EC88", (False, "JG4AMP/P", None)),
+        ("TZ3LTD/P JG4AMP/P R EC88", (False, "JG4AMP/P", None, "TZ3LTD/P", None)),
         # LO68 looks like locator.
-        ("8P6GE RA4NCC LO68", (False, "RA4NCC", None)),
-        ("KK4CQN RA6ABO R-04", (False, "RA6ABO", None)),
-        ("CQ R7DX KN84", (True, "R7DX", "KN84")),
-        ("KA6BIM UN7JO +05", (False, "UN7JO", None)),
-        ("KE0LCS R7DX -15", (False, "R7DX", None)),
-        ("YI3WHR RK4HP 73", (False, "RK4HP", None)),
-        ("K6BRN RZ6L RR73", (False, "RZ6L", None)),
-        ("ZL2BX <...> -09", (False, "<...>", None)),
+        ("8P6GE RA4NCC LO68", (False, "RA4NCC", None, "8P6GE", None)),
+        ("KK4CQN RA6ABO R-04", (False, "RA6ABO", None, "KK4CQN", -4)),
+        ("CQ R7DX KN84", (True, "R7DX", "KN84", None, None)),
+        ("KA6BIM UN7JO +05", (False, "UN7JO", None, "KA6BIM", 5)),
+        ("KE0LCS R7DX -15", (False, "R7DX", None, "KE0LCS", -15)),
+        ("YI3WHR RK4HP 73", (False, "RK4HP", None, "YI3WHR", None)),
+        ("K6BRN RZ6L RR73", (False, "RZ6L", None, "K6BRN", None)),
+        ("ZL2BX <...> -09", (False, "<...>", None, "ZL2BX", -9)),
         # DO88 looks like locator
-        ("RV3HSG EK5AUA/R DO88", (False, "EK5AUA/R", None)),
-        ("<N6BCE> R0FBA/9", (False, "R0FBA/9", None)),
-        ("RC0AT <R0FBA/9> +08", (False, "<R0FBA/9>", None)),
-        ("<SV8EUL> <...> R 520305 LG83SK", (False, None, None)),
-        ("CQ DX F4BKV IN95", (True, "F4BKV", "IN95")),
-        ("CQ NA PF01MAX", (True, "PF01MAX", None)),
+        ("RV3HSG EK5AUA/R DO88", (False, "EK5AUA/R", None, "RV3HSG", None)),
+        ("<N6BCE> R0FBA/9", (False, "R0FBA/9", None, "<N6BCE>", None)),
+        ("RC0AT <R0FBA/9> +08", (False, "<R0FBA/9>", None, "RC0AT", 8)),
+        ("<SV8EUL> <...> R 520305 LG83SK", (False, "<...>", None, "<SV8EUL>", None)),
+        ("CQ DX F4BKV IN95", (True, "F4BKV", "IN95", None, None)),
+        ("CQ NA PF01MAX", (True, "PF01MAX", None, None, None)),
+        ("CQ TEST K1ABC FN42", (True, "K1ABC", "FN42", None, None)),
+        ("CQ 145 K1ABC", (True, "K1ABC", None, None, None)),
+        ("CQ TA2ANK KM69 a1", (True, "TA2ANK", "KM69", None, None)),
+        ("QRZ K1ABC FN42", (False, "K1ABC", "FN42", None, None)),
+        ("CQ DX", (True, None, None, None, None)),
+        ("CQ FN42", (True, None, None, None, None)),
+        ("CQ RR73", (True, None, None, None, None)),
+        ("CQ 145", (True, None, None, None, None)),
+        ("K1ABC W9XYZ 6A WI", (False, "W9XYZ", None, "K1ABC", None)),
+        ("W9XYZ K1ABC R 2B EMA", (False, "K1ABC", None, "W9XYZ", None)),
+        ("TU; QN5HYK 649RMM R 549 2401", (False, "649RMM", None, "QN5HYK", None)),
+        ("KC1NNR RR73; GI6FZI <5B4AMM> -08", (False, "<5B4AMM>", None, "GI6FZI", -8)),
+        # Free text
+        ("E73XXX 73", (False, None, None, None, None)),
+        ("K1ABC RR73", (False, None, None, None, None)),
+        ("EFHW 50W 73", (False, None, None, None, None)),
+        ("TNX QSO", (False, None, None, None, None)),
+        ("HELLO WORLD", (False, None, None, None, None)),
+        ("QRV 50W", (False, None, None, None, None)),
+        ("K1ABC FN42", (False, None, None, None, None)),
+        ("TNX FOR QSO 73 GL", (False, None, None, None, None)),
+        ("", (False, None, None, None, None)),
     ],
 )
 def test_parseWsjtMessage(message, expected):
     assert parseWsjtMessage(message) == expected
 
 
+def test_message_cache():
+    cache = MessageCache(maxsize=2)
+
+    message, parsed = cache.parse("CQ R7DX KN84")
+    assert parsed == parseWsjtMessage("CQ R7DX KN84")
+    assert cache.parse("".join(["CQ R7DX ", "KN84"]))[0] is message
+    assert cache.parse(b"CQ R7DX KN84") == (message, parsed)
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 0)
+    assert cache.hitRate() == pytest.approx(1 / 3)
+
+    cache.parse("KE0LCS R7DX -15")
+    assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 1, "size": 2}
+
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "evictions": 0, "size": 0}
+    assert cache.hitRate() == 0.0
+
+
 # ['231006_035100', '3.573', 'Rx', 'FT8', '-16', '0.6', '2753', 'CQ DX F4BKV IN95']
 
 
@@ -89,6 +188,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="SP5AA",
+                target_callsign="LB2WD",
             ),
         ),
         (
@@ -102,6 +202,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="9A5TW",
+                target_callsign="NK9R",
             ),
         ),
         (
@@ -130,6 +231,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="<RO80MZ>",
+                target_callsign="RU3DMX",
             ),
         ),
         (
@@ -143,6 +245,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="R3AP",
+                target_callsign="CM7JAA",
             ),
         ),
         (
@@ -156,6 +259,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="RU3DMX",
+                target_callsign="CO8WN",
             ),
         ),
         (
@@ -169,6 +273,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="DF2GH",
+                target_callsign="ZD9W",
             ),
         ),
         (
@@ -181,6 +286,8 @@ def test_parseWsjtMessage(message, expected):
                 message="JJ0NFJ 333XQU R 549 2538",
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
+                sender_callsign="333XQU",
+                target_callsign="JJ0NFJ",
             ),
         ),
         (
@@ -194,6 +301,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="ES6RQ",
+                target_callsign="UB6HQQ",
             ),
         ),
         (
@@ -222,6 +330,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="R1BJX",
+                target_callsign="<AO23DMPC>",
             ),
         ),
         (
@@ -235,6 +344,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="LB6GJ",
+                target_callsign="4X1UF",
             ),
         ),
         (
@@ -248,6 +358,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="DH8GHH",
+                target_callsign="<9H/DK6SP>",
             ),
         ),
         (
@@ -261,6 +372,7 @@ def test_parseWsjtMessage(message, expected):
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
                 sender_callsign="DF7TV",
+                target_callsign="7J1ADJ",
             ),
         ),
         (
@@ -290,7 +402,8 @@ def test_parseWsjtMessage(message, expected):
                 receiver_callsign=RECEIVER_CALLSIGN,
                 cq=True,
                 sender_callsign="TA2ANK",
-                sender_grid=None,
+                # "a1" flags a marginal decode
+                sender_grid="KM69",
             ),
         ),
         (
@@ -303,6 +416,8 @@ def test_parseWsjtMessage(message, expected):
                 message="TU; QN5HYK 649RMM R 549 2401",
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
+                sender_callsign="649RMM",
+                target_callsign="QN5HYK",
             ),
         ),
         (
@@ -315,6 +430,8 @@ def test_parseWsjtMessage(message, expected):
                 message="KC1NNR RR73; GI6FZI <5B4AMM> -08",
                 receiver_grid=RECEIVER_GRID,
                 receiver_callsign=RECEIVER_CALLSIGN,
+                sender_callsign="<5B4AMM>",
+                target_callsign="GI6FZI",
             ),
         ),
         (
@@ -342,8 +459,8 @@ def test_parseWsjtMessage(message, expected):
         ),
     ],
 )
-def test_parseWsjtxAllLogLine(line, expected):
-    assert parseWsjtxAllLogLine(line) == expected
+def test_parseWsjtxAllLogLine(line, expected, line_parser):
+    assert line_parser(line) == expected
 
 
 @pytest.mark.parametrize(
@@ -355,9 +472,9 @@ def test_parseWsjtxAllLogLine(line, expected):
         ),
     ],
 )
-def test_parseWsjtxAllLogLine_Error(line, expected):
+def test_parseWsjtxAllLogLine_Error(line, expected, line_parser):
     with pytest.raises(expected):
-        parseWsjtxAllLogLine(line)
+        line_parser(line)
 
 
 @pytest.mark.parametrize(
@@ -381,6 +498,7 @@ foo bar baz
                     receiver_grid=RECEIVER_GRID,
                     receiver_callsign=RECEIVER_CALLSIGN,
                     sender_callsign="SP5AA",
+                    target_callsign="LB2WD",
                 ),
                 Entry(
                     mode=Mode.FT8,
@@ -391,6 +509,7 @@ foo bar baz
                     receiver_grid=RECEIVER_GRID,
                     receiver_callsign=RECEIVER_CALLSIGN,
                     sender_callsign="9A5TW",
+                    target_callsign="NK9R",
                 ),
                 Entry(
                     mode=Mode.FT8,
@@ -408,11 +527,16 @@ foo bar baz
         )
     ],
 )
-def test_parseWsjtxAllLog(data, expected, tmp_path):
+def test_parseWsjtxAllLog(data, expected, tmp_path, log_parser):
     with open(tmp_path / "ALL.TXT", "wt", encoding="utf8") as fh:
         fh.write(data)
 
-    assert list(parseWsjtxAllLog(tmp_path / "ALL.TXT")) == expected
+    assert list(log_parser(tmp_path / "ALL.TXT")) == expected
+
+
+def test_scanWsjtxAllLog_empty(tmp_path):
+    (tmp_path / "ALL.TXT").write_bytes(b"")
+    assert list(scanWsjtxAllLog(tmp_path / "ALL.TXT")) == []
 
 
 @pytest.mark.parametrize(
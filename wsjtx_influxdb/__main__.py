@@ -1,273 +1,287 @@
 #!/usr/bin/env python
-import socket
+import argparse
+import asyncio
 import datetime
-import sys
-from typing import (
-    Dict,
-    Iterable,
-    Literal,
-    Optional,
-    Union,
-    TypedDict,
-    TYPE_CHECKING,
-)
+import os
+from typing import List, Optional
 from urllib.parse import urlsplit
-from time import time as time_now_s
 import requests
 
-from wsjtx_srv.wsjtx import (  # type: ignore [import]
-    WSJTX_Telegram as Telegram,
-    WSJTX_Heartbeat as Heartbeat,
-    WSJTX_Status as Status,
-    WSJTX_Decode as Decode,
-    WSJTX_WSPR_Decode as WSPRDecode,
-)
 import influxdb  # type: ignore [import]
 
-from .config import INFLUXDB_DATABASE, INFLUXDB_URL, RECEIVER_CALLSIGN, RECEIVER_GRID
-from .wsjtx_extras import parse_time, parseWsjtMessage, parseWsjtxAllLog
-from .utils import Mode, Entry
-
-
-def ratelimit(func):
-    func.__last_call = None
-
-    def wrapper(*args, ratelimit=1, **kwargs):
-        now = time_now_s()
-        if ratelimit is not None and func.__last_call is not None:
-            if now - func.__last_call < ratelimit:
-                func.__last_call = now
-                # print(f"{func} has been rate limited.")
-                return None
-        func.__last_call = now
-        return func(*args, **kwargs)
-
-    return wrapper
+from .config import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS,
+    DEDUP,
+    DEDUP_FREQUENCY_BUCKET,
+    DEDUP_MAX_SIZE,
+    DEDUP_WINDOW_SECONDS,
+    FLUSH_BACKOFF_INITIAL,
+    FLUSH_BACKOFF_MAX,
+    FLUSH_INTERVAL,
+    FLUSH_MAX_AGE,
+    INFLUXDB_BATCH_BYTES,
+    INFLUXDB_BATCH_POINTS,
+    INFLUXDB_DATABASE,
+    INFLUXDB_GZIP,
+    INFLUXDB_MAX_IN_FLIGHT,
+    INFLUXDB_POOL_SIZE,
+    INFLUXDB_SCHEMA,
+    INFLUXDB_TIMEOUT,
+    INFLUXDB_URL,
+    PROMETHEUS_PORT,
+    ROLLUPS,
+    SPILL_DIRECTORY,
+    SPILL_REPLAY_BYTES,
+    SPILL_THRESHOLD,
+    STATS_INTERVAL,
+    UDP_LISTEN,
+    UDP_MULTICAST_GROUPS,
+    WRITER_BATCH_SIZE,
+    WRITER_OVERFLOW_POLICY,
+    WRITER_QUEUE_SIZE,
+    WRITER_STATS_INTERVAL,
+)
+from .reprocess import parseWsjtxAllLogParallel
+from .influx import HttpWriterConfig, InfluxHttpWriter, LineProtocolEncoder, Schema
+from .batch import EntryBatch
+from .buffer import PendingBuffer
+from .dedup import DedupIndex, Deduplicator
+from .writer import BackgroundWriter, FlushScheduler, OverflowPolicy
+from .rollup import Rollups
+from .server import EntrySink, serve
+from .spill import SpillQueue
+from .stats import MetricsReporter, metrics, servePrometheus
+from .tail import AllLogTailer
+from .utils import Entry
+from .wsjtx_extras import line_message_cache, message_cache
 
 
 def parse_influxdb_url(influxdb_url: str):
     url = urlsplit(influxdb_url)
+    https = url.scheme == "https"
     port = url.port
     if port is None:
-        port = 443 if url.scheme == "https" else 80
-
-    return {"host": url.hostname, "port": port, "path": url.path}
-
-
-# Status dial_frq=14074000 mode=FT8 dx_call=ZD9W report=0 tx_mode=FT8 tx_enabled=0 xmitting=0 decoding=0 rx_df=1500 tx_df=1500 de_call=SWL de_grid=MH09me dx_grid=None tx_watchdog=0 sub_mode=None fast_mode=0 special_op=0 frq_tolerance=4294967295 t_r_period=4294967295 config_name=Default tx_message=None
-
-
-class InfluxdbMeasurement(TypedDict):
-    measurement: Literal["entry"]
-    time: str
-    tags: Dict[str, Union[str, int, float, bool]]
-    fields: Dict[str, Union[str, int, float, bool]]
-
-
-def entryToInfluxdb(entry: Entry):
-    m: InfluxdbMeasurement = {
-        "measurement": "entry",
-        "time": entry.time.isoformat(),
-        "tags": {},
-        "fields": {},
+        port = 443 if https else 80
+
+    return {
+        "host": url.hostname,
+        "port": port,
+        "path": url.path,
+        "ssl": https,
+        "verify_ssl": https,
     }
 
-    m["tags"]["mode"] = str(entry.mode)
-    m["tags"]["cq"] = entry.cq
-    # TODO: Should be field if many receivers are expected
-    m["tags"]["receiver_grid"] = entry.receiver_grid
-    # TODO: Should be field if many receivers are expected
-    m["tags"]["receiver_callsign"] = entry.receiver_callsign
 
-    m["tags"]["received_hour"] = entry.time.hour
-    m["tags"]["received_month"] = entry.time.month
-    m["tags"]["received_year"] = entry.time.year
-    (
-        m["tags"]["received_isoyear"],
-        m["tags"]["received_isoweek"],
-        m["tags"]["received_isoweekday"],
-    ) = entry.time.isocalendar()
-
-    m["fields"]["snr"] = entry.snr
-    m["tags"]["snr"] = entry.snr
-    m["fields"]["frequency"] = entry.frequency
-    m["fields"]["message"] = entry.message
-
-    band = entry.band_name
-    if band:
-        m["tags"]["band"] = band
-
-    if entry.sender_grid:
-        if TYPE_CHECKING:
-            assert entry.distance is not None
-            assert entry.heading is not None
-            assert entry.sender_coordinates is not None
-        m["tags"]["has_sender_grid"] = True
-        m["fields"]["distance"] = entry.distance
-        m["fields"]["heading"] = entry.heading
-        m["tags"]["heading"] = int(entry.heading)
-        m["fields"]["sender_grid"] = entry.sender_grid
-
-        coords = entry.sender_coordinates
-        m["fields"]["sender_latitude"] = coords.latitude
-        m["fields"]["sender_longitude"] = coords.longitude
-        del coords
-
-    else:
-        m["tags"]["has_sender_grid"] = False
-
-    if entry.sender_callsign:
-        m["fields"]["sender_callsign"] = entry.sender_callsign
-
-    if entry.target_callsign:
-        m["fields"]["target_callsign"] = entry.target_callsign
-
-    return m
+# Status dial_frq=14074000 mode=FT8 dx_call=ZD9W report=0 tx_mode=FT8 tx_enabled=0 xmitting=0 decoding=0 rx_df=1500 tx_df=1500 de_call=SWL de_grid=MH09me dx_grid=None tx_watchdog=0 sub_mode=None fast_mode=0 special_op=0 frq_tolerance=4294967295 t_r_period=4294967295 config_name=Default tx_message=None
 
 
-def sortEntries(entries: Iterable[Entry]):
-    return sorted(entries, key=lambda e: (e.time, e.frequency))
+def encodeEntries(entries: List[Entry], force: bool = False) -> List[str]:
+    """Line protocol of entries, and of the rollup windows they complete."""
+    batch = EntryBatch.fromEntries(entries)
+    lines = line_encoder.encodeBatch(batch)
+    if rollups is not None:
+        rollups.add(entries, batch.geodesy().rows())
+        lines += rollups.closedLines(force)
+    return lines
 
 
-def entriesOlderThan(entries: Iterable[Entry], seconds=15):
-    now = datetime.datetime.utcnow()
-    td = datetime.timedelta(seconds=seconds)
-    return filter(lambda e: now - e.time > td, entries)
+def spillOverflow(entries: PendingBuffer):
+    """
+    Spills the oldest entries beyond SPILL_THRESHOLD to disk. Called on
+    every writer tick, also while the scheduler holds back writes.
+    """
+    if len(entries) <= SPILL_THRESHOLD:
+        return
+    lines = encodeEntries(entries.drain_oldest(len(entries) - SPILL_THRESHOLD))
+    spill.append(lines)
+    metrics.inc("points_spilled", len(lines))
 
 
-@ratelimit
-def influxPushData(entries: Iterable[Entry]) -> Optional[Iterable[Entry]]:
+def confirmWritten(entries: PendingBuffer, pushed: List[Entry], force: bool):
     """
-    Pushes entries to InfluxDB (if they're old enough)
-    Returns list of entries NOT pushed, or None
+    Lets the ALL.TXT tailer checkpoint the entries now written or spilled:
+    all entries older than the oldest one still pending, or all of them
+    after the final flush. Entries of the same second as the newest one
+    pushed may still be queued.
+    """
+    if tailer is None:
+        return
+    oldest = entries.oldest()
+    if force:
+        tailer.confirm()
+    elif oldest is not None:
+        tailer.confirm(oldest)
+    elif pushed:
+        tailer.confirm(max(e.time for e in pushed))
+
+
+def influxPushData(entries: PendingBuffer, force: bool = False) -> bool:
+    """
+    Pushes entries to InfluxDB (if they're old enough, or force is set)
+    Entries that fail to be written are spilled to disk.
+    Returns True if the write succeeded, False otherwise.
     """
     print(f"Processing… {datetime.datetime.utcnow()}")
-    to_push = sortEntries(entriesOlderThan(entries))
-    left = list(entries)
-    for entry in to_push:
-        left.remove(entry)
+    if force:
+        to_push = entries.drain_oldest(len(entries))
+    else:
+        to_push = entries.drain_ready(datetime.datetime.utcnow())
 
-    points = map(entryToInfluxdb, to_push)
+    lines = encodeEntries(to_push, force)
     try:
-        print(f"Writing {len(to_push)} entries…")
-        influxdb_client.write_points(
-            points=points, database=INFLUXDB_DATABASE, batch_size=100
-        )
-    except requests.exceptions.RequestException as ex:
+        if spill:
+            # Keep the order: new points go behind the ones already spilled.
+            spill.append(lines)
+            metrics.inc("points_spilled", len(lines))
+            replayed = spill.replay(http_writer.write, max_bytes=SPILL_REPLAY_BYTES)
+            metrics.inc("points_written", replayed)
+            print(
+                f"Replayed {replayed} spilled entries, {spill.pending_bytes} bytes left"
+            )
+        else:
+            print(f"Writing {len(to_push)} entries…")
+            http_writer.write(lines)
+            metrics.inc("points_written", len(lines))
+    except (
+        requests.exceptions.RequestException,
+        influxdb.exceptions.InfluxDBClientError,
+        influxdb.exceptions.InfluxDBServerError,
+    ) as ex:
         print(f"Failed to write data: {ex}")
-        return None
+        metrics.inc("write_failures")
+        if not spill:
+            # Otherwise they were appended above, behind the earlier ones.
+            spill.append(lines)
+            metrics.inc("points_spilled", len(lines))
+        print(f"Spilled {spill.pending_bytes} bytes to {SPILL_DIRECTORY}")
+        confirmWritten(entries, to_push, force)
+        return False
 
-    print("Done processing.")
-    return left
+    print(f"Done processing. {http_writer.stats}")
+    confirmWritten(entries, to_push, force)
+    return True
 
 
 if __name__ == "__main__":
-    reprocess = "--reprocess" in sys.argv
-
+    parser = argparse.ArgumentParser(prog="python -m wsjtx_influxdb")
+    parser.add_argument(
+        "--reprocess",
+        action="store_true",
+        help="drop the database, and import all spots from ALL.TXT",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="number of processes parsing ALL.TXT when reprocessing",
+    )
+    parser.add_argument(
+        "--follow",
+        metavar="ALL.TXT",
+        help="import spots from this WSJT-X log as it is written, instead of UDP",
+    )
+    parser.add_argument(
+        "--state-file",
+        metavar="PATH",
+        help="where --follow keeps track of its progress (default: ALL.TXT.state)",
+    )
+    args = parser.parse_args()
+    reprocess = args.reprocess
+
+    http_config = HttpWriterConfig(
+        gzip=INFLUXDB_GZIP,
+        batch_points=INFLUXDB_BATCH_POINTS,
+        batch_bytes=INFLUXDB_BATCH_BYTES,
+        pool_size=INFLUXDB_POOL_SIZE,
+        max_in_flight=INFLUXDB_MAX_IN_FLIGHT,
+    )
     influxdb_client = influxdb.InfluxDBClient(
-        **parse_influxdb_url(INFLUXDB_URL), database=INFLUXDB_DATABASE
+        **parse_influxdb_url(INFLUXDB_URL),
+        database=INFLUXDB_DATABASE,
+        pool_size=http_config.pool_size,
+        timeout=INFLUXDB_TIMEOUT,
     )
+    http_writer = InfluxHttpWriter(influxdb_client, INFLUXDB_DATABASE, http_config)
     if reprocess:
         influxdb_client.drop_database(INFLUXDB_DATABASE)
     influxdb_client.create_database(INFLUXDB_DATABASE)
 
-    # u = wsjtx_srv.UDP_Connector(ip = "0.0.0.0", wbf = None)
-    entry_queue: list[Entry] = []
+    line_encoder = LineProtocolEncoder(schema=Schema(INFLUXDB_SCHEMA))
+    rollups = Rollups() if ROLLUPS else None
+    spill = SpillQueue(SPILL_DIRECTORY)
+    tailer: Optional[AllLogTailer] = None
+    if spill:
+        print(f"{spill.pending_bytes} bytes spilled by an earlier run will be replayed")
 
-    def processQueue():
-        if entry_queue:
-            if len(entry_queue) >= 1000:
-                res = influxPushData(entry_queue, ratelimit=None)
-            else:
-                res = influxPushData(entry_queue)
-            if res is not None:
-                entry_queue.clear()
-                entry_queue.extend(res)
-
-    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-        sock.bind(("", 2237))
+    # u = wsjtx_srv.UDP_Connector(ip = "0.0.0.0", wbf = None)
+    scheduler = FlushScheduler(
+        interval=FLUSH_INTERVAL,
+        batch_size=WRITER_BATCH_SIZE,
+        max_age=FLUSH_MAX_AGE,
+        backoff_initial=FLUSH_BACKOFF_INITIAL,
+        backoff_max=FLUSH_BACKOFF_MAX,
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        open_seconds=CIRCUIT_OPEN_SECONDS,
+    )
+    writer = BackgroundWriter(
+        influxPushData,
+        queue_size=WRITER_QUEUE_SIZE,
+        policy=OverflowPolicy(WRITER_OVERFLOW_POLICY),
+        stats_interval=WRITER_STATS_INTERVAL,
+        backlog=spill.__bool__,
+        scheduler=scheduler,
+        overflow=spillOverflow,
+    )
+    writer.start()
+    sink: EntrySink = writer
+    if DEDUP:
+        sink = Deduplicator(
+            writer,
+            DedupIndex(
+                frequency_bucket=DEDUP_FREQUENCY_BUCKET,
+                window_seconds=DEDUP_WINDOW_SECONDS,
+                max_size=DEDUP_MAX_SIZE,
+            ),
+        )
 
+    metrics.gauge("queue_depth", writer.queue_depth)
+    metrics.gauge("pending_entries", lambda: len(writer.buffer))
+    metrics.gauge("spilled_bytes", lambda: spill.pending_bytes)
+    metrics.gauge("consecutive_write_failures", lambda: scheduler.consecutive_failures)
+    metrics.gauge("message_cache_hit_rate", message_cache.hitRate)
+    metrics.gauge("line_message_cache_hit_rate", line_message_cache.hitRate)
+    reporter = None
+    if STATS_INTERVAL is not None:
+        reporter = MetricsReporter(http_writer.write, STATS_INTERVAL)
+        reporter.start()
+    if PROMETHEUS_PORT is not None:
+        servePrometheus(PROMETHEUS_PORT)
+
+    if args.follow:
+        state_file = args.state_file or f"{args.follow}.state"
+        if reprocess and os.path.exists(state_file):
+            os.remove(state_file)
+        tailer = AllLogTailer(args.follow, state_file)
+        try:
+            for entry in tailer.follow():
+                sink.submit(entry, block=True)
+        except KeyboardInterrupt:
+            pass
+    else:
         if reprocess:
-            for entry in parseWsjtxAllLog("ALL.TXT"):
-                entry_queue.append(entry)
-                processQueue()
-
-        dial_frequency = 0
-        local_grid: str = RECEIVER_GRID
-        local_call: str = RECEIVER_CALLSIGN
-
-        # Status dial_frq=14074000 mode=FT8 dx_call=ZD9W report=0 tx_mode=FT8 tx_enabled=0 xmitting=0 decoding=1 rx_df=2259 tx_df=1500 de_call=SWL de_grid=MH09me dx_grid=None tx_watchdog=0 sub_mode=None fast_mode=0 special_op=0 frq_tolerance=4294967295 t_r_period=4294967295 config_name=Default tx_message=None
-        # Decode is_new=1 time=81810000 snr=-20 delta_t=0.5 delta_f=1709 mode=~ message=CQ SV5AZP KM46 low_confidence=0 off_air=0
-
-        while True:
-            processQueue()
-
-            data, address = sock.recvfrom(4096)
-            # print(address, data)
-            tel = Telegram.from_bytes(data)
-            if type(tel) not in [Status, Decode]:
-                if type(tel) is not Heartbeat:
-                    print(tel)
-                continue
-
-            if isinstance(tel, Status):
-                if tel.dial_frq != dial_frequency:
-                    print(
-                        f"{datetime.datetime.utcnow()}\tFrequency changed\t{tel.dial_frq/1000:8.3f} kHz"
-                    )
-                dial_frequency = tel.dial_frq
-                local_grid = tel.de_grid
-                local_call = tel.de_call
-                continue
-
-            elif isinstance(tel, Decode):
-                if not dial_frequency:
-                    continue
-
-                if tel.off_air or not tel.is_new:
-                    continue
-
-                if tel.low_confidence:
-                    print(tel)
-                    continue
-
-                if tel.message is None:
-                    print(tel)
-                    continue
-
-                cq, sender_callsign, sender_grid = parseWsjtMessage(tel.message)
-
-                entry = Entry(
-                    message=tel.message,
-                    mode=Mode.get(tel.mode),
-                    snr=int(tel.snr),
-                    frequency=dial_frequency + tel.delta_f,
-                    time=parse_time(tel.time, tel.delta_t),
-                    receiver_grid=local_grid,
-                    receiver_callsign=local_call,
-                    cq=cq,
-                    sender_callsign=sender_callsign,
-                    sender_grid=sender_grid,
-                )
-
-                print(entry)
-                entry_queue.append(entry)
-                # print(asdict(entry))
-
-            elif isinstance(tel, WSPRDecode):
-                if tel.off_air or not tel.is_new:
-                    continue
-                # WSPR_Decode is_new=1 time=7680000 snr=-25 delta_t=0.6000000238418579 frq=10140138 drift=0 callsign=IU2PJI grid=JN45 power=23 off_air=0
-                mode = Mode.WSPR
-                snr = tel.wspr
-                time = parse_time(tel.time, tel.delta_t)
-                freq = tel.frq
-                message = f"WSPR {tel.callsign} {tel.grid} {tel.power}"
-
-                print(f"{time}\t{snr:> 2d}\t{mode}\t{freq/1000: 8.3f} kHz\t{message}")
-
-            else:
-                print(tel)
+            for entry in parseWsjtxAllLogParallel("ALL.TXT", workers=args.workers):
+                sink.submit(entry, block=True)
+
+        try:
+            asyncio.run(serve(sink, UDP_LISTEN, UDP_MULTICAST_GROUPS))
+        except KeyboardInterrupt:
+            pass
+    writer.stop()
+    spill.close()
+    if reporter is not None:
+        reporter.stop()
+        reporter.report()
 
     # calculate and log heading, distance
-    # sumarize per minute, hour: number of messages per mode and total
@@ -0,0 +1,177 @@
+import datetime
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .influx import timeToNanoseconds
+from .utils import (
+    BatchGeodesy,
+    Entry,
+    Mode,
+    calculate_grids_distance_bearing,
+    frequenciesToBands,
+)
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+_MODES = {mode.value: mode for mode in Mode}
+
+_NUMERIC_COLUMNS = (
+    ("time", np.int64),
+    ("frequency", np.int64),
+    ("snr", np.int32),
+    ("mode", np.int16),
+    ("cq", np.bool_),
+)
+_STRING_COLUMNS = (
+    "message",
+    "receiver_grid",
+    "receiver_callsign",
+    "sender_grid",
+    "sender_callsign",
+    "target_callsign",
+)
+
+
+class EntryBatch:
+    """
+    Entries stored column by column.
+
+    time (nanoseconds since epoch), frequency, snr, mode (Mode values) and
+    cq are NumPy arrays; messages, grids and callsigns are lists of
+    interned strings. A batch is built from the entries of a flush, and
+    the arrays when first needed.
+    Band, distance and heading are computed for the whole batch at once.
+    """
+
+    def __init__(self):
+        self._values: dict = {name: [] for name, _ in _NUMERIC_COLUMNS}
+        self._arrays: Optional[dict] = None
+        self.message: List[str] = []
+        self.receiver_grid: List[str] = []
+        self.receiver_callsign: List[str] = []
+        self.sender_grid: List[Optional[str]] = []
+        self.sender_callsign: List[Optional[str]] = []
+        self.target_callsign: List[Optional[str]] = []
+        self._geodesy: Optional[BatchGeodesy] = None
+        self._band: Optional[np.ndarray] = None
+
+    @classmethod
+    def fromEntries(cls, entries: Iterable[Entry]) -> "EntryBatch":
+        batch = cls()
+        batch.extend(entries)
+        return batch
+
+    def append(self, entry: Entry):
+        values = self._values
+        values["time"].append(timeToNanoseconds(entry.time))
+        values["frequency"].append(entry.frequency)
+        values["snr"].append(entry.snr)
+        values["mode"].append(entry.mode.value)
+        values["cq"].append(entry.cq)
+        # Entry interns grids and callsigns already
+        self.message.append(entry.message)
+        self.receiver_grid.append(entry.receiver_grid)
+        self.receiver_callsign.append(entry.receiver_callsign)
+        self.sender_grid.append(entry.sender_grid)
+        self.sender_callsign.append(entry.sender_callsign)
+        self.target_callsign.append(entry.target_callsign)
+        self._invalidate()
+
+    def extend(self, entries: Iterable[Entry]):
+        for entry in entries:
+            self.append(entry)
+
+    def _invalidate(self):
+        self._arrays = None
+        self._geodesy = None
+        self._band = None
+
+    def _column(self, name: str) -> np.ndarray:
+        if self._arrays is None:
+            self._arrays = {
+                column: np.array(self._values[column], dtype=dtype)
+                for column, dtype in _NUMERIC_COLUMNS
+            }
+        return self._arrays[name]
+
+    @property
+    def time(self) -> np.ndarray:
+        return self._column("time")
+
+    @property
+    def frequency(self) -> np.ndarray:
+        return self._column("frequency")
+
+    @property
+    def snr(self) -> np.ndarray:
+        return self._column("snr")
+
+    @property
+    def mode(self) -> np.ndarray:
+        return self._column("mode")
+
+    @property
+    def cq(self) -> np.ndarray:
+        return self._column("cq")
+
+    def __len__(self) -> int:
+        return len(self.message)
+
+    def band(self) -> np.ndarray:
+        """Band names (None outside the bandplan)."""
+        if self._band is None:
+            self._band = frequenciesToBands(self.frequency)
+        return self._band
+
+    def geodesy(self) -> BatchGeodesy:
+        if self._geodesy is None:
+            self._geodesy = calculate_grids_distance_bearing(
+                self.receiver_grid, self.sender_grid
+            )
+        return self._geodesy
+
+    def distance(self) -> np.ndarray:
+        """Distance to the sender in meters, 0 where there is no sender grid."""
+        return self.geodesy().distance
+
+    def heading(self) -> np.ndarray:
+        """Heading to the sender in degrees, NaN where there is no sender grid."""
+        return self.geodesy().heading
+
+    def take(self, indices: np.ndarray) -> "EntryBatch":
+        """New batch with the entries at indices, in that order."""
+        batch = EntryBatch()
+        order = indices.tolist()
+        for name, _ in _NUMERIC_COLUMNS:
+            values = self._values[name]
+            batch._values[name] = [values[i] for i in order]
+        for name in _STRING_COLUMNS:
+            column = getattr(self, name)
+            setattr(batch, name, [column[i] for i in order])
+        return batch
+
+    def sort(self) -> "EntryBatch":
+        """New batch sorted by (time, frequency), like the PendingBuffer."""
+        return self.take(np.lexsort((self.frequency, self.time)))
+
+    def __getitem__(self, index: int) -> Entry:
+        values = self._values
+        time = _EPOCH + datetime.timedelta(microseconds=values["time"][index] // 1000)
+        return Entry(
+            mode=_MODES[values["mode"][index]],
+            snr=values["snr"][index],
+            frequency=values["frequency"][index],
+            message=self.message[index],
+            time=time,
+            receiver_grid=self.receiver_grid[index],
+            receiver_callsign=self.receiver_callsign[index],
+            sender_grid=self.sender_grid[index],
+            sender_callsign=self.sender_callsign[index],
+            target_callsign=self.target_callsign[index],
+            cq=values["cq"][index],
+        )
+
+    def __iter__(self) -> Iterator[Entry]:
+        for index in range(len(self)):
+            yield self[index]
@@ -0,0 +1,66 @@
+import datetime
+import heapq
+from itertools import count
+from typing import Iterable, List, Tuple
+
+from .utils import Entry
+
+# Decodes for the same slot may arrive out of order (multiple passes, late
+# UDP datagrams), so entries are held back until this window has passed.
+SETTLE_SECONDS = 15
+
+_HeapItem = Tuple[datetime.datetime, int, int, Entry]
+
+
+class PendingBuffer:
+    """
+    Entries waiting to be written, ordered by (time, frequency).
+
+    Backed by a heap, so pushing an entry is O(log n) and releasing the k
+    entries that are older than the settle window is O(k log n), independent
+    of how many entries are still pending.
+    """
+
+    def __init__(self, settle_seconds: float = SETTLE_SECONDS):
+        self.settle = datetime.timedelta(seconds=settle_seconds)
+        self._heap: List[_HeapItem] = []
+        # Tie-breaker, so Entry objects never have to be compared.
+        self._counter = count()
+
+    def push(self, entry: Entry):
+        heapq.heappush(
+            self._heap, (entry.time, entry.frequency, next(self._counter), entry)
+        )
+
+    def extend(self, entries: Iterable[Entry]):
+        for entry in entries:
+            self.push(entry)
+
+    def drain_ready(self, now: datetime.datetime) -> List[Entry]:
+        """
+        Removes and returns all entries older than the settle window,
+        sorted by (time, frequency).
+        """
+        cutoff = now - self.settle
+        ready = []
+        heap = self._heap
+        while heap and heap[0][0] < cutoff:
+            ready.append(heapq.heappop(heap)[3])
+        return ready
+
+    def drain_oldest(self, count: int) -> List[Entry]:
+        """Removes and returns the count oldest entries, settled or not."""
+        heap = self._heap
+        return [heapq.heappop(heap)[3] for _ in range(min(count, len(heap)))]
+
+    def oldest(self):
+        """Time of the oldest pending entry, or None if empty."""
+        if self._heap:
+            return self._heap[0][0]
+        return None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
@@ -0,0 +1,75 @@
+"""
+Estimates the number of InfluxDB series an ALL.TXT produces under each
+schema, and which tags contribute the most distinct values.
+
+    python -m wsjtx_influxdb.cardinality ALL.TXT
+"""
+import argparse
+import re
+from itertools import islice
+from typing import Dict, Iterable, Set
+
+from .batch import EntryBatch
+from .influx import LineProtocolEncoder, Schema
+from .wsjtx_extras import scanWsjtxAllLog
+
+CHUNK_SIZE = 10_000
+
+# Measurement and tags, up to the first unescaped space
+_SERIES = re.compile(r"(?:[^\\ ]|\\.)*")
+_TAG = re.compile(r"((?:[^\\,=]|\\.)+)=((?:[^\\,=]|\\.)+)")
+
+
+class SeriesCounter:
+    """Distinct series (tag sets) and distinct values per tag key."""
+
+    def __init__(self):
+        self.series: Set[str] = set()
+        self.tag_values: Dict[str, Set[str]] = {}
+        self.points = 0
+
+    def add(self, line: str):
+        """Counts one line of line protocol, as it is written."""
+        self.points += 1
+        match = _SERIES.match(line)
+        assert match is not None
+        series = match.group()
+        if series in self.series:
+            return
+        self.series.add(series)
+        for tag, value in _TAG.findall(series):
+            self.tag_values.setdefault(tag, set()).add(value)
+
+
+def countSeries(
+    entries: Iterable, schemas: Iterable[Schema] = tuple(Schema)
+) -> Dict[Schema, SeriesCounter]:
+    encoders = {schema: LineProtocolEncoder(schema=schema) for schema in schemas}
+    counters = {schema: SeriesCounter() for schema in encoders}
+    entries = iter(entries)
+    while True:
+        chunk = list(islice(entries, CHUNK_SIZE))
+        if not chunk:
+            break
+        batch = EntryBatch.fromEntries(chunk)
+        for schema, encoder in encoders.items():
+            counter = counters[schema]
+            for line in encoder.encodeBatch(batch):
+                counter.add(line)
+    return counters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m wsjtx_influxdb.cardinality")
+    parser.add_argument("file", metavar="ALL.TXT")
+    args = parser.parse_args()
+
+    for schema, counter in countSeries(scanWsjtxAllLog(args.file)).items():
+        print(
+            f"{schema.value}: {len(counter.series)} series for {counter.points} points"
+        )
+        by_size = sorted(
+            counter.tag_values.items(), key=lambda item: len(item[1]), reverse=True
+        )
+        for tag, values in by_size:
+            print(f"  {tag:20} {len(values):6} values")
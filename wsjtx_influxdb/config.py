@@ -1,4 +1,74 @@
 INFLUXDB_DATABASE = "radio"
 INFLUXDB_URL = "http://influxdb:8086"
+# "full": every attribute of a spot is a tag, so it can be grouped by.
+# "compact": only band, cq, has_sender_grid, mode and receiver_callsign are
+# tags, far fewer series with many receivers. The heading panel of
+# grafana_dashboard.json groups by the heading tag, and needs "full".
+INFLUXDB_SCHEMA = "full"
+# Also write per minute and per hour summaries (count, snr, unique senders,
+# max distance per band, mode and receiver) to entry_1m and entry_1h
+ROLLUPS = True
+# Compress writes to InfluxDB
+INFLUXDB_GZIP = True
+# Limits for the number of points and (uncompressed) bytes per write request
+INFLUXDB_BATCH_POINTS = 5000
+INFLUXDB_BATCH_BYTES = 1_000_000
+# Seconds to wait for InfluxDB to answer a request. A write to a stalled
+# InfluxDB fails after this, and is retried or spilled like any other.
+INFLUXDB_TIMEOUT = 10
+# Kept-alive HTTP connections to InfluxDB
+INFLUXDB_POOL_SIZE = 4
+# Write requests sent in parallel
+INFLUXDB_MAX_IN_FLIGHT = 1
+# Points that can't be written are spilled to disk here, and replayed later
+SPILL_DIRECTORY = "spill"
+# Pending entries kept in memory; beyond that, the oldest are spilled
+SPILL_THRESHOLD = 100_000
+# Bytes replayed from the spill log per flush, so the writer keeps up with
+# new entries while catching up
+SPILL_REPLAY_BYTES = 8 * 1024 * 1024
 RECEIVER_GRID = "MH09me"
 RECEIVER_CALLSIGN = "SWL"
+
+# Maximum number of decoded entries waiting for the writer thread.
+WRITER_QUEUE_SIZE = 10000
+# What to do when the writer queue is full: block, drop_newest or drop_oldest
+WRITER_OVERFLOW_POLICY = "drop_oldest"
+# Pending entries that trigger a flush without waiting for the flush interval.
+WRITER_BATCH_SIZE = 1000
+# Seconds between writer statistics reports, None to disable.
+WRITER_STATS_INTERVAL = 60
+# Seconds between regular flushes to InfluxDB
+FLUSH_INTERVAL = 1
+# Flush as soon as the oldest pending entry is this many seconds old
+FLUSH_MAX_AGE = 30
+# Seconds to wait after a failed flush, doubling with every failure up to the max
+FLUSH_BACKOFF_INITIAL = 1
+FLUSH_BACKOFF_MAX = 300
+# Consecutive failed flushes after which InfluxDB is only tried every
+# CIRCUIT_OPEN_SECONDS, until it accepts writes again
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_OPEN_SECONDS = 60
+
+# (host, port) pairs to receive WSJT-X UDP telegrams on.
+UDP_LISTEN = [("", 2237)]
+# (group, port) pairs of multicast groups to join, e.g. [("224.0.0.1", 2237)]
+UDP_MULTICAST_GROUPS: list = []
+
+# Distances to grids that are not 4 character squares (e.g. JO59jw) to cache.
+GEODESY_CACHE_SIZE = 4096
+# Parsed messages to cache; the same CQ or QSO message is decoded many times.
+MESSAGE_CACHE_SIZE = 16384
+
+# Drop decodes of a transmission that was already seen: the same message,
+# receiver, 15 s slot and audio frequency (rounded to DEDUP_FREQUENCY_BUCKET Hz).
+DEDUP = True
+DEDUP_FREQUENCY_BUCKET = 10
+# Seconds a decode is remembered, and the most decodes remembered at once
+DEDUP_WINDOW_SECONDS = 120
+DEDUP_MAX_SIZE = 200_000
+# Seconds between writes of the pipeline metrics to the
+# wsjtx_influxdb_stats measurement, None to disable.
+STATS_INTERVAL = 60
+# Port to serve the metrics on for Prometheus (at /metrics), None to disable.
+PROMETHEUS_PORT = None
@@ -0,0 +1,103 @@
+import datetime
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional, Tuple
+
+from .stats import metrics
+from .utils import Entry
+
+# Decodes of one transmission share a slot, but their times differ by a few
+# seconds of delta_t; times are rounded to the nearest slot.
+SLOT_SECONDS = 15
+# Rounding of the audio frequency, for the same signal decoded in different
+# passes or reported by different paths.
+FREQUENCY_BUCKET = 10
+# How long a decode is remembered, in seconds of decode time
+WINDOW_SECONDS = 120
+# Upper limit for remembered decodes, whatever the window
+MAX_SIZE = 200_000
+
+DedupKey = Tuple[int, int, str, str]
+
+
+class DedupIndex:
+    """
+    Remembers recent decodes, keyed by (time slot, frequency bucket,
+    message, receiver), to recognize the same transmission seen again.
+
+    Keys expire once they are window_seconds older than the newest decode,
+    or when more than max_size are held, oldest first.
+    """
+
+    def __init__(
+        self,
+        slot_seconds: float = SLOT_SECONDS,
+        frequency_bucket: int = FREQUENCY_BUCKET,
+        window_seconds: float = WINDOW_SECONDS,
+        max_size: int = MAX_SIZE,
+    ):
+        self.slot_seconds = slot_seconds
+        self.frequency_bucket = frequency_bucket
+        self.window_slots = window_seconds / slot_seconds
+        self.max_size = max_size
+        self._keys: Dict[Hashable, int] = {}
+        # (slot, key) in insertion order, for expiry
+        self._order: Deque[Tuple[int, Hashable]] = deque()
+        self._newest_slot: Optional[int] = None
+        self.duplicates = 0
+
+    def key(self, entry: Entry) -> DedupKey:
+        timestamp = (entry.time - datetime.datetime(1970, 1, 1)).total_seconds()
+        return (
+            round(timestamp / self.slot_seconds),
+            round(entry.frequency / self.frequency_bucket),
+            entry.message,
+            entry.receiver_callsign,
+        )
+
+    def _expire(self):
+        order = self._order
+        keys = self._keys
+        assert self._newest_slot is not None
+        oldest_slot = self._newest_slot - self.window_slots
+        while order and (order[0][0] < oldest_slot or len(keys) > self.max_size):
+            slot, key = order.popleft()
+            if keys.get(key) == slot:
+                del keys[key]
+
+    def add(self, entry: Entry) -> bool:
+        """Returns False if entry is a duplicate of a remembered decode."""
+        key = self.key(entry)
+        if key in self._keys:
+            self.duplicates += 1
+            return False
+
+        slot = key[0]
+        self._keys[key] = slot
+        self._order.append((slot, key))
+        if self._newest_slot is None or slot > self._newest_slot:
+            self._newest_slot = slot
+        self._expire()
+        return True
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class Deduplicator:
+    """
+    Passes entries on to sink, unless they duplicate an earlier one.
+    Sits in front of the BackgroundWriter, for every source of entries.
+    """
+
+    def __init__(self, sink, index: Optional[DedupIndex] = None):
+        self.sink = sink
+        self.index = DedupIndex() if index is None else index
+
+    def submit(self, entry: Entry, block: bool = False) -> bool:
+        if not self.index.add(entry):
+            metrics.inc("duplicates_dropped")
+            return False
+        return self.sink.submit(entry, block=block)
+
+    def record_latency(self, seconds: float):
+        self.sink.record_latency(seconds)
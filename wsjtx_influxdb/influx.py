@@ -0,0 +1,541 @@
+import datetime
+import gzip
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from time import perf_counter
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    TypedDict,
+    TYPE_CHECKING,
+)
+
+import influxdb  # type: ignore [import]
+
+from .utils import (
+    Entry,
+    Mode,
+    EntryGeodesy,
+    calculate_batch_distance_bearing,
+)
+
+if TYPE_CHECKING:
+    from .batch import EntryBatch
+
+
+class Schema(Enum):
+    # Every attribute of an entry that can be grouped by is a tag.
+    FULL = "full"
+    # Only band, cq, has_sender_grid, mode and receiver_callsign are tags,
+    # everything else is a field. Far fewer series, but the moved
+    # attributes can't be used in GROUP BY.
+    COMPACT = "compact"
+
+
+# Tags of the full schema that are fields in the compact one. snr and
+# heading are fields in both schemas already.
+_COMPACT_FIELDS = (
+    "received_hour",
+    "received_isoweek",
+    "received_isoweekday",
+    "received_isoyear",
+    "received_month",
+    "received_year",
+    "receiver_grid",
+)
+_COMPACT_DROPPED_TAGS = ("heading", "snr")
+
+
+class InfluxdbMeasurement(TypedDict):
+    measurement: Literal["entry"]
+    time: str
+    tags: Dict[str, Union[str, int, float, bool]]
+    fields: Dict[str, Union[str, int, float, bool]]
+
+
+def entryToInfluxdb(
+    entry: Entry,
+    geodesy: Optional[EntryGeodesy] = None,
+    schema: Schema = Schema.FULL,
+):
+    """
+    geodesy can be given to skip computing distance, heading and sender
+    coordinates for this entry, see entriesToInfluxdb.
+    """
+    m: InfluxdbMeasurement = {
+        "measurement": "entry",
+        "time": entry.time.isoformat(),
+        "tags": {},
+        "fields": {},
+    }
+
+    m["tags"]["mode"] = str(entry.mode)
+    m["tags"]["cq"] = entry.cq
+    # Tags, to group by receiver. With many receivers, Schema.COMPACT keeps
+    # receiver_callsign as the only receiver tag, receiver_grid is a field.
+    m["tags"]["receiver_grid"] = entry.receiver_grid
+    m["tags"]["receiver_callsign"] = entry.receiver_callsign
+
+    m["tags"]["received_hour"] = entry.time.hour
+    m["tags"]["received_month"] = entry.time.month
+    m["tags"]["received_year"] = entry.time.year
+    (
+        m["tags"]["received_isoyear"],
+        m["tags"]["received_isoweek"],
+        m["tags"]["received_isoweekday"],
+    ) = entry.time.isocalendar()
+
+    m["fields"]["snr"] = entry.snr
+    m["tags"]["snr"] = entry.snr
+    m["fields"]["frequency"] = entry.frequency
+    m["fields"]["message"] = entry.message
+
+    band = entry.band_name
+    if band:
+        m["tags"]["band"] = band
+
+    if entry.sender_grid:
+        if geodesy is None:
+            if TYPE_CHECKING:
+                assert entry.distance is not None
+                assert entry.heading is not None
+                assert entry.sender_coordinates is not None
+            coords = entry.sender_coordinates
+            geodesy = EntryGeodesy(
+                entry.distance, entry.heading, coords.latitude, coords.longitude
+            )
+            del coords
+
+        m["tags"]["has_sender_grid"] = True
+        m["fields"]["distance"] = geodesy.distance
+        m["fields"]["heading"] = geodesy.heading
+        m["tags"]["heading"] = int(geodesy.heading)
+        m["fields"]["sender_grid"] = entry.sender_grid
+
+        m["fields"]["sender_latitude"] = geodesy.latitude
+        m["fields"]["sender_longitude"] = geodesy.longitude
+
+    else:
+        m["tags"]["has_sender_grid"] = False
+
+    if entry.sender_callsign:
+        m["fields"]["sender_callsign"] = entry.sender_callsign
+
+    if entry.target_callsign:
+        m["fields"]["target_callsign"] = entry.target_callsign
+
+    if schema is Schema.COMPACT:
+        for key in _COMPACT_FIELDS:
+            m["fields"][key] = m["tags"].pop(key)
+        for key in _COMPACT_DROPPED_TAGS:
+            m["tags"].pop(key, None)
+
+    return m
+
+
+def entriesToInfluxdb(
+    entries: Sequence[Entry], schema: Schema = Schema.FULL
+) -> Iterator[InfluxdbMeasurement]:
+    """
+    entryToInfluxdb for a batch of entries, computing distance and heading
+    for all of them at once.
+    """
+    geodesy = calculate_batch_distance_bearing(entries).rows()
+    return (entryToInfluxdb(entry, row, schema) for entry, row in zip(entries, geodesy))
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def timeToNanoseconds(time: datetime.datetime) -> int:
+    """Nanoseconds since epoch of a naive UTC datetime."""
+    delta = time - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + (
+        delta.microseconds * 1000
+    )
+
+
+@lru_cache(maxsize=16384)
+def escapeTag(value: str) -> str:
+    """Escapes a measurement name, tag key or tag value."""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(" ", "\\ ")
+        .replace(",", "\\,")
+        .replace("=", "\\=")
+        .replace("\n", "\\n")
+    )
+
+
+def quoteField(value: str) -> str:
+    """Quotes a string field value."""
+    return (
+        '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+    )
+
+
+def formatNumberField(value: Union[int, float]) -> str:
+    if type(value) is int:
+        return f"{value}i"
+    return repr(float(value))
+
+
+_NANOSECONDS_PER_HOUR = 3600 * 1_000_000_000
+_NANOSECONDS_PER_DAY = 24 * _NANOSECONDS_PER_HOUR
+
+
+@lru_cache(maxsize=64)
+def _epochDay(day: int) -> datetime.date:
+    return _EPOCH.date() + datetime.timedelta(days=day)
+
+
+@lru_cache(maxsize=None)
+def _modeName(value: int) -> str:
+    return str(Mode(value))
+
+
+@lru_cache(maxsize=64)
+def _dateFields(date: datetime.date) -> str:
+    isoyear, isoweek, isoweekday = date.isocalendar()
+    return (
+        f",received_isoweek={isoweek}i"
+        f",received_isoweekday={isoweekday}i"
+        f",received_isoyear={isoyear}i"
+        f",received_month={date.month}i"
+        f",received_year={date.year}i"
+    )
+
+
+@lru_cache(maxsize=64)
+def _dateTags(date: datetime.date) -> str:
+    isoyear, isoweek, isoweekday = date.isocalendar()
+    return (
+        f",received_isoweek={isoweek}"
+        f",received_isoweekday={isoweekday}"
+        f",received_isoyear={isoyear}"
+        f",received_month={date.month}"
+        f",received_year={date.year}"
+    )
+
+
+class LineProtocolEncoder:
+    """
+    Encodes entries to InfluxDB line protocol directly, producing the same
+    lines the influxdb client makes from entryToInfluxdb points, without
+    building the intermediate dicts.
+
+    Tags and fields are written in sorted key order, as the client does.
+    """
+
+    def __init__(self, measurement: str = "entry", schema: Schema = Schema.FULL):
+        self.measurement = escapeTag(measurement)
+        self.compact = schema is Schema.COMPACT
+        # Reused for every line
+        self._buffer: List[str] = []
+
+    def encode(
+        self,
+        entries: Sequence[Entry],
+        geodesy: Optional[Sequence[Optional[EntryGeodesy]]] = None,
+    ) -> List[str]:
+        """geodesy can be given if it was computed for the entries already."""
+        if geodesy is None:
+            geodesy = calculate_batch_distance_bearing(entries).rows()
+        return list(map(self.encodeEntry, entries, geodesy))
+
+    def encodeEntry(self, entry: Entry, geodesy: Optional[EntryGeodesy] = None) -> str:
+        if not entry.sender_grid:
+            geodesy = None
+        elif geodesy is None:
+            if TYPE_CHECKING:
+                assert entry.distance is not None
+                assert entry.heading is not None
+                assert entry.sender_coordinates is not None
+            coords = entry.sender_coordinates
+            geodesy = EntryGeodesy(
+                entry.distance, entry.heading, coords.latitude, coords.longitude
+            )
+
+        time = entry.time
+        return self._encode(
+            entry.band_name,
+            entry.cq,
+            geodesy,
+            str(entry.mode),
+            time.hour,
+            time.date(),
+            timeToNanoseconds(time),
+            entry.receiver_callsign,
+            entry.receiver_grid,
+            entry.snr,
+            entry.frequency,
+            entry.message,
+            entry.sender_callsign,
+            entry.sender_grid,
+            entry.target_callsign,
+        )
+
+    def encodeBatch(self, batch: "EntryBatch") -> List[str]:
+        """encode for an EntryBatch, straight from its columns."""
+        geodesy = batch.geodesy().rows()
+        days = (batch.time // _NANOSECONDS_PER_DAY).tolist()
+        hours = (batch.time // _NANOSECONDS_PER_HOUR % 24).tolist()
+        modes = [_modeName(value) for value in batch.mode.tolist()]
+        return list(
+            map(
+                self._encode,
+                batch.band().tolist(),
+                batch.cq.tolist(),
+                geodesy,
+                modes,
+                hours,
+                map(_epochDay, days),
+                batch.time.tolist(),
+                batch.receiver_callsign,
+                batch.receiver_grid,
+                batch.snr.tolist(),
+                batch.frequency.tolist(),
+                batch.message,
+                batch.sender_callsign,
+                batch.sender_grid,
+                batch.target_callsign,
+            )
+        )
+
+    def _encode(
+        self,
+        band: Optional[str],
+        cq: bool,
+        geodesy: Optional[EntryGeodesy],
+        mode: str,
+        hour: int,
+        date: datetime.date,
+        timestamp: int,
+        receiver_callsign: str,
+        receiver_grid: str,
+        snr: int,
+        frequency: int,
+        message: str,
+        sender_callsign: Optional[str],
+        sender_grid: Optional[str],
+        target_callsign: Optional[str],
+    ) -> str:
+        out = self._buffer
+        out.clear()
+        append = out.append
+
+        # Tags
+        append(self.measurement)
+        if band:
+            append(",band=")
+            append(escapeTag(band))
+        append(",cq=True" if cq else ",cq=False")
+        if geodesy is None:
+            append(",has_sender_grid=False")
+        elif self.compact:
+            append(",has_sender_grid=True")
+        else:
+            append(",has_sender_grid=True,heading=")
+            append(str(int(geodesy.heading)))
+        append(",mode=")
+        append(escapeTag(mode))
+        if self.compact:
+            if receiver_callsign:
+                append(",receiver_callsign=")
+                append(escapeTag(receiver_callsign))
+        else:
+            append(",received_hour=")
+            append(str(hour))
+            append(_dateTags(date))
+            if receiver_callsign:
+                append(",receiver_callsign=")
+                append(escapeTag(receiver_callsign))
+            if receiver_grid:
+                append(",receiver_grid=")
+                append(escapeTag(receiver_grid))
+            append(",snr=")
+            append(str(snr))
+
+        # Fields
+        if geodesy is not None:
+            append(" distance=")
+            append(formatNumberField(geodesy.distance))
+            append(",frequency=")
+        else:
+            append(" frequency=")
+        append(formatNumberField(frequency))
+        if geodesy is not None:
+            append(",heading=")
+            append(formatNumberField(geodesy.heading))
+        append(",message=")
+        append(quoteField(message))
+        if self.compact:
+            append(",received_hour=")
+            append(str(hour))
+            append("i")
+            append(_dateFields(date))
+            append(",receiver_grid=")
+            append(quoteField(receiver_grid))
+        if sender_callsign:
+            append(",sender_callsign=")
+            append(quoteField(sender_callsign))
+        if geodesy is not None:
+            append(",sender_grid=")
+            append(quoteField(sender_grid))  # type: ignore [arg-type]
+            append(",sender_latitude=")
+            append(formatNumberField(geodesy.latitude))
+            append(",sender_longitude=")
+            append(formatNumberField(geodesy.longitude))
+        append(",snr=")
+        append(formatNumberField(snr))
+        if target_callsign:
+            append(",target_callsign=")
+            append(quoteField(target_callsign))
+
+        append(" ")
+        append(str(timestamp))
+        return "".join(out)
+
+
+@dataclass
+class HttpWriterConfig:
+    # Compress request bodies
+    gzip: bool = True
+    # A request holds at most this many points ...
+    batch_points: int = 5000
+    # ... and at most this many (uncompressed) bytes, whichever is reached first.
+    batch_bytes: int = 1_000_000
+    # Kept-alive connections to InfluxDB
+    pool_size: int = 4
+    # Requests sent in parallel
+    max_in_flight: int = 1
+
+
+class RequestStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.points = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, points: int, raw_bytes: int, sent_bytes: int, latency: float):
+        with self._lock:
+            self.requests += 1
+            self.points += points
+            self.raw_bytes += raw_bytes
+            self.sent_bytes += sent_bytes
+            self.latency_total += latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def __str__(self):
+        with self._lock:
+            avg = self.latency_total / self.requests if self.requests else 0.0
+            return (
+                f"requests={self.requests} failures={self.failures}"
+                f" points={self.points} raw_bytes={self.raw_bytes}"
+                f" sent_bytes={self.sent_bytes}"
+                f" latency_avg={avg * 1000:.1f}ms"
+                f" latency_max={self.latency_max * 1000:.1f}ms"
+            )
+
+
+class InfluxHttpWriter:
+    """
+    Sends line protocol to the InfluxDB /write endpoint.
+
+    Lines are grouped into as few requests as HttpWriterConfig allows,
+    gzip compressed, and optionally sent several at a time. Requests go
+    through InfluxDBClient.request, so its session, retries and error
+    handling are used. The client must not have gzip enabled itself.
+    """
+
+    def __init__(
+        self,
+        client: influxdb.InfluxDBClient,
+        database: str,
+        config: HttpWriterConfig = HttpWriterConfig(),
+    ):
+        self.client = client
+        self.database = database
+        self.config = config
+        self.stats = RequestStats()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if config.max_in_flight > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=config.max_in_flight, thread_name_prefix="influxdb-http"
+            )
+
+    def batches(self, lines: Iterable[str]) -> Iterator[Tuple[int, bytes]]:
+        """Yields (number of points, request body)"""
+        batch: List[bytes] = []
+        size = 0
+        for line in lines:
+            data = line.encode("utf8")
+            full = len(batch) >= self.config.batch_points
+            if batch and (full or size + len(data) + 1 > self.config.batch_bytes):
+                yield len(batch), b"\n".join(batch) + b"\n"
+                batch = []
+                size = 0
+            batch.append(data)
+            size += len(data) + 1
+        if batch:
+            yield len(batch), b"\n".join(batch) + b"\n"
+
+    def send(self, points: int, body: bytes):
+        headers = {"Content-Type": "application/octet-stream"}
+        data = body
+        if self.config.gzip:
+            data = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+
+        start = perf_counter()
+        try:
+            self.client.request(
+                url="write",
+                method="POST",
+                params={"db": self.database, "precision": "n"},
+                data=data,
+                expected_response_code=204,
+                headers=headers,
+            )
+        except Exception:
+            self.stats.record_failure()
+            raise
+        self.stats.record(points, len(body), len(data), perf_counter() - start)
+
+    def write(self, lines: Iterable[str]):
+        """
+        Writes all lines, raising the first error if any request failed.
+        Batches sent before the failure are not rolled back; writing the
+        same points again is harmless, InfluxDB overwrites them.
+        """
+        if self._executor is None:
+            for points, body in self.batches(lines):
+                self.send(points, body)
+            return
+
+        futures = [
+            self._executor.submit(self.send, points, body)
+            for points, body in self.batches(lines)
+        ]
+        for future in futures:
+            future.result()
@@ -0,0 +1,139 @@
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from time import monotonic
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from .utils import Entry
+from .wsjtx_extras import parseWsjtxAllLogLineFast
+
+# Large enough to amortize the cost of shipping entries between processes,
+# small enough that a handful of chunks in flight don't use much memory.
+CHUNK_SIZE = 8 * 1024 * 1024
+
+ByteRange = Tuple[int, int]
+
+
+def chunkFile(file_path: str, chunk_size: int = CHUNK_SIZE) -> List[ByteRange]:
+    """
+    Splits a file into (start, end) byte ranges of about chunk_size bytes.
+    Every range starts at the beginning of a line and ends after a newline
+    (or at the end of the file), so no line is split between two ranges.
+    """
+    size = os.path.getsize(file_path)
+    ranges = []
+    with open(file_path, "rb") as fh:
+        start = 0
+        while start < size:
+            end = start + chunk_size
+            if end >= size:
+                end = size
+            else:
+                fh.seek(end)
+                fh.readline()
+                end = fh.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parseChunk(file_path: str, byte_range: ByteRange) -> Tuple[List[Entry], int]:
+    """
+    Parses the lines within byte_range.
+    Returns the resulting entries, and the number of lines read.
+    """
+    start, end = byte_range
+    with open(file_path, "rb") as fh:
+        fh.seek(start)
+        lines = fh.read(end - start).splitlines()
+
+    entries = []
+    for raw_line in lines:
+        try:
+            entry = parseWsjtxAllLogLineFast(raw_line)
+
+            if entry is None:
+                continue
+
+            entries.append(entry)
+        except ValueError:
+            print(raw_line.decode("utf8", errors="replace"))
+
+    return entries, len(lines)
+
+
+class Throughput:
+    def __init__(self, report_interval: Optional[float] = 10):
+        self.report_interval = report_interval
+        self.lines = 0
+        self.entries = 0
+        self.start = monotonic()
+        self._last_report = self.start
+
+    def add(self, lines: int, entries: int):
+        self.lines += lines
+        self.entries += entries
+        if self.report_interval is not None:
+            now = monotonic()
+            if now - self._last_report >= self.report_interval:
+                self._last_report = now
+                print(f"Reprocessing: {self}")
+
+    def __str__(self):
+        elapsed = max(monotonic() - self.start, 1e-9)
+        return (
+            f"{self.lines} lines, {self.entries} entries in {elapsed:.1f}s"
+            f" ({self.lines / elapsed:.0f} lines/s, {self.entries / elapsed:.0f} entries/s)"
+        )
+
+
+def parseWsjtxAllLogParallel(
+    file_path: str,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    throughput: Optional[Throughput] = None,
+) -> Iterator[Entry]:
+    """
+    Like parseWsjtxAllLog, but parses chunks of the file in worker processes.
+    Entries are yielded in file order. With workers <= 1 the chunks are
+    parsed in this process.
+    """
+    ranges = chunkFile(file_path, chunk_size)
+    if throughput is None:
+        throughput = Throughput()
+
+    def collect(results: Iterable[Tuple[List[Entry], int]]) -> Iterator[Entry]:
+        for entries, lines in results:
+            throughput.add(lines, len(entries))
+            yield from entries
+
+    if workers <= 1:
+        yield from collect(parseChunk(file_path, r) for r in ranges)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from collect(_orderedResults(executor, file_path, ranges, workers))
+
+    print(f"Reprocessed {throughput}")
+
+
+def _orderedResults(
+    executor: ProcessPoolExecutor,
+    file_path: str,
+    ranges: List[ByteRange],
+    workers: int,
+) -> Iterator[Tuple[List[Entry], int]]:
+    # Executor.map would submit every chunk up front, and buffer the parsed
+    # entries of the whole file if the consumer is slower than the workers.
+    in_flight: Deque[Future] = deque()
+    pending = iter(ranges)
+    for byte_range in pending:
+        in_flight.append(executor.submit(parseChunk, file_path, byte_range))
+        if len(in_flight) >= workers * 2:
+            break
+
+    while in_flight:
+        result = in_flight.popleft().result()
+        for byte_range in pending:
+            in_flight.append(executor.submit(parseChunk, file_path, byte_range))
+            break
+        yield result
@@ -0,0 +1,158 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .influx import escapeTag, formatNumberField, timeToNanoseconds
+from .utils import Entry, EntryGeodesy
+
+# (window start, band, mode, receiver_callsign)
+WindowKey = Tuple[datetime.datetime, str, str, str]
+
+
+@dataclass
+class RollupWindow:
+    count: int = 0
+    snr_min: int = 0
+    snr_max: int = 0
+    snr_sum: int = 0
+    # Exact; a window holds at most a few thousand distinct callsigns.
+    senders: Set[str] = field(default_factory=set)
+    distance_max: Optional[float] = None
+
+    def add(self, entry: Entry, geodesy: Optional[EntryGeodesy]):
+        if self.count:
+            if entry.snr < self.snr_min:
+                self.snr_min = entry.snr
+            elif entry.snr > self.snr_max:
+                self.snr_max = entry.snr
+        else:
+            self.snr_min = self.snr_max = entry.snr
+        self.count += 1
+        self.snr_sum += entry.snr
+        if entry.sender_callsign:
+            self.senders.add(entry.sender_callsign)
+        if geodesy is not None and (
+            self.distance_max is None or geodesy.distance > self.distance_max
+        ):
+            self.distance_max = geodesy.distance
+
+
+class Rollup:
+    """
+    Summarizes entries per window of resolution, band, mode and receiver.
+
+    Windows are closed by event time: once an entry at or after the end of a
+    window has been added, the window is complete and is returned by close().
+    This works both live, where entries are released in time order after
+    the settle window, and when reprocessing ALL.TXT, which is in time order
+    too. Entries for a window that was already closed are counted in late,
+    and otherwise ignored, since writing the window again would replace the
+    earlier point.
+    """
+
+    def __init__(self, resolution: datetime.timedelta, measurement: str):
+        self.resolution = resolution
+        self.measurement = escapeTag(measurement)
+        self.windows: Dict[WindowKey, RollupWindow] = {}
+        self.watermark: Optional[datetime.datetime] = None
+        # Start of the oldest window that may still be open
+        self._closed_before: Optional[datetime.datetime] = None
+        self.late = 0
+
+    def windowStart(self, time: datetime.datetime) -> datetime.datetime:
+        return time - (time - datetime.datetime.min) % self.resolution
+
+    def add(
+        self,
+        entries: Sequence[Entry],
+        geodesy: Optional[Sequence[Optional[EntryGeodesy]]] = None,
+    ):
+        if geodesy is None:
+            geodesy = [None] * len(entries)
+        windows = self.windows
+        for entry, row in zip(entries, geodesy):
+            start = self.windowStart(entry.time)
+            if self._closed_before is not None and start < self._closed_before:
+                self.late += 1
+                continue
+            key = (
+                start,
+                entry.band_name or "",
+                str(entry.mode),
+                entry.receiver_callsign,
+            )
+            window = windows.get(key)
+            if window is None:
+                window = windows[key] = RollupWindow()
+            window.add(entry, row)
+            if self.watermark is None or entry.time > self.watermark:
+                self.watermark = entry.time
+
+    def close(self, force: bool = False) -> List[Tuple[WindowKey, RollupWindow]]:
+        """
+        Removes and returns the completed windows, oldest first.
+        force closes all windows, e.g. on shutdown.
+        """
+        if force:
+            ready = sorted(self.windows)
+            if not ready:
+                return []
+            limit = ready[-1][0] + self.resolution
+        elif self.watermark is None:
+            return []
+        else:
+            limit = self.windowStart(self.watermark)
+            ready = sorted(key for key in self.windows if key[0] < limit)
+
+        if self._closed_before is None or limit > self._closed_before:
+            self._closed_before = limit
+        return [(key, self.windows.pop(key)) for key in ready]
+
+    def toLineProtocol(self, closed: Iterable[Tuple[WindowKey, RollupWindow]]):
+        lines = []
+        for (start, band, mode, receiver), window in closed:
+            tags = ""
+            if band:
+                tags += f",band={escapeTag(band)}"
+            tags += f",mode={escapeTag(mode)}"
+            if receiver:
+                tags += f",receiver_callsign={escapeTag(receiver)}"
+
+            fields = f"count={window.count}i"
+            if window.distance_max is not None:
+                fields += f",distance_max={formatNumberField(window.distance_max)}"
+            fields += (
+                f",snr_max={window.snr_max}i"
+                f",snr_mean={formatNumberField(window.snr_sum / window.count)}"
+                f",snr_min={window.snr_min}i"
+                f",unique_senders={len(window.senders)}i"
+            )
+            lines.append(
+                f"{self.measurement}{tags} {fields} {timeToNanoseconds(start)}"
+            )
+        return lines
+
+
+class Rollups:
+    """The entry_1m and entry_1h rollups, fed and closed together."""
+
+    def __init__(self):
+        self.rollups = [
+            Rollup(datetime.timedelta(minutes=1), "entry_1m"),
+            Rollup(datetime.timedelta(hours=1), "entry_1h"),
+        ]
+
+    def add(
+        self,
+        entries: Sequence[Entry],
+        geodesy: Optional[Sequence[Optional[EntryGeodesy]]] = None,
+    ):
+        for rollup in self.rollups:
+            rollup.add(entries, geodesy)
+
+    def closedLines(self, force: bool = False) -> List[str]:
+        """Line protocol of all windows completed since the last call."""
+        lines = []
+        for rollup in self.rollups:
+            lines += rollup.toLineProtocol(rollup.close(force))
+        return lines
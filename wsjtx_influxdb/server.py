@@ -0,0 +1,257 @@
+import asyncio
+import datetime
+import socket
+import struct
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Protocol, Tuple
+
+from wsjtx_srv.wsjtx import (  # type: ignore [import]
+    WSJTX_Telegram as Telegram,
+    WSJTX_Heartbeat as Heartbeat,
+    WSJTX_Status as Status,
+    WSJTX_Decode as Decode,
+    WSJTX_WSPR_Decode as WSPRDecode,
+)
+
+from .config import RECEIVER_CALLSIGN, RECEIVER_GRID
+from .stats import metrics
+from .utils import Entry, Mode
+from .wsjtx_extras import message_cache, parse_time
+
+Address = Tuple[str, int]
+SenderKey = Tuple[Address, str]
+
+# magic, schema and message type, followed by the client id
+_HEADER = struct.Struct(">III")
+_LENGTH = struct.Struct(">I")
+MAGIC = 0xADBCCBDA
+# Length of a null string
+_NULL = 0xFFFFFFFF
+
+_TYPE_NAMES = {
+    kind: cls.__name__.replace("WSJTX_", "")
+    for kind, cls in Telegram.type_registry.items()
+}
+# The only telegrams decoded in full, all others are just counted
+_HANDLED = frozenset((Status.type, Decode.type, WSPRDecode.type))
+_DECODES = frozenset((Decode.type, WSPRDecode.type))
+
+
+def peekHeader(data: bytes) -> Tuple[Optional[int], bool]:
+    """
+    Message type of a telegram, None if it isn't one, and for decodes whether
+    is_new is set (it comes right after the id), without decoding it all.
+    """
+    if len(data) < _HEADER.size + _LENGTH.size:
+        return None, False
+    magic, _schema, kind = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        return None, False
+    if kind not in _DECODES:
+        return kind, False
+    (id_length,) = _LENGTH.unpack_from(data, _HEADER.size)
+    if id_length == _NULL:
+        id_length = 0
+    offset = _HEADER.size + _LENGTH.size + id_length
+    return kind, offset < len(data) and data[offset] != 0
+
+
+class EntrySink(Protocol):
+    def submit(self, entry: Entry, block: bool = False) -> bool:
+        ...
+
+    def record_latency(self, seconds: float):
+        ...
+
+
+@dataclass
+class ReceiverState:
+    """What the last Status telegram told us about one WSJT-X instance."""
+
+    dial_frequency: int = 0
+    grid: str = RECEIVER_GRID
+    callsign: str = RECEIVER_CALLSIGN
+
+
+class WsjtxProtocol(asyncio.DatagramProtocol):
+    """
+    Receives WSJT-X telegrams from any number of instances.
+
+    State is kept per sender, keyed by source address and the WSJT-X client
+    id, so instances sharing a port don't see each other's dial frequency.
+    """
+
+    def __init__(self, sink: EntrySink):
+        self.sink = sink
+        self.receivers: Dict[SenderKey, ReceiverState] = {}
+
+    def datagram_received(self, data: bytes, addr: Address):
+        received = perf_counter()
+        kind, is_new = peekHeader(data)
+        if kind is None:
+            metrics.inc("datagrams_dropped", reason="invalid")
+            return
+        name = _TYPE_NAMES.get(kind, str(kind))
+        metrics.inc("datagrams", type=name)
+        if kind not in _HANDLED:
+            if kind != Heartbeat.type:
+                print(f"Ignored {name} telegram from {addr[0]}:{addr[1]}")
+            return
+        if kind in _DECODES and not is_new:
+            # Replayed decodes, on request of another companion program
+            metrics.inc("decodes_dropped", reason="not_new")
+            return
+
+        tel = Telegram.from_bytes(data)
+        key = (addr[:2], tel.id)
+        state = self.receivers.get(key)
+        if state is None:
+            state = self.receivers[key] = ReceiverState()
+
+        if isinstance(tel, Status):
+            self.handle_status(key, state, tel)
+            return
+
+        if isinstance(tel, WSPRDecode):
+            entry = self.handle_wspr_decode(state, tel)
+        else:
+            entry = self.handle_decode(state, tel)
+        if entry is not None:
+            print(entry)
+            self.sink.submit(entry)
+            latency = perf_counter() - received
+            self.sink.record_latency(latency)
+            metrics.observe("parse_seconds", latency)
+
+    def handle_status(self, key: SenderKey, state: ReceiverState, tel: Status):
+        # Status dial_frq=14074000 mode=FT8 dx_call=ZD9W report=0 tx_mode=FT8 tx_enabled=0 xmitting=0 decoding=1 rx_df=2259 tx_df=1500 de_call=SWL de_grid=MH09me dx_grid=None tx_watchdog=0 sub_mode=None fast_mode=0 special_op=0 frq_tolerance=4294967295 t_r_period=4294967295 config_name=Default tx_message=None
+        if tel.dial_frq != state.dial_frequency:
+            (host, port), client_id = key
+            print(
+                f"{datetime.datetime.utcnow()}\tFrequency changed\t{tel.dial_frq/1000:8.3f} kHz\t{client_id}@{host}:{port}"
+            )
+        state.dial_frequency = tel.dial_frq
+        state.grid = tel.de_grid
+        state.callsign = tel.de_call
+
+    def handle_decode(self, state: ReceiverState, tel: Decode) -> Optional[Entry]:
+        # Decode is_new=1 time=81810000 snr=-20 delta_t=0.5 delta_f=1709 mode=~ message=CQ SV5AZP KM46 low_confidence=0 off_air=0
+        if not state.dial_frequency:
+            metrics.inc("decodes_dropped", reason="no_dial_frequency")
+            return None
+
+        if tel.off_air:
+            metrics.inc("decodes_dropped", reason="off_air")
+            return None
+
+        if not tel.is_new:
+            metrics.inc("decodes_dropped", reason="not_new")
+            return None
+
+        if tel.low_confidence:
+            metrics.inc("decodes_dropped", reason="low_confidence")
+            print(tel)
+            return None
+
+        if tel.message is None:
+            metrics.inc("decodes_dropped", reason="no_message")
+            print(tel)
+            return None
+
+        message, parsed = message_cache.parse(tel.message)
+
+        return Entry(
+            message=message,
+            mode=Mode.get(tel.mode),
+            snr=int(tel.snr),
+            frequency=state.dial_frequency + tel.delta_f,
+            dial_frequency=state.dial_frequency,
+            time=parse_time(tel.time, tel.delta_t),
+            receiver_grid=state.grid,
+            receiver_callsign=state.callsign,
+            cq=parsed.cq,
+            sender_callsign=parsed.sender_callsign,
+            sender_grid=parsed.sender_grid,
+            target_callsign=parsed.target_callsign,
+        )
+
+    def handle_wspr_decode(
+        self, state: ReceiverState, tel: WSPRDecode
+    ) -> Optional[Entry]:
+        # WSPR_Decode is_new=1 time=7680000 snr=-25 delta_t=0.6000000238418579 frq=10140138 drift=0 callsign=IU2PJI grid=JN45 power=23 off_air=0
+        if tel.off_air:
+            metrics.inc("decodes_dropped", reason="off_air")
+            return None
+
+        if not tel.callsign:
+            metrics.inc("decodes_dropped", reason="no_message")
+            print(tel)
+            return None
+
+        # The message as WSPR sends it; hashed callsigns come without grid
+        if tel.grid:
+            message = f"{tel.callsign} {tel.grid} {tel.power}"
+        else:
+            message = f"{tel.callsign} {tel.power}"
+
+        # frq is the frequency of the signal, not the dial frequency
+        return Entry(
+            message=message,
+            mode=Mode.WSPR,
+            snr=int(tel.snr),
+            frequency=int(tel.frq),
+            time=parse_time(tel.time, tel.delta_t),
+            receiver_grid=state.grid,
+            receiver_callsign=state.callsign,
+            sender_callsign=tel.callsign,
+            sender_grid=tel.grid or None,
+        )
+
+
+def multicast_socket(group: str, port: int, interface: str = "0.0.0.0"):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(("", port))
+    membership = struct.pack(
+        "4s4s", socket.inet_aton(group), socket.inet_aton(interface)
+    )
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    sock.setblocking(False)
+    return sock
+
+
+async def serve(
+    sink: EntrySink,
+    listen: Iterable[Address],
+    multicast_groups: Iterable[Address] = (),
+):
+    """
+    Receives on every (host, port) in listen and every (group, port) in
+    multicast_groups until cancelled. All endpoints share one protocol
+    instance, and with it the per-sender state.
+    """
+    loop = asyncio.get_running_loop()
+    protocol = WsjtxProtocol(sink)
+    transports: List[asyncio.BaseTransport] = []
+    try:
+        for host, port in listen:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: protocol, local_addr=(host or "0.0.0.0", port)
+            )
+            transports.append(transport)
+            print(f"Listening on {host or '*'}:{port}")
+
+        for group, port in multicast_groups:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: protocol, sock=multicast_socket(group, port)
+            )
+            transports.append(transport)
+            print(f"Listening on multicast group {group}:{port}")
+
+        await asyncio.Future()
+    finally:
+        for endpoint in transports:
+            endpoint.close()
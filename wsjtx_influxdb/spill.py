@@ -0,0 +1,196 @@
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import BinaryIO, Callable, Iterable, List, Optional
+
+# Segments are rolled over at this size, and deleted once fully replayed.
+SEGMENT_BYTES = 64 * 1024 * 1024
+# Data read from disk per replayed request
+REPLAY_BYTES = 1024 * 1024
+
+SEGMENT_SUFFIX = ".lp"
+
+
+@dataclass
+class SpillPosition:
+    """How far the spill log has been replayed."""
+
+    segment: int = 0
+    offset: int = 0
+
+    @classmethod
+    def load(cls, path: str) -> "SpillPosition":
+        try:
+            with open(path, "r", encoding="utf8") as fh:
+                return cls(**json.load(fh))
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as fh:
+            json.dump(asdict(self), fh)
+        os.replace(tmp_path, path)
+
+
+class SpillQueue:
+    """
+    Append-only log of line protocol on disk, for points that could not be
+    written to InfluxDB.
+
+    The log is split into numbered segment files. Lines are appended to the
+    newest segment and replayed from the oldest, in the order they were
+    spilled, a bounded number of bytes at a time. Replay progress is kept in
+    a position file, so a restart continues where the last one stopped;
+    at worst the last replayed request is sent again, which InfluxDB treats
+    as an overwrite of the same points.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = SEGMENT_BYTES,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._position_path = os.path.join(directory, "position")
+        self.position = SpillPosition.load(self._position_path)
+        self._segments = self._listSegments()
+        while self._segments and self._segments[0] < self.position.segment:
+            # Replayed, but not removed before a crash
+            os.remove(self._segmentPath(self._segments.pop(0)))
+        if self._segments and self.position.segment < self._segments[0]:
+            self.position = SpillPosition(self._segments[0], 0)
+
+        self._fh: Optional[BinaryIO] = None
+        self._write_segment = 0
+        # Bytes spilled but not replayed yet
+        self.pending_bytes = sum(
+            os.path.getsize(self._segmentPath(s)) for s in self._segments
+        )
+        if self._segments and self._segments[0] == self.position.segment:
+            self.pending_bytes -= self.position.offset
+
+    def _listSegments(self) -> List[int]:
+        segments = []
+        for name in os.listdir(self.directory):
+            stem, suffix = os.path.splitext(name)
+            if suffix == SEGMENT_SUFFIX and stem.isdigit():
+                segments.append(int(stem))
+        return sorted(segments)
+
+    def _segmentPath(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:08d}{SEGMENT_SUFFIX}")
+
+    def _openForAppend(self) -> BinaryIO:
+        if self._fh is not None and self._fh.tell() < self.segment_bytes:
+            return self._fh
+
+        self._closeWriter()
+        # Never append to a segment from an earlier run, it may end with a
+        # line that was cut short by a crash. Nor reuse the number of one that
+        # was replayed, the saved position may still point into it.
+        last = self._segments[-1] if self._segments else 0
+        segment = max(self.position.segment, last) + 1
+        self._segments.append(segment)
+        self._write_segment = segment
+        self._fh = open(self._segmentPath(segment), "ab")
+        return self._fh
+
+    def _closeWriter(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+            self._write_segment = 0
+
+    def append(self, lines: Iterable[str]):
+        """
+        Appends lines to the log, and fsyncs them: spills come a batch per
+        failed or overflowing flush, so this is one fsync per batch.
+        """
+        data = "".join(f"{line}\n" for line in lines).encode("utf8")
+        if not data:
+            return
+        fh = self._openForAppend()
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+        self.pending_bytes += len(data)
+
+    def _readChunk(self, max_bytes: int) -> Optional[bytes]:
+        """
+        Reads up to max_bytes of complete lines at the replay position,
+        dropping segments that have been replayed completely.
+        Returns None when there is nothing left to replay.
+        """
+        while self._segments:
+            segment = self._segments[0]
+            if self.position.segment != segment:
+                self.position = SpillPosition(segment, 0)
+
+            # Appends are flushed, so the segment being written can be read
+            active = segment == self._write_segment
+
+            with open(self._segmentPath(segment), "rb") as fh:
+                fh.seek(self.position.offset)
+                data = fh.read(max_bytes)
+                end = data.rfind(b"\n") + 1
+                if end == 0 and len(data) == max_bytes:
+                    # A single line longer than max_bytes
+                    data += fh.readline()
+                    end = data.rfind(b"\n") + 1
+
+            if end:
+                return data[:end]
+
+            if data:
+                # Cut short by a crash while it was being written
+                print(f"Spill: dropping incomplete line in segment {segment}")
+                self.pending_bytes -= len(data)
+
+            if active:
+                self._closeWriter()
+            # Move past the segment before removing it, a crash in between
+            # leaves a segment that is removed on startup, not replayed again.
+            self._segments.pop(0)
+            next_segment = self._segments[0] if self._segments else segment + 1
+            self.position = SpillPosition(next_segment, 0)
+            self.position.save(self._position_path)
+            os.remove(self._segmentPath(segment))
+        return None
+
+    def replay(
+        self,
+        write: Callable[[List[str]], object],
+        max_bytes: Optional[int] = None,
+        request_bytes: int = REPLAY_BYTES,
+    ) -> int:
+        """
+        Passes spilled lines to write, oldest first, request_bytes at a time,
+        until the log is empty or max_bytes have been replayed.
+        If write raises, the lines it was given stay in the log and the
+        exception propagates. Returns the number of lines replayed.
+        """
+        replayed_lines = 0
+        replayed_bytes = 0
+        while max_bytes is None or replayed_bytes < max_bytes:
+            data = self._readChunk(request_bytes)
+            if data is None:
+                break
+            lines = data.decode("utf8").split("\n")[:-1]
+            write(lines)
+
+            self.position.offset += len(data)
+            self.position.save(self._position_path)
+            self.pending_bytes -= len(data)
+            replayed_lines += len(lines)
+            replayed_bytes += len(data)
+        return replayed_lines
+
+    def close(self):
+        self._closeWriter()
+
+    def __bool__(self) -> bool:
+        return self.pending_bytes > 0
@@ -0,0 +1,262 @@
+import datetime
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .influx import escapeTag, formatNumberField, timeToNanoseconds
+
+MEASUREMENT = "wsjtx_influxdb_stats"
+PROMETHEUS_PREFIX = "wsjtx_influxdb_"
+
+# Upper bounds in seconds, from a fraction of a millisecond (parsing a
+# datagram) to tens of seconds (a write to a struggling InfluxDB).
+LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1,
+    5,
+    10,
+    30,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+MetricKey = Tuple[str, Labels]
+Number = Union[int, float]
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One more for values above the largest bound
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self) -> Iterator[Tuple[float, int]]:
+        """Yields (upper bound, values <= bound), ending with infinity."""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+class PipelineMetrics:
+    """
+    Counters, gauges and latency histograms of the ingest pipeline.
+
+    Updated from the receive loop and the writer thread, and exported as
+    InfluxDB line protocol or Prometheus text. Metrics are identified by a
+    name and optional string labels, e.g. inc("decodes_dropped", reason="off_air").
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[MetricKey, int] = {}
+        self.histograms: Dict[MetricKey, Histogram] = {}
+        # Read when exported, e.g. the length of a queue
+        self.gauges: Dict[str, Callable[[], Number]] = {}
+
+    def inc(self, name: str, value: int = 1, **labels: str):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name: str, **labels: str) -> "_Timer":
+        """Context manager observing the time spent in it."""
+        return _Timer(self, name, labels)
+
+    def gauge(self, name: str, read: Callable[[], Number]):
+        self.gauges[name] = read
+
+    def _readGauges(self) -> List[Tuple[str, Number]]:
+        values = []
+        for name, read in sorted(self.gauges.items()):
+            try:
+                values.append((name, read()))
+            except Exception as ex:
+                print(f"Failed to read gauge {name}: {ex}")
+        return values
+
+    def toLineProtocol(self, time: Optional[datetime.datetime] = None) -> List[str]:
+        """One point per metric, tagged with the metric name and its labels."""
+        if time is None:
+            time = datetime.datetime.utcnow()
+        timestamp = timeToNanoseconds(time)
+        measurement = escapeTag(MEASUREMENT)
+
+        def line(name: str, labels: Labels, fields: Dict[str, Number]) -> str:
+            tags = "".join(
+                f",{escapeTag(key)}={escapeTag(value)}"
+                for key, value in sorted(labels + (("metric", name),))
+            )
+            values = ",".join(
+                f"{escapeTag(key)}={formatNumberField(value)}"
+                for key, value in sorted(fields.items())
+            )
+            return f"{measurement}{tags} {values} {timestamp}"
+
+        lines = []
+        with self._lock:
+            for (name, labels), count in sorted(self.counters.items()):
+                lines.append(line(name, labels, {"count": count}))
+            for (name, labels), histogram in sorted(
+                self.histograms.items(), key=lambda item: item[0]
+            ):
+                fields: Dict[str, Number] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "max": histogram.max,
+                }
+                for bound, count in histogram.cumulative():
+                    fields[f"le_{bound:g}"] = count
+                lines.append(line(name, labels, fields))
+        for name, value in self._readGauges():
+            # Always a float, an InfluxDB field has one type across all series
+            lines.append(line(name, (), {"value": float(value)}))
+        return lines
+
+    def toPrometheus(self) -> str:
+        """Prometheus text exposition format."""
+
+        def labelText(labels: Labels, extra: Labels = ()) -> str:
+            if not labels and not extra:
+                return ""
+            pairs = ",".join(
+                '{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"'))
+                for key, value in labels + extra
+            )
+            return "{" + pairs + "}"
+
+        out = []
+        typed = set()
+
+        def declare(name: str, kind: str):
+            if name not in typed:
+                typed.add(name)
+                out.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), count in sorted(self.counters.items()):
+                full_name = f"{PROMETHEUS_PREFIX}{name}_total"
+                declare(full_name, "counter")
+                out.append(f"{full_name}{labelText(labels)} {count}")
+            for (name, labels), histogram in sorted(
+                self.histograms.items(), key=lambda item: item[0]
+            ):
+                full_name = f"{PROMETHEUS_PREFIX}{name}"
+                declare(full_name, "histogram")
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    out.append(
+                        f"{full_name}_bucket{labelText(labels, (('le', le),))} {count}"
+                    )
+                out.append(f"{full_name}_sum{labelText(labels)} {histogram.sum!r}")
+                out.append(f"{full_name}_count{labelText(labels)} {histogram.count}")
+        for name, value in self._readGauges():
+            full_name = f"{PROMETHEUS_PREFIX}{name}"
+            declare(full_name, "gauge")
+            out.append(f"{full_name} {value}")
+        return "\n".join(out) + "\n"
+
+
+class _Timer:
+    def __init__(self, metrics: PipelineMetrics, name: str, labels: Dict[str, str]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, perf_counter() - self.start, **self.labels)
+
+
+metrics = PipelineMetrics()
+
+
+class MetricsReporter(threading.Thread):
+    """Writes the metrics as line protocol every interval seconds."""
+
+    def __init__(
+        self,
+        write: Callable[[List[str]], object],
+        interval: float = 60,
+        metrics: PipelineMetrics = metrics,
+    ):
+        super().__init__(name="metrics-reporter", daemon=True)
+        self.write = write
+        self.interval = interval
+        self.metrics = metrics
+        self._stopped = threading.Event()
+
+    def report(self):
+        try:
+            self.write(self.metrics.toLineProtocol())
+        except Exception as ex:
+            print(f"Failed to write metrics: {ex}")
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.report()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def servePrometheus(
+    port: int, host: str = "", metrics: PipelineMetrics = metrics
+) -> ThreadingHTTPServer:
+    """Serves the metrics at /metrics on a background thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.toPrometheus().encode("utf8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(
+        target=server.serve_forever, name="prometheus", daemon=True
+    )
+    thread.start()
+    print(f"Serving metrics on {host or '*'}:{server.server_address[1]}/metrics")
+    return server
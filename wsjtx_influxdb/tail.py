@@ -0,0 +1,185 @@
+import datetime
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+from time import sleep
+from typing import BinaryIO, Deque, Iterator, List, Optional, Tuple
+
+from .utils import Entry
+from .wsjtx_extras import parseWsjtxAllLogLineFast
+
+READ_SIZE = 1024 * 1024
+
+
+@dataclass
+class Checkpoint:
+    """How far ALL.TXT has been imported."""
+
+    inode: int = 0
+    offset: int = 0
+    # ISO formatted time of the last imported entry
+    last_time: Optional[str] = None
+
+    @classmethod
+    def load(cls, state_path: str) -> "Checkpoint":
+        try:
+            with open(state_path, "r", encoding="utf8") as fh:
+                return cls(**json.load(fh))
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, state_path: str):
+        # Write and rename, so a crash never leaves a half written state file.
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as fh:
+            json.dump(asdict(self), fh)
+        os.replace(tmp_path, state_path)
+
+
+class AllLogTailer:
+    """
+    Imports ALL.TXT incrementally, following it as WSJT-X appends to it.
+
+    Progress is kept in a checkpoint file, so a restart resumes where the
+    last run stopped. The checkpoint only advances through confirm(), once
+    the entries read are written, so entries still queued when the process
+    dies are read again. If the file was replaced (rotated) or truncated, it
+    is read from the start, skipping entries older than the last one
+    imported. Only complete lines are consumed; a line WSJT-X is still
+    writing is picked up on the next read.
+    """
+
+    def __init__(self, file_path: str, state_path: str, poll_interval: float = 1):
+        self.file_path = file_path
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.checkpoint = Checkpoint.load(state_path)
+        self._fh: Optional[BinaryIO] = None
+        self._skip_before: Optional[datetime.datetime] = None
+        # Checkpoint after every chunk read, with the time of its last
+        # entry, waiting for confirm()
+        self._unconfirmed: Deque[
+            Tuple[Optional[datetime.datetime], Checkpoint]
+        ] = deque()
+        self._lock = threading.Lock()
+
+    def _open(self) -> bool:
+        try:
+            fh = open(self.file_path, "rb")
+        except FileNotFoundError:
+            return False
+
+        stat = os.fstat(fh.fileno())
+        checkpoint = self.checkpoint
+        if stat.st_ino != checkpoint.inode or stat.st_size < checkpoint.offset:
+            if checkpoint.inode:
+                print(f"{self.file_path} was replaced or truncated, reading from start")
+            self._restart(stat.st_ino)
+        fh.seek(checkpoint.offset)
+        self._fh = fh
+        return True
+
+    def _restart(self, inode: int):
+        checkpoint = self.checkpoint
+        checkpoint.inode = inode
+        checkpoint.offset = 0
+        if checkpoint.last_time is not None:
+            self._skip_before = datetime.datetime.fromisoformat(checkpoint.last_time)
+
+    def _close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def _readLines(self) -> List[bytes]:
+        assert self._fh is not None
+        fh = self._fh
+        data = fh.read(READ_SIZE)
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # Leave the incomplete line for the next read
+            fh.seek(self.checkpoint.offset + end)
+        self.checkpoint.offset += end
+        return data[:end].splitlines()
+
+    def _rotated(self) -> bool:
+        assert self._fh is not None
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return False
+        if stat.st_ino != os.fstat(self._fh.fileno()).st_ino:
+            return True
+        if stat.st_size < self.checkpoint.offset:
+            self._restart(stat.st_ino)
+            self._fh.seek(0)
+            print(f"{self.file_path} was truncated, reading from start")
+        return False
+
+    def read_available(self) -> Iterator[Entry]:
+        """Yields entries from all complete lines not yet imported."""
+        if self._fh is None and not self._open():
+            return
+
+        while True:
+            lines = self._readLines()
+            if not lines:
+                break
+
+            last_time = None
+
+            for line in lines:
+                try:
+                    entry = parseWsjtxAllLogLineFast(line)
+                except ValueError:
+                    print(line.decode("utf8", errors="replace"))
+                    continue
+
+                if entry is None:
+                    continue
+                if self._skip_before is not None:
+                    if entry.time < self._skip_before:
+                        continue
+                    self._skip_before = None
+
+                self.checkpoint.last_time = entry.time.isoformat()
+                last_time = entry.time
+                yield entry
+
+            with self._lock:
+                self._unconfirmed.append((last_time, replace(self.checkpoint)))
+
+        if self._rotated():
+            # Everything in the old file has been read, continue with the new.
+            self._close()
+            self._open()
+            yield from self.read_available()
+
+    def confirm(self, until: Optional[datetime.datetime] = None):
+        """
+        Saves the checkpoint, up to the last chunk read whose entries are all
+        older than until: all entries before until have been written (or
+        spilled). None confirms everything read so far.
+        May be called from another thread, e.g. the writer's.
+        """
+        with self._lock:
+            confirmed = None
+            unconfirmed = self._unconfirmed
+            while unconfirmed:
+                last_time, checkpoint = unconfirmed[0]
+                if until is not None and last_time is not None and last_time >= until:
+                    break
+                confirmed = unconfirmed.popleft()[1]
+            if confirmed is not None:
+                confirmed.save(self.state_path)
+
+    def follow(self) -> Iterator[Entry]:
+        """Yields entries as they are appended, forever."""
+        try:
+            while True:
+                yield from self.read_available()
+                sleep(self.poll_interval)
+        finally:
+            self._close()
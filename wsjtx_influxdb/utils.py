@@ -1,15 +1,24 @@
 import datetime
-from collections import namedtuple
+import math
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, namedtuple
 from dataclasses import dataclass
 from decimal import Decimal
 from enum import Enum, auto
-from typing import Dict, Optional, TextIO, Union
+from typing import Dict, List, Optional, Sequence, TextIO, Tuple, Union, overload
 from functools import cache, lru_cache
 from importlib import resources
+from time import monotonic
 
+import numpy as np
 from pyproj import Geod
 import maidenhead  # type: ignore [import]
 
+from .config import GEODESY_CACHE_SIZE
+
 NumberType = Union[int, float, Decimal]
 
 
@@ -58,26 +67,34 @@ class Mode(Enum):
     THROB = auto()
     OFDM = auto()
 
+    # Returned by Mode.get for names that are not recognized
+    UNKNOWN = -1
+
     @staticmethod
     def from_wsjtx(wsjtx_encoded_mode: str):
         return WSJTX_MODE_MAP.get(wsjtx_encoded_mode)
 
     @classmethod
-    def get(cls, name: str):
-        if len(name) == 1:
-            _wsjtx = cls.from_wsjtx(name)
-            if _wsjtx:
-                return _wsjtx
-
-        upper_name = name.upper()
-        if upper_name in cls.__members__:
-            return cls[upper_name]
-
-        stripped = dict(
-            [(x.strip("_"), cls[x]) for x in cls.__members__.keys() if "_" in x]
-        )
-        if upper_name in stripped:
-            return stripped[upper_name]
+    def get(cls, name: str) -> "Mode":
+        """
+        Mode from a WSJT-X mode symbol, or a (case insensitive) mode name.
+        Returns Mode.UNKNOWN, and counts the name in mode_misses, if the
+        name is not recognized.
+        """
+        try:
+            return _MODE_SEEN[name]
+        except KeyError:
+            pass
+
+        mode = _MODE_LOOKUP.get(_normalizeModeName(name), cls.UNKNOWN)
+        if mode is cls.UNKNOWN:
+            mode_misses[name] += 1
+        elif len(_MODE_SEEN) < 1024:
+            # Remember the name exactly as spelled, so the next lookup
+            # doesn't have to normalize it. Misses are not remembered, so
+            # garbage input can't grow this.
+            _MODE_SEEN[name] = mode
+        return mode
 
     def __str__(self):
         return self.name.strip("_")
@@ -95,6 +112,46 @@ WSJTX_MODE_MAP = {
     "&": Mode.MSK144,
 }
 
+# Other spellings of modes used by pskreporter.info and fldigi
+MODE_ALIASES = {
+    "USB": Mode.SSB,
+    "LSB": Mode.SSB,
+    "VARA": Mode.VARAC,
+    "DOMINO": Mode.DOMINOEX,
+    "MFSK16": Mode.MFSK,
+    "MFSK32": Mode.MFSK,
+    "THOR16": Mode.THOR,
+    "THOR22": Mode.THOR,
+    "MT631K": Mode.MT63,
+    "MT632K": Mode.MT63,
+    "OLIVIA8500": Mode.OLIVIA8,
+}
+
+
+def _normalizeModeName(name: str) -> str:
+    if len(name) == 1:
+        # WSJT-X mode symbols are case sensitive punctuation.
+        return name
+    return "".join(c for c in name.upper() if c.isalnum())
+
+
+def _buildModeLookup() -> Dict[str, Mode]:
+    lookup: Dict[str, Mode] = {}
+    for name, member in Mode.__members__.items():
+        if member is not Mode.UNKNOWN:
+            lookup[_normalizeModeName(name)] = member
+    for name, member in MODE_ALIASES.items():
+        lookup.setdefault(_normalizeModeName(name), member)
+    lookup.update(WSJTX_MODE_MAP)
+    return lookup
+
+
+# Normalized name -> Mode, for Mode.get
+_MODE_LOOKUP = _buildModeLookup()
+# Exact spelling -> Mode, of names Mode.get has seen before
+_MODE_SEEN: Dict[str, Mode] = {}
+mode_misses: Counter = Counter()
+
 
 @dataclass
 class DecimalDegrees:
@@ -112,47 +169,149 @@ class DecimalDegrees:
         )
 
 
-@dataclass
-class Entry:
-    mode: Mode
-    snr: int
-    frequency: int
-    message: str
-    time: datetime.datetime
-    receiver_grid: str
-    receiver_callsign: str
+@overload
+def _intern(value: str) -> str:
+    ...
 
-    sender_grid: Optional[str] = None
-    sender_callsign: Optional[str] = None
-    target_callsign: Optional[str] = None
 
-    cq: bool = False
+@overload
+def _intern(value: Optional[str]) -> Optional[str]:
+    ...
 
-    @property
-    def distance(self) -> Optional[int]:
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else value
+
+
+class Entry:
+    """
+    One decoded message.
+
+    Slotted, as hundreds of thousands of entries may be held while
+    reprocessing or while InfluxDB is unreachable. Callsigns and grids
+    repeat across entries, and are interned. Derived values (distance,
+    heading, sender_coordinates, band_name) are computed on first access
+    and cached, so entries must not be modified after they are created.
+    """
+
+    __slots__ = (
+        "mode",
+        "snr",
+        "frequency",
+        "message",
+        "time",
+        "receiver_grid",
+        "receiver_callsign",
+        "sender_grid",
+        "sender_callsign",
+        "target_callsign",
+        "cq",
+        # Not compared, only speeds up the band lookup
+        "dial_frequency",
+        # Caches, only set once computed
+        "_distance_bearing",
+        "_sender_coordinates",
+        "_band_name",
+    )
+
+    _FIELDS = __slots__[:11]
+
+    _distance_bearing: Optional["DistanceBearing"]
+    _sender_coordinates: Optional[DecimalDegrees]
+    _band_name: Optional[str]
+
+    def __init__(
+        self,
+        mode: Mode,
+        snr: int,
+        frequency: int,
+        message: str,
+        time: datetime.datetime,
+        receiver_grid: str,
+        receiver_callsign: str,
+        sender_grid: Optional[str] = None,
+        sender_callsign: Optional[str] = None,
+        target_callsign: Optional[str] = None,
+        cq: bool = False,
+        dial_frequency: Optional[int] = None,
+    ):
+        self.mode = mode
+        self.snr = snr
+        self.frequency = frequency
+        self.message = message
+        self.time = time
+        self.receiver_grid = _intern(receiver_grid)
+        self.receiver_callsign = _intern(receiver_callsign)
+        self.sender_grid = _intern(sender_grid)
+        self.sender_callsign = _intern(sender_callsign)
+        self.target_callsign = _intern(target_callsign)
+        self.cq = cq
+        self.dial_frequency = dial_frequency
+
+    def _distanceBearing(self) -> Optional["DistanceBearing"]:
+        try:
+            return self._distance_bearing
+        except AttributeError:
+            pass
+        result = None
         if self.sender_grid:
-            return calculate_qth_distance_bearing(
+            result = calculate_qth_distance_bearing(
                 self.receiver_grid, self.sender_grid
-            ).distance
+            )
+        self._distance_bearing = result
+        return result
+
+    @property
+    def distance(self) -> Optional[int]:
+        distance_bearing = self._distanceBearing()
+        if distance_bearing is not None:
+            return distance_bearing.distance
         return None
 
     @property
     def heading(self) -> Optional[float]:
-        if self.sender_grid:
-            return calculate_qth_distance_bearing(
-                self.receiver_grid, self.sender_grid
-            ).bearing
+        distance_bearing = self._distanceBearing()
+        if distance_bearing is not None:
+            return distance_bearing.bearing
         return None
 
     @property
     def sender_coordinates(self) -> Optional[DecimalDegrees]:
+        try:
+            return self._sender_coordinates
+        except AttributeError:
+            pass
+        coordinates = None
         if self.sender_grid:
-            return DecimalDegrees.fromGridsquare(self.sender_grid)
-        return None
+            coordinates = DecimalDegrees.fromGridsquare(self.sender_grid)
+        self._sender_coordinates = coordinates
+        return coordinates
 
     @property
     def band_name(self) -> Optional[str]:
-        return frequencyToBand(self.frequency)
+        try:
+            return self._band_name
+        except AttributeError:
+            band = self._band_name = frequencyToBand(
+                self.frequency, self.dial_frequency
+            )
+            return band
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._FIELDS)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None  # type: ignore [assignment]
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{name}={value!r}" for name, value in zip(self._FIELDS, self._values())
+        )
+        return f"Entry({values})"
 
     def __str__(self):
         return f"{self.time}\t{self.snr:> 2d}\t{self.mode}\t{self.frequency/1000: 8.3f} kHz\t{self.message}"
@@ -171,12 +330,133 @@ class FrequencyRange(namedtuple("FrequencyRange", ["minimum", "maximum"])):
         return super().__contains__(__key)
 
 
-def frequencyToBand(frequency: int) -> Optional[str]:
-    for name, frequency_range in getBandplan().items():
-        if frequency in frequency_range:
-            return name
-    print(f"Unknown band: {frequency}")
-    return None
+class BandIndex:
+    """
+    Sorted boundary index over a bandplan, for O(log n) band lookups.
+
+    The bandplan ranges (inclusive at both ends) may overlap, e.g. PMR446
+    within 70cm. They are cut into non-overlapping elementary pieces at
+    every range boundary: the boundaries themselves, and the open intervals
+    between them. Each piece is resolved once to the narrowest range that
+    contains it (the first in the bandplan, if equally wide), so sub-bands
+    and segments take precedence over the bands they are part of.
+
+    Decodes of one receiver are within a few kHz above its dial frequency,
+    which rarely changes. Lookups given the dial frequency are resolved
+    from the piece above it, memoized in a small LRU cache.
+    """
+
+    def __init__(self, bandplan: Dict[str, FrequencyRange], memo_size: int = 256):
+        ranges = [(float(r.minimum), float(r.maximum)) for r in bandplan.values()]
+        bounds: List[float] = sorted({bound for r in ranges for bound in r})
+        by_width = sorted(
+            bandplan.items(),
+            key=lambda item: float(item[1].maximum) - float(item[1].minimum),
+        )
+
+        def narrowest(frequency: float) -> Optional[str]:
+            for name, frequency_range in by_width:
+                if frequency_range.contains(frequency):
+                    return name
+            return None
+
+        self.bounds = bounds
+        # Band at each boundary
+        self.point_bands: List[Optional[str]] = [narrowest(b) for b in bounds]
+        # Band between bounds[i - 1] and bounds[i]; nothing outside of them.
+        self.gap_bands: List[Optional[str]] = [None]
+        self.gap_bands.extend(
+            narrowest((a + b) / 2) for a, b in zip(bounds, bounds[1:])
+        )
+        self.gap_bands.append(None)
+
+        self._bounds_array = np.array(bounds, dtype=float)
+        self._point_array = np.array(self.point_bands + [None], dtype=object)
+        self._gap_array = np.array(self.gap_bands, dtype=object)
+
+        self.memo_size = memo_size
+        self._dialPiece = self._piece
+        if memo_size:
+            self._dialPiece = lru_cache(maxsize=memo_size)(self._piece)
+
+    def _piece(self, dial: NumberType) -> Tuple[float, float, Optional[str]]:
+        """The open interval starting at or containing dial, and its band."""
+        i = bisect_right(self.bounds, dial)
+        low = self.bounds[i - 1] if i else -math.inf
+        high = self.bounds[i] if i < len(self.bounds) else math.inf
+        return low, high, self.gap_bands[i]
+
+    def lookup(
+        self, frequency: NumberType, dial: Optional[NumberType] = None
+    ) -> Optional[str]:
+        if dial is not None:
+            low, high, band = self._dialPiece(dial)
+            if low < frequency < high:
+                return band
+
+        i = bisect_left(self.bounds, frequency)
+        if i < len(self.bounds) and self.bounds[i] == frequency:
+            return self.point_bands[i]
+        return self.gap_bands[i]
+
+    def lookup_many(self, frequencies) -> np.ndarray:
+        """Vectorized lookup, returns an object array of band names or None."""
+        frequencies = np.asarray(frequencies, dtype=float)
+        if not self.bounds:
+            return np.full(frequencies.shape, None, dtype=object)
+        i = np.searchsorted(self._bounds_array, frequencies, side="left")
+        at_bound = np.minimum(i, len(self.bounds) - 1)
+        exact = (i < len(self.bounds)) & (self._bounds_array[at_bound] == frequencies)
+        return np.where(exact, self._point_array[i], self._gap_array[i])
+
+
+class UnknownBandCounter:
+    """Counts frequencies outside the bandplan, reporting them periodically."""
+
+    def __init__(self, report_interval: float = 60):
+        self.report_interval = report_interval
+        self.count = 0
+        self.frequencies: Counter = Counter()
+        self._last_report = 0.0
+
+    def add(self, frequency: NumberType, count: int = 1):
+        self.count += count
+        # Only the most recent distinct frequencies are of interest.
+        if len(self.frequencies) < 1000 or frequency in self.frequencies:
+            self.frequencies[frequency] += count
+
+        now = monotonic()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            common = ", ".join(f"{f}" for f, _ in self.frequencies.most_common(5))
+            print(f"Unknown band: {self.count} lookups, most common: {common}")
+
+
+unknown_bands = UnknownBandCounter()
+
+
+@cache
+def getBandIndex() -> BandIndex:
+    return BandIndex(getBandplan())
+
+
+def frequencyToBand(
+    frequency: NumberType, dial: Optional[NumberType] = None
+) -> Optional[str]:
+    band = getBandIndex().lookup(frequency, dial)
+    if band is None:
+        unknown_bands.add(frequency)
+    return band
+
+
+def frequenciesToBands(frequencies) -> np.ndarray:
+    """frequencyToBand for an array of frequencies."""
+    bands = getBandIndex().lookup_many(frequencies)
+    unknown = bands == None  # noqa: E711 elementwise comparison
+    if unknown.any():
+        for frequency in np.asarray(frequencies)[unknown].tolist():
+            unknown_bands.add(frequency)
+    return bands
 
 
 @cache
@@ -210,8 +490,7 @@ class DistanceBearing(namedtuple("DistanceBearing", ["distance", "bearing"])):
     bearing: float
 
 
-@lru_cache(maxsize=512)
-def calculate_qth_distance_bearing(
+def _calculateDistanceBearing(
     qth_from: str, qth_to: str, center: bool = True
 ) -> DistanceBearing:
     dec_from = DecimalDegrees.fromGridsquare(qth_from, center=center)
@@ -229,3 +508,262 @@ def calculate_qth_distance_bearing(
         bearing = 180 - abs(bearing) + 180
 
     return DistanceBearing(int(distance), bearing)
+
+
+# 18 fields × 18 fields × 10 squares × 10 squares
+GRID_SQUARES = 32400
+_FIELD_LETTERS = "ABCDEFGHIJKLMNOPQR"
+# Index offsets of the field (first two letters) and square (two digits)
+_FIELD_OFFSET = {
+    lon + lat: (lon_i * 18 + lat_i) * 100
+    for lon_i, lon_letter in enumerate(_FIELD_LETTERS)
+    for lat_i, lat_letter in enumerate(_FIELD_LETTERS)
+    for lon in (lon_letter, lon_letter.lower())
+    for lat in (lat_letter, lat_letter.lower())
+}
+_SQUARE_OFFSET = {f"{i:02d}": i for i in range(100)}
+
+
+def gridSquareIndex(gridsquare: str) -> int:
+    """
+    Index of a 4 character grid square (e.g. JO59), in the order of
+    GeodesyCache tables. -1 for anything else.
+    """
+    if len(gridsquare) != 4:
+        return -1
+    try:
+        return _FIELD_OFFSET[gridsquare[:2]] + _SQUARE_OFFSET[gridsquare[2:]]
+    except KeyError:
+        return -1
+
+
+def _toArray(typecode: str, values: np.ndarray) -> array:
+    result = array(typecode)
+    assert result.itemsize == values.itemsize
+    result.frombytes(values.tobytes())
+    return result
+
+
+class GeodesyTable(namedtuple("GeodesyTable", ["distance", "bearing"])):
+    # Compact arrays, indexing them returns Python int and float directly.
+    # Use np.frombuffer for vectorized access.
+    distance: array
+    bearing: array
+
+
+class GeodesyCache:
+    """
+    Distance and bearing between grid squares.
+
+    For every receiver grid a table with the distance and bearing to the
+    center of all 32,400 four character grid squares is computed on first
+    use, with a single Geod.inv call. Other lookups (6+ character grids,
+    corners instead of centers) go through a bounded LRU cache.
+    """
+
+    # Receivers are few; this only guards against unbounded growth.
+    MAX_TABLES = 64
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._tables: Dict[str, GeodesyTable] = {}
+        self._lru: "OrderedDict[Tuple[str, str, bool], DistanceBearing]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.table_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def table(self, qth_from: str) -> GeodesyTable:
+        try:
+            return self._tables[qth_from]
+        except KeyError:
+            pass
+
+        lon_field, lat_field, lon_square, lat_square = np.unravel_index(
+            np.arange(GRID_SQUARES), (18, 18, 10, 10)
+        )
+        longitude = lon_field * 20 + lon_square * 2 - 180 + 1
+        latitude = lat_field * 10 + lat_square - 90 + 0.5
+
+        dec_from = DecimalDegrees.fromGridsquare(qth_from)
+        bearing, _reverse_bearing, distance = geod.inv(
+            np.full(GRID_SQUARES, dec_from.longitude),
+            np.full(GRID_SQUARES, dec_from.latitude),
+            longitude.astype(float),
+            latitude.astype(float),
+        )
+        # Convert from ±180° to 0-360°
+        bearing = np.where(bearing < 0, 180 - np.abs(bearing) + 180, bearing)
+
+        table = GeodesyTable(
+            _toArray("I", distance.astype(np.uint32)),
+            _toArray("f", bearing.astype(np.float32)),
+        )
+        with self._lock:
+            if len(self._tables) >= self.MAX_TABLES:
+                self._tables.clear()
+            self._tables[qth_from] = table
+        return table
+
+    def lookup(
+        self, qth_from: str, qth_to: str, center: bool = True
+    ) -> DistanceBearing:
+        if center:
+            index = gridSquareIndex(qth_to)
+            if index >= 0:
+                table = self.table(qth_from)
+                self.table_hits += 1
+                return DistanceBearing(table.distance[index], table.bearing[index])
+
+        key = (qth_from, qth_to, center)
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self.hits += 1
+                self._lru.move_to_end(key)
+                return result
+            self.misses += 1
+
+        result = _calculateDistanceBearing(qth_from, qth_to, center)
+        with self._lock:
+            self._lru[key] = result
+            if len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tables": len(self._tables),
+            "table_hits": self.table_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._lru),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self._lru.clear()
+            self.table_hits = self.hits = self.misses = self.evictions = 0
+
+
+geodesy_cache = GeodesyCache(GEODESY_CACHE_SIZE)
+
+
+def calculate_qth_distance_bearing(
+    qth_from: str, qth_to: str, center: bool = True
+) -> DistanceBearing:
+    return geodesy_cache.lookup(qth_from, qth_to, center)
+
+
+@lru_cache(maxsize=65536)
+def _gridLocation(gridsquare: str) -> Tuple[float, float]:
+    return maidenhead.to_location(gridsquare, center=True)
+
+
+class EntryGeodesy(
+    namedtuple("EntryGeodesy", ["distance", "heading", "latitude", "longitude"])
+):
+    distance: int
+    heading: float
+    latitude: float
+    longitude: float
+
+
+@dataclass
+class BatchGeodesy:
+    """Distance and heading to the sender of every entry in a batch."""
+
+    # False for entries without sender grid, the other values are NaN/0 there.
+    has_grid: np.ndarray
+    distance: np.ndarray
+    heading: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+
+    def rows(self) -> List[Optional[EntryGeodesy]]:
+        """Per entry values as Python numbers, None if the entry has no grid."""
+        return [
+            EntryGeodesy(*row) if has_grid else None
+            for has_grid, *row in zip(
+                self.has_grid.tolist(),
+                self.distance.tolist(),
+                self.heading.tolist(),
+                self.latitude.tolist(),
+                self.longitude.tolist(),
+            )
+        ]
+
+
+def calculate_batch_distance_bearing(entries: Sequence[Entry]) -> BatchGeodesy:
+    """
+    Same as calculate_qth_distance_bearing and Entry.sender_coordinates,
+    for a whole batch of entries. 4 character sender grids are looked up in
+    the GeodesyCache tables, everything else goes through a single call to
+    Geod.inv.
+    """
+    return calculate_grids_distance_bearing(
+        [e.receiver_grid for e in entries], [e.sender_grid for e in entries]
+    )
+
+
+def calculate_grids_distance_bearing(
+    receiver_grid_column: Sequence[str],
+    sender_grid_column: Sequence[Optional[str]],
+) -> BatchGeodesy:
+    """calculate_batch_distance_bearing for columns of receiver and sender grids."""
+    count = len(sender_grid_column)
+    has_grid = np.fromiter((bool(g) for g in sender_grid_column), bool, count)
+    sender_grids: List[str] = [g for g in sender_grid_column if g]  # type: ignore [misc]
+    receiver_grids = np.array(
+        [r for r, s in zip(receiver_grid_column, sender_grid_column) if s],
+        dtype=object,
+    )
+
+    to_coords = np.array(
+        [_gridLocation(grid) for grid in sender_grids], dtype=float
+    ).reshape(-1, 2)
+    square = np.fromiter(
+        (gridSquareIndex(grid) for grid in sender_grids), np.int64, len(sender_grids)
+    )
+
+    distance = np.empty(len(sender_grids), dtype=np.int64)
+    bearing = np.empty(len(sender_grids))
+
+    in_table = square >= 0
+    for receiver_grid in set(receiver_grids[in_table]):
+        table = geodesy_cache.table(receiver_grid)
+        mask = in_table & (receiver_grids == receiver_grid)
+        distance[mask] = np.frombuffer(table.distance, np.uint32)[square[mask]]
+        bearing[mask] = np.frombuffer(table.bearing, np.float32)[square[mask]]
+    geodesy_cache.table_hits += int(in_table.sum())
+
+    rest = ~in_table
+    if rest.any():
+        from_coords = np.array(
+            [_gridLocation(grid) for grid in receiver_grids[rest]], dtype=float
+        ).reshape(-1, 2)
+        rest_bearing, _reverse_bearing, rest_distance = geod.inv(
+            from_coords[:, 1], from_coords[:, 0], to_coords[rest, 1], to_coords[rest, 0]
+        )
+        # Convert from ±180° to 0-360°
+        bearing[rest] = np.where(
+            rest_bearing < 0, 180 - np.abs(rest_bearing) + 180, rest_bearing
+        )
+        distance[rest] = rest_distance.astype(np.int64)
+
+    batch = BatchGeodesy(
+        has_grid=has_grid,
+        distance=np.zeros(count, dtype=np.int64),
+        heading=np.full(count, np.nan),
+        latitude=np.full(count, np.nan),
+        longitude=np.full(count, np.nan),
+    )
+    batch.distance[has_grid] = distance
+    batch.heading[has_grid] = bearing
+    batch.latitude[has_grid] = to_coords[:, 0]
+    batch.longitude[has_grid] = to_coords[:, 1]
+    return batch
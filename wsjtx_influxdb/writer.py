@@ -0,0 +1,353 @@
+import datetime
+import queue
+import random
+import threading
+from dataclasses import dataclass
+from enum import Enum
+from time import monotonic
+from typing import Callable, Optional
+
+from .buffer import PendingBuffer
+from .stats import metrics
+from .utils import Entry
+
+
+class OverflowPolicy(Enum):
+    # Wait for room in the queue, stalling the receiver.
+    BLOCK = "block"
+    # Discard the entry that did not fit.
+    DROP_NEWEST = "drop_newest"
+    # Discard the oldest queued entry to make room.
+    DROP_OLDEST = "drop_oldest"
+
+
+class WriterStats:
+    """Counters shared between the receive loop and the writer thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.submitted = 0
+            self.dropped = 0
+            self.flushes = 0
+            self.latency_count = 0
+            self.latency_total = 0.0
+            self.latency_max = 0.0
+
+    def record_latency(self, seconds: float):
+        with self._lock:
+            self.latency_count += 1
+            self.latency_total += seconds
+            if seconds > self.latency_max:
+                self.latency_max = seconds
+
+    def summary(self, queue_depth: int, pending: int) -> str:
+        with self._lock:
+            if self.latency_count:
+                avg = self.latency_total / self.latency_count
+            else:
+                avg = 0.0
+            return (
+                f"queue={queue_depth} pending={pending}"
+                f" submitted={self.submitted} dropped={self.dropped}"
+                f" flushes={self.flushes}"
+                f" recv_latency_avg={avg * 1000:.3f}ms"
+                f" recv_latency_max={self.latency_max * 1000:.3f}ms"
+            )
+
+
+class CircuitState(Enum):
+    # Flushing normally
+    CLOSED = "closed"
+    # Too many consecutive failures, not flushing until the open period ends
+    OPEN = "open"
+    # Open period ended, the next flush decides between closed and open
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class SchedulerStatus:
+    circuit: CircuitState
+    consecutive_failures: int
+    # Seconds until the next flush is allowed, 0 if it is allowed now
+    next_flush_in: float
+
+    def __str__(self):
+        return (
+            f"circuit={self.circuit.value}"
+            f" failures={self.consecutive_failures}"
+            f" next_flush_in={self.next_flush_in:.1f}s"
+        )
+
+
+class FlushScheduler:
+    """
+    Decides when the writer flushes.
+
+    A flush is due every interval seconds, as soon as batch_size entries are
+    pending, or once the oldest pending entry is max_age seconds old.
+    After a failed flush, nothing is flushed for an exponentially growing,
+    jittered delay. After failure_threshold consecutive failures the circuit
+    opens, and a single flush is tried every open_seconds until one succeeds.
+    """
+
+    def __init__(
+        self,
+        interval: float = 1,
+        batch_size: int = 1000,
+        max_age: Optional[float] = 30,
+        backoff_initial: float = 1,
+        backoff_max: float = 300,
+        jitter: float = 0.5,
+        failure_threshold: int = 5,
+        open_seconds: float = 60,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self.circuit = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self._last_flush: Optional[float] = None
+        # No flush at all before this time (backoff, open circuit)
+        self._not_before = 0.0
+
+    def should_flush(self, pending: int, oldest_age: Optional[float] = None) -> bool:
+        """
+        pending is the number of entries waiting,
+        oldest_age the age of the oldest one in seconds.
+        """
+        now = self.clock()
+        with self._lock:
+            if now < self._not_before:
+                return False
+            if self.circuit is CircuitState.OPEN:
+                self.circuit = CircuitState.HALF_OPEN
+                return True
+            if self.consecutive_failures:
+                # Backoff has passed, retry
+                return True
+            if pending >= self.batch_size:
+                return True
+            if self.max_age is not None and oldest_age is not None:
+                if oldest_age >= self.max_age:
+                    return True
+            return self._last_flush is None or now - self._last_flush >= self.interval
+
+    def _backoff(self) -> float:
+        delay = min(
+            self.backoff_max,
+            self.backoff_initial * 2 ** (self.consecutive_failures - 1),
+        )
+        return delay * (1 - self.jitter * random.random())
+
+    def record_success(self):
+        with self._lock:
+            if self.circuit is not CircuitState.CLOSED:
+                print("Writer: InfluxDB is reachable again, closing circuit")
+            self.circuit = CircuitState.CLOSED
+            self.consecutive_failures = 0
+            self._last_flush = self.clock()
+            self._not_before = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            now = self.clock()
+            self._last_flush = now
+            self.consecutive_failures += 1
+            tripped = self.consecutive_failures >= self.failure_threshold
+            if tripped or self.circuit is CircuitState.HALF_OPEN:
+                if self.circuit is CircuitState.CLOSED:
+                    print(
+                        f"Writer: {self.consecutive_failures} failed flushes,"
+                        f" opening circuit for {self.open_seconds}s"
+                    )
+                self.circuit = CircuitState.OPEN
+                self._not_before = now + self.open_seconds
+            else:
+                self._not_before = now + self._backoff()
+
+    def status(self) -> SchedulerStatus:
+        with self._lock:
+            return SchedulerStatus(
+                circuit=self.circuit,
+                consecutive_failures=self.consecutive_failures,
+                next_flush_in=max(0.0, self._not_before - self.clock()),
+            )
+
+
+_STOP = object()
+
+
+class BackgroundWriter(threading.Thread):
+    """
+    Moves entries from the receive loop to InfluxDB on a separate thread.
+
+    The receive loop only calls submit(), which puts the entry on a bounded
+    queue. The writer thread moves queued entries into a PendingBuffer and
+    calls flush(buffer, force) whenever the scheduler says so. flush returns
+    False if it failed, so the scheduler can back off. force is set for the
+    last flush, when the writer stops.
+    backlog, if given, returns True while entries are waiting elsewhere
+    (spilled to disk), so flush keeps being called with an empty buffer.
+    overflow, if given, is called with the buffer on every tick, whether or
+    not the scheduler allows a flush, to move entries out of memory while
+    InfluxDB can't take them.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[PendingBuffer, bool], Optional[bool]],
+        queue_size: int = 10000,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        batch_size: int = 1000,
+        tick: float = 0.5,
+        stats_interval: Optional[float] = 60,
+        backlog: Optional[Callable[[], bool]] = None,
+        scheduler: Optional[FlushScheduler] = None,
+        overflow: Optional[Callable[[PendingBuffer], object]] = None,
+    ):
+        super().__init__(name="influxdb-writer", daemon=True)
+        self.flush = flush
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.policy = policy
+        if scheduler is None:
+            scheduler = FlushScheduler(batch_size=batch_size)
+        self.scheduler = scheduler
+        self.tick = tick
+        self.stats_interval = stats_interval
+        self.backlog = backlog
+        self.overflow = overflow
+        self.stats = WriterStats()
+        self.buffer = PendingBuffer()
+
+    def submit(self, entry: Entry, block: bool = False) -> bool:
+        """
+        Queues an entry for writing. Returns False if it was dropped.
+        block forces waiting for room, regardless of the overflow policy.
+        """
+        self.stats.submitted += 1
+        if block or self.policy is OverflowPolicy.BLOCK:
+            while True:
+                try:
+                    self.queue.put(entry, timeout=self.tick)
+                    return True
+                except queue.Full:
+                    if not self.is_alive():
+                        # Nothing will ever make room
+                        self.stats.dropped += 1
+                        return False
+
+        try:
+            self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy is OverflowPolicy.DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.stats.dropped += 1
+            try:
+                self.queue.put_nowait(entry)
+                return True
+            except queue.Full:
+                pass
+
+        self.stats.dropped += 1
+        return False
+
+    def record_latency(self, seconds: float):
+        self.stats.record_latency(seconds)
+
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Flushes everything still queued and stops the thread."""
+        while self.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=self.tick)
+                break
+            except queue.Full:
+                pass
+        self.join(timeout)
+
+    def _collect(self, timeout: float) -> bool:
+        """Moves queued entries into the buffer. Returns False when stopped."""
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return True
+
+        while True:
+            if item is _STOP:
+                return False
+            self.buffer.push(item)
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return True
+
+    def _overflow(self):
+        if self.overflow is None or not self.buffer:
+            return
+        try:
+            self.overflow(self.buffer)
+        except Exception as ex:
+            print(f"Writer: overflow failed: {ex!r}")
+
+    def _flush(self, force: bool):
+        if not self.buffer and (self.backlog is None or not self.backlog()):
+            return
+
+        if not force:
+            oldest = self.buffer.oldest()
+            oldest_age = None
+            if oldest is not None:
+                oldest_age = (datetime.datetime.utcnow() - oldest).total_seconds()
+            if not self.scheduler.should_flush(len(self.buffer), oldest_age):
+                return
+
+        self.stats.flushes += 1
+        try:
+            with metrics.timer("flush_seconds"):
+                succeeded = self.flush(self.buffer, force) is not False
+        except Exception as ex:
+            # Keep the thread alive, or the queue fills up and submit blocks
+            print(f"Writer: flush failed: {ex!r}")
+            succeeded = False
+        if succeeded:
+            self.scheduler.record_success()
+        else:
+            self.scheduler.record_failure()
+
+    def run(self):
+        last_report = monotonic()
+        running = True
+        while running:
+            running = self._collect(self.tick)
+            self._overflow()
+            self._flush(False)
+
+            if self.stats_interval is not None:
+                now = monotonic()
+                if now - last_report >= self.stats_interval:
+                    last_report = now
+                    summary = self.stats.summary(self.queue_depth(), len(self.buffer))
+                    print(f"Writer: {summary} {self.scheduler.status()}")
+
+        self._flush(True)
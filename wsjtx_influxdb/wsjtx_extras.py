@@ -1,68 +1,287 @@
 import datetime
-from typing import Iterable, Optional
+import mmap
+import re
+import threading
+from collections import OrderedDict
+from time import time_ns
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Tuple, Union
 from typing_extensions import override
 
+import numpy as np
 from wsjtx_srv.wsjtx import UDP_Connector  # type: ignore [import]
 
 from .utils import Entry, Mode
-from .config import RECEIVER_CALLSIGN, RECEIVER_GRID
+from .config import MESSAGE_CACHE_SIZE, RECEIVER_CALLSIGN, RECEIVER_GRID
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MS = 1_000_000
+_DAY_NS = 86400 * 1_000_000_000
+_HALF_DAY_NS = _DAY_NS // 2
+
+
+class TimeOfDayConverter:
+    """
+    Converts WSJT-X decode times, milliseconds since UTC midnight, to
+    nanoseconds since epoch: on the day that puts them closest to now.
+    Around midnight that is yesterday for decodes from just before it, or
+    tomorrow when the local clock is slightly behind WSJT-X.
+
+    UTC midnight is cached until the next one passes, and so is the result
+    for the last time of day, as a burst of decodes shares the same slot.
+    """
+
+    def __init__(self, clock: Callable[[], int] = time_ns):
+        self.clock = clock
+        self._midnight = 0
+        self._next_midnight = 0
+        # Last time of day, its start of day, and until when that holds
+        self._last_ms = -1
+        self._last_base = 0
+        self._last_valid_until = 0
+
+    def _base(self, ms: int, now: int) -> int:
+        """Start of the day ms belongs to, in ns since epoch."""
+        if now >= self._next_midnight:
+            self._midnight = now - now % _DAY_NS
+            self._next_midnight = self._midnight + _DAY_NS
+            self._last_valid_until = 0
+
+        if ms == self._last_ms and now < self._last_valid_until:
+            return self._last_base
+
+        today = self._midnight + ms * _MS
+        if today - now >= _HALF_DAY_NS:
+            base = self._midnight - _DAY_NS
+            # Today's candidate becomes the closer one from then on
+            valid_until = today - _HALF_DAY_NS + 1
+        elif now - today > _HALF_DAY_NS:
+            base = self._next_midnight
+            valid_until = self._next_midnight
+        else:
+            base = self._midnight
+            valid_until = min(today + _HALF_DAY_NS + 1, self._next_midnight)
+        self._last_ms = ms
+        self._last_base = base
+        self._last_valid_until = valid_until
+        return base
+
+    def toNanoseconds(self, ms: int, offset: float = 0.0) -> int:
+        """offset in seconds (delta_t), rounded to microseconds like timedelta."""
+        now = self.clock()
+        return self._base(ms, now) + ms * _MS + round(offset * 1_000_000) * 1000
+
+    def toNanosecondsMany(self, ms, offsets=None) -> np.ndarray:
+        """toNanoseconds for arrays of times of day and offsets."""
+        now = self.clock()
+        self._base(0, now)
+        ms = np.asarray(ms, dtype=np.int64)
+        result = self._midnight + ms * _MS
+        result[result - now >= _HALF_DAY_NS] -= _DAY_NS
+        result[now - result > _HALF_DAY_NS] += _DAY_NS
+        if offsets is not None:
+            offsets = np.asarray(offsets, dtype=float)
+            result += np.round(offsets * 1_000_000).astype(np.int64) * 1000
+        return result
+
+
+time_of_day = TimeOfDayConverter()
+
+
+def nanosecondsToDatetime(ns: int) -> datetime.datetime:
+    return _EPOCH + datetime.timedelta(microseconds=ns // 1000)
 
 
 def parse_time(time: int, offset: float):
-    now = datetime.datetime.utcnow()
-    yesterday = now - datetime.timedelta(days=1)
-
-    seconds, ms = divmod(time, 1000)
-    minutes, seconds = divmod(seconds, 60)
-    hours, minutes = divmod(minutes, 60)
-
-    tm = datetime.time(hour=hours, minute=minutes, second=seconds, microsecond=ms)
-    # print(tm.isoformat())
-    now_dt = datetime.datetime.combine(now.date(), tm)
-    yesterday_dt = datetime.datetime.combine(yesterday.date(), tm)
-
-    # print(now_dt, yesterday_dt)
-    now_diff = abs(now - now_dt)
-    yesterday_diff = abs(now - yesterday_dt)
-    # print(now_diff, yesterday_diff)
-
-    if now_diff < yesterday_diff:
-        stamp = now_dt
-    else:
-        stamp = yesterday_dt
-
-    stamp += datetime.timedelta(seconds=offset)
-
-    return stamp
-
-
-def parseWsjtMessage(message: str):
-    msplit = message.strip().split()
-    cq = msplit[0].upper() == "CQ"
-    if len(msplit) > 1 and msplit[1].upper() in ("DX", "NA"):
-        msplit.pop(1)
-    # TODO: implement full message parsing
-    # TZ3LTD/P JG4AMP/P R EC88
-    # 8P6GE RA4NCC LO68
-    # KK4CQN RA6ABO R-04
-    # CQ R7DX KN84
-    # KA6BIM UN7JO +05
-    # KE0LCS R7DX -15
-    # YI3WHR RK4HP 73
-    # K6BRN RZ6L RR73
-    # ZL2BX <...> -09
-    # RV3HSG EK5AUA/R DO88
-    # <N6BCE> R0FBA/9
-    # RC0AT <R0FBA/9> +08
-    # <SV8EUL> <...> R 520305 LG83SK
-
-    sender_callsign = UDP_CONN.parse_message(message)
-    sender_grid = None
-    if cq and len(msplit) == 3:
-        if UDP_CONN.is_locator(msplit[2]):
-            sender_grid = msplit[2]
-
-    return cq, sender_callsign, sender_grid
+    return nanosecondsToDatetime(time_of_day.toNanoseconds(time, offset))
+
+
+# Tokens of WSJT-X standard and contest messages
+_GRID = re.compile(r"[A-R]{2}[0-9]{2}")
+_STANDARD_CALL = re.compile(r"(?:[A-Z]|[A-Z][A-Z0-9]|[0-9][A-Z])[0-9][A-Z]{1,3}")
+# RST (RTTY Roundup), class (Field Day), report and serial (EU VHF)
+_EXCHANGE = re.compile(r"5[0-9]9|[0-9]{1,2}[A-F]|[0-9]{6}")
+_ACKNOWLEDGEMENTS = frozenset(("RRR", "RR73", "73"))
+
+
+class WsjtMessage(NamedTuple):
+    cq: bool
+    sender_callsign: Optional[str]
+    sender_grid: Optional[str]
+    target_callsign: Optional[str] = None
+    # Signal report in dB
+    report: Optional[int] = None
+
+
+_UNKNOWN = WsjtMessage(False, None, None)
+
+
+def _isGrid(token: str) -> bool:
+    # RR73 is technically a valid locator, but acknowledges the end of a QSO
+    return len(token) == 4 and token != "RR73" and _GRID.match(token) is not None
+
+
+def _isCallsign(token: str) -> bool:
+    """Hashed (<...>), or letters and digits that aren't a locator or 73"""
+    if token[0] == "<":
+        return True
+    if len(token) < 3 or token.isalpha() or token.isdigit():
+        return False
+    return token not in _ACKNOWLEDGEMENTS and not _isGrid(token)
+
+
+def _parseReport(token: str) -> Optional[int]:
+    """-15, +05 or R-04, like the regex R?[-+][0-9]{2}"""
+    size = len(token)
+    if size != 3 and (size != 4 or token[0] != "R"):
+        return None
+    if token[-3] not in "+-" or not token[-2:].isdecimal():
+        return None
+    return int(token[-3:])
+
+
+def parseWsjtMessage(message: str) -> WsjtMessage:
+    """
+    Classifies a decoded message in one pass over its tokens, e.g.
+
+        CQ R7DX KN84                    CQ, sender and grid
+        CQ DX F4BKV IN95                CQ with a modifier
+        KK4CQN RA6ABO R-04              target, sender and report
+        K6BRN RZ6L RR73                 acknowledgements (RRR, RR73, 73)
+        ZL2BX <...> -09                 hashed callsigns
+        RV3HSG EK5AUA/R DO88            /P and /R suffixes
+        TZ3LTD/P JG4AMP/P R EC88
+        <SV8EUL> <...> R 520305 LG83SK  contest exchanges
+        JJ0NFJ 333XQU R 549 2538
+        TU; QN5HYK 649RMM R 549 2401
+        KC1NNR RR73; GI6FZI <5B4AMM> -08  Fox/Hound
+
+    The grid is only taken from CQ messages: in a QSO, the locator
+    of a /P or /R station, or a report, can look like any other.
+    """
+    tokens = message.split()
+    # Marginal decodes are flagged "?" and "a1" to "a7"
+    while tokens and (tokens[-1] == "?" or tokens[-1][0] == "a"):
+        tokens.pop()
+    if not tokens:
+        return _UNKNOWN
+
+    if ";" in message:
+        if tokens[0] == "TU;":
+            # Ends the previous QSO in the same transmission
+            del tokens[0]
+        elif len(tokens) == 5 and tokens[1] == "RR73;":
+            # Fox acknowledging one Hound while reporting to the next
+            del tokens[:2]
+        else:
+            return _UNKNOWN
+
+    first = tokens[0].upper()
+    count = len(tokens)
+    if first == "CQ" or first == "QRZ":
+        grid = None
+        last = count - 1
+        if count >= 3 and _isGrid(tokens[last]):
+            grid = tokens[last]
+            last -= 1
+        # Anything between CQ and the callsign is a modifier: DX, NA, TEST, 145
+        sender = tokens[last] if last >= 1 else None
+        if sender is not None and not _isCallsign(sender):
+            sender = None
+        return WsjtMessage(first == "CQ", sender, grid)
+
+    if count < 2:
+        return _UNKNOWN
+    target = tokens[0]
+    sender = tokens[1]
+    if not _isCallsign(sender):
+        return _UNKNOWN
+
+    if count == 2:
+        # Short free text, e.g. "QRV 50W", can't be told from a callsign
+        if len(sender) > 3 or _STANDARD_CALL.match(sender):
+            return WsjtMessage(False, sender, None, target)
+        return _UNKNOWN
+    if count == 3:
+        third = tokens[2]
+        report = _parseReport(third)
+        if report is not None:
+            return WsjtMessage(False, sender, None, target, report)
+        # Short free text, e.g. "EFHW 50W 73", can't be told from a callsign
+        if len(sender) > 3 or _STANDARD_CALL.match(sender) or _isGrid(third):
+            return WsjtMessage(False, sender, None, target)
+        return _UNKNOWN
+    if count <= 5:
+        rogered = tokens[2] == "R"
+        if rogered and count == 4:
+            # R and a locator, as sent by /P and /R stations
+            return WsjtMessage(False, sender, None, target)
+        if count == 4 + rogered and _EXCHANGE.fullmatch(tokens[2 + rogered]):
+            return WsjtMessage(False, sender, None, target)
+    return _UNKNOWN
+
+
+class MessageCache:
+    """
+    Bounded LRU cache of parseWsjtMessage results, keyed by the message
+    text, or by its bytes in ALL.TXT.
+
+    Most decodes repeat: a station calling CQ sends the same message every
+    cycle, and every receiver decodes it. Hits also return the same message
+    string, so entries held in the queues share one copy of it, as they
+    share the callsigns and grids Entry interns.
+    """
+
+    def __init__(self, maxsize: int = 16384):
+        self.maxsize = maxsize
+        self._lru: "OrderedDict[Union[str, bytes], Tuple[str, WsjtMessage]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def parse(self, key: Union[str, bytes]) -> Tuple[str, WsjtMessage]:
+        """Returns the message and its parseWsjtMessage result."""
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self.hits += 1
+                self._lru.move_to_end(key)
+                return result
+            self.misses += 1
+
+        message = key.decode("utf8") if isinstance(key, bytes) else key
+        result = (message, parseWsjtMessage(message))
+        with self._lock:
+            self._lru[key] = result
+            if len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def hitRate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._lru),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+message_cache = MessageCache(MESSAGE_CACHE_SIZE)
+# Messages of ALL.TXT lines, keyed by their raw bytes
+line_message_cache = MessageCache(MESSAGE_CACHE_SIZE)
 
 
 def parseWsjtxAllLogLine(line: str) -> Optional[Entry]:
@@ -82,19 +301,22 @@ def parseWsjtxAllLogLine(line: str) -> Optional[Entry]:
         message,
     ) = data
 
-    cq, sender_callsign, sender_grid = parseWsjtMessage(message)
+    message, parsed = message_cache.parse(message)
 
     entry_time = datetime.datetime.strptime(raw_time, "%y%m%d_%H%M%S")
     entry_time += datetime.timedelta(seconds=float(raw_time_offset))
+    dial = int(float(raw_freq) * 1000000)
     entry = Entry(
         mode=Mode.get(raw_mode),
         snr=int(raw_snr),
-        frequency=int(float(raw_freq) * 1000000 + int(raw_freq_offset)),
+        frequency=dial + int(raw_freq_offset),
+        dial_frequency=dial,
         message=message,
         time=entry_time,
-        cq=cq,
-        sender_callsign=sender_callsign,
-        sender_grid=sender_grid,
+        cq=parsed.cq,
+        sender_callsign=parsed.sender_callsign,
+        sender_grid=parsed.sender_grid,
+        target_callsign=parsed.target_callsign,
         receiver_grid=RECEIVER_GRID,
         receiver_callsign=RECEIVER_CALLSIGN,
     )
@@ -116,6 +338,124 @@ def parseWsjtxAllLog(file_path: str) -> Iterable[Entry]:
                 print(line)
 
 
+# Caches for parseWsjtxAllLogLineFast. Lines in ALL.TXT are in time order,
+# and only a handful of distinct dial frequencies, modes and time offsets
+# occur, so these stay small. They are cleared if they grow regardless.
+_CACHE_LIMIT = 4096
+_line_second: Dict[bytes, datetime.datetime] = {}
+_line_offset: Dict[bytes, datetime.timedelta] = {}
+_line_frequency: Dict[bytes, int] = {}
+_line_mode: Dict[bytes, Mode] = {}
+
+
+def _parseAllLogTime(raw_time: bytes) -> datetime.datetime:
+    """Parses YYMMDD_HHMMSS, like strptime("%y%m%d_%H%M%S")"""
+    if len(raw_time) != 13 or raw_time[6:7] != b"_" or not raw_time[:6].isdigit():
+        raise ValueError(f"Invalid time: {raw_time!r}")
+    if not raw_time[7:].isdigit():
+        raise ValueError(f"Invalid time: {raw_time!r}")
+    year = int(raw_time[0:2])
+    # Same pivot as strptime's %y
+    year += 1900 if year >= 69 else 2000
+    return datetime.datetime(
+        year,
+        int(raw_time[2:4]),
+        int(raw_time[4:6]),
+        int(raw_time[7:9]),
+        int(raw_time[9:11]),
+        int(raw_time[11:13]),
+    )
+
+
+def _parseAllLogFrequency(raw_freq: bytes) -> int:
+    """Parses a frequency in MHz to integer Hz, without going through float."""
+    mhz, dot, fraction = raw_freq.partition(b".")
+    if not mhz.isdigit() or (dot and not fraction.isdigit()):
+        raise ValueError(f"Invalid frequency: {raw_freq!r}")
+    return int(mhz) * 1000000 + int(fraction[:6].ljust(6, b"0"))
+
+
+def _cached(cache: Dict, key: bytes, parse):
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+    if len(cache) >= _CACHE_LIMIT:
+        cache.clear()
+    value = cache[key] = parse(key)
+    return value
+
+
+def parseWsjtxAllLogLineFast(line: bytes) -> Optional[Entry]:
+    """
+    Same as parseWsjtxAllLogLine, but works on the raw bytes of the line.
+    Timestamps, frequencies, time offsets and modes are parsed once and
+    cached, and nothing is decoded unless the line results in an Entry.
+    """
+    data = line.split(None, 7)
+    if len(data) < 8:
+        return None
+
+    (
+        raw_time,
+        raw_freq,
+        _,
+        raw_mode,
+        raw_snr,
+        raw_time_offset,
+        raw_freq_offset,
+        raw_message,
+    ) = data
+
+    entry_time = _cached(_line_second, raw_time, _parseAllLogTime)
+    entry_time += _cached(
+        _line_offset, raw_time_offset, lambda s: datetime.timedelta(seconds=float(s))
+    )
+    dial = _cached(_line_frequency, raw_freq, _parseAllLogFrequency)
+    frequency = dial + int(raw_freq_offset)
+    snr = int(raw_snr)
+    mode = _cached(_line_mode, raw_mode, lambda s: Mode.get(s.decode("ascii")))
+
+    message, parsed = line_message_cache.parse(raw_message.rstrip())
+
+    return Entry(
+        mode=mode,
+        snr=snr,
+        frequency=frequency,
+        dial_frequency=dial,
+        message=message,
+        time=entry_time,
+        cq=parsed.cq,
+        sender_callsign=parsed.sender_callsign,
+        sender_grid=parsed.sender_grid,
+        target_callsign=parsed.target_callsign,
+        receiver_grid=RECEIVER_GRID,
+        receiver_callsign=RECEIVER_CALLSIGN,
+    )
+
+
+def scanWsjtxAllLog(file_path: str) -> Iterable[Entry]:
+    """Same as parseWsjtxAllLog, but reads the file through mmap."""
+    with open(file_path, "rb") as fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return
+
+        with mm:
+            for line in iter(mm.readline, b""):
+                try:
+                    entry = parseWsjtxAllLogLineFast(line)
+
+                    if entry is None:
+                        continue
+
+                    yield entry
+                except ValueError:
+                    print(line.decode("utf8", errors="replace"))
+
+
 class UdpConn(UDP_Connector):
     def __init__(self):
         pass